@@ -14,6 +14,17 @@ const int moisturePins[] = {A0, A1, A2, A3, A4, A5};  // Soil moisture sensors
 const int floatPins[] = {2, 3};  // Float sensors
 const int moistureLedPins[] = {22, 24, 26, 28, 30, 32};  // LED pins for moisture warnings
 
+// Binary framing, enabled by the host with "MODE:BIN:<baud>"
+// Frame: A5 5A | length | seq (LE) | payload | CRC-16/CCITT (LE) over length, seq and payload
+// Payload: moisture percent x6 (0xFF = NC), raw value x6 (uint16 LE, 0xFFFF = NC), float bitmask
+const byte SYNC_1 = 0xA5;
+const byte SYNC_2 = 0x5A;
+const byte PAYLOAD_LENGTH = MOISTURE_SENSORS * 3 + 1;
+bool binaryMode = false;
+uint16_t frameSeq = 0;
+char commandBuffer[32];
+byte commandLength = 0;
+
 void setup() {
   Serial.begin(9600);
   
@@ -72,6 +83,83 @@ int readMoistureSensor(int pin) {
     return sum / validReadings;
 }
 
+uint16_t crc16(const byte *data, int length, uint16_t crc) {
+    for(int i = 0; i < length; i++) {
+        crc ^= (uint16_t)data[i] << 8;
+        for(int bit = 0; bit < 8; bit++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+        }
+    }
+    return crc;
+}
+
+int moisturePercentOf(int rawValue) {
+    return map(constrain(rawValue, WATER_VALUE, AIR_VALUE), AIR_VALUE, WATER_VALUE, 0, 100);
+}
+
+void sendSensorDataBinary() {
+    byte frame[5 + PAYLOAD_LENGTH + 2];
+    frame[0] = SYNC_1;
+    frame[1] = SYNC_2;
+    frame[2] = PAYLOAD_LENGTH;
+    frame[3] = frameSeq & 0xFF;
+    frame[4] = frameSeq >> 8;
+    byte *payload = frame + 5;
+    byte floats = 0;
+
+    for(int i = 0; i < MOISTURE_SENSORS; i++) {
+        int rawValue = readMoistureSensor(moisturePins[i]);
+        if(rawValue != -1 && rawValue < 1000) {
+            int moisturePercent = moisturePercentOf(rawValue);
+            digitalWrite(moistureLedPins[i], moisturePercent < 25 ? HIGH : LOW);
+            payload[i] = moisturePercent;
+        } else {
+            payload[i] = 0xFF;
+            rawValue = 0xFFFF;
+        }
+        payload[MOISTURE_SENSORS + i * 2] = rawValue & 0xFF;
+        payload[MOISTURE_SENSORS + i * 2 + 1] = (rawValue >> 8) & 0xFF;
+    }
+    for(int i = 0; i < FLOAT_SENSORS; i++) {
+        if(!digitalRead(floatPins[i])) floats |= 1 << i;
+    }
+    payload[MOISTURE_SENSORS * 3] = floats;
+
+    uint16_t crc = crc16(frame + 2, 3 + PAYLOAD_LENGTH, 0xFFFF);
+    frame[5 + PAYLOAD_LENGTH] = crc & 0xFF;
+    frame[6 + PAYLOAD_LENGTH] = crc >> 8;
+    Serial.write(frame, sizeof(frame));
+    frameSeq++;
+}
+
+void handleCommand(const char *command) {
+    if(strncmp(command, "MODE:BIN:", 9) == 0) {
+        long baud = atol(command + 9);
+        if(baud <= 0) return;
+        Serial.print("OK:BIN:");
+        Serial.println(baud);
+        Serial.flush();
+        Serial.end();
+        Serial.begin(baud);
+        binaryMode = true;
+    }
+}
+
+void readCommands() {
+    while(Serial.available()) {
+        char c = Serial.read();
+        if(c == '\n' || c == '\r') {
+            if(commandLength > 0) {
+                commandBuffer[commandLength] = '\0';
+                handleCommand(commandBuffer);
+                commandLength = 0;
+            }
+        } else if(commandLength < sizeof(commandBuffer) - 1) {
+            commandBuffer[commandLength++] = c;
+        }
+    }
+}
+
 void sendSensorData() {
     Serial.println("BEGIN>");
     
@@ -87,8 +175,7 @@ void sendSensorData() {
         Serial.print(":");
         
         if(rawValue != -1 && rawValue < 1000) {
-            int moisturePercent = map(constrain(rawValue, WATER_VALUE, AIR_VALUE), 
-                                  AIR_VALUE, WATER_VALUE, 0, 100);
+            int moisturePercent = moisturePercentOf(rawValue);
             
             // Control LED based on moisture level
             digitalWrite(moistureLedPins[i], moisturePercent < 25 ? HIGH : LOW);
@@ -124,6 +211,14 @@ void sendSensorData() {
 }
 
 void loop() {
+  readCommands();
+
+  if(binaryMode) {
+    sendSensorDataBinary();
+    delay(500);
+    return;
+  }
+
   // Add debug output
   Serial.println("DEBUG: Starting sensor reading cycle");
   
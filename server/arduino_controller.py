@@ -1,20 +1,255 @@
 import serial
-import json
 import logging
-from typing import Dict
+import os
+from typing import Callable, Iterator, List, Optional
 import time
-import sqlite3
-from datetime import datetime
-import sys
+import queue
+import threading
+from datetime import datetime, timezone
+from database import get_writer
+from frame_parser import BEGIN_MARKER, END_MARKER, SensorFrame, parse_frame
+from storage_policy import StoragePolicy
+from rollups import get_rollups, moisture_series
+from latest_cache import get_cache
+from event_bus import get_bus
+from port_discovery import PortDiscovery, is_identity, wait_until_ready
+from binary_protocol import DEFAULT_BINARY_BAUD, BinaryFrameDecoder, negotiate
+from metrics import counter, histogram
+
+FRAMES = counter('serial_frames_total', "Frames parsed from the serial stream")
+MALFORMED_FRAMES = counter('serial_malformed_frames_total', "Frames that were cut short or failed to parse")
+DROPPED_FRAMES = counter('serial_dropped_frames_total', "Frames dropped because a subscriber fell behind")
+LOST_FRAMES = counter('serial_lost_frames_total', "Binary frames missing from the sequence")
+FRAME_PARSE = histogram('frame_parse_seconds', "Time to parse one frame body")
+FRAME_LATENCY = histogram('serial_frame_latency_seconds',
+                          "From the read that completed a frame until it was saved and published")
+
+
+class SerialFrameReader:
+    """Background reader that consumes the serial byte stream continuously.
+
+    Bytes are accumulated in a bounded buffer and frames are cut out as soon
+    as their <END marker arrives (or, in binary mode, as soon as a frame
+    passes its CRC). The latest frame is always available, and any number
+    of subscribers can receive every frame in order.
+    """
+
+    def __init__(self, port: serial.Serial, on_frame: Optional[Callable[[SensorFrame], None]] = None,
+                 max_buffer: int = 4096, binary: bool = False):
+        self.logger = logging.getLogger('arduino_controller')
+        self.serial = port
+        self.on_frame = on_frame
+        self.max_buffer = max_buffer
+        self.latest: Optional[SensorFrame] = None
+        self.frame_count = 0
+        self.malformed_count = 0
+        self.dropped_count = 0
+        self.lost_count = 0
+        self.decoder = BinaryFrameDecoder() if binary else None
+        self.error: Optional[Exception] = None
+        self._buffer = bytearray()
+        self._subscribers: List[queue.Queue] = []
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name='serial-reader', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._condition:
+            self._condition.notify_all()
+
+    def feed(self, data: bytes) -> List[SensorFrame]:
+        """Append raw bytes and return every frame they complete"""
+        if self.decoder is not None:
+            return self._feed_binary(data)
+        buf = self._buffer
+        buf += data
+        frames = []
+        malformed = self.malformed_count
+        while True:
+            start = buf.find(BEGIN_MARKER)
+            if start == -1:
+                # Keep a tail that could be the start of a split marker
+                del buf[:max(0, len(buf) - len(BEGIN_MARKER) + 1)]
+                break
+
+            body_start = start + len(BEGIN_MARKER)
+            end = buf.find(END_MARKER, body_start)
+            if end == -1:
+                del buf[:start]
+                if len(buf) > self.max_buffer:
+                    # Frame never terminated; drop its BEGIN> and resync
+                    self.malformed_count += 1
+                    del buf[:len(BEGIN_MARKER)]
+                    continue
+                break
+
+            # A BEGIN> inside the body means the previous frame was cut short
+            restart = buf.rfind(BEGIN_MARKER, body_start, end)
+            if restart != -1:
+                self.malformed_count += 1
+                body_start = restart + len(BEGIN_MARKER)
+
+            started = time.perf_counter()
+            frame = parse_frame(bytes(buf[body_start:end]))
+            FRAME_PARSE.observe(time.perf_counter() - started)
+            del buf[:end + len(END_MARKER)]
+            if frame is None:
+                self.malformed_count += 1
+            else:
+                frames.append(frame)
+
+        if frames:
+            FRAMES.inc(len(frames))
+        if self.malformed_count != malformed:
+            MALFORMED_FRAMES.inc(self.malformed_count - malformed)
+        return frames
+
+    def _feed_binary(self, data: bytes) -> List[SensorFrame]:
+        decoder = self.decoder
+        corrupt, lost = decoder.corrupt, decoder.lost
+        started = time.perf_counter()
+        frames = [frame for _, frame in decoder.feed(data)]
+        if frames:
+            FRAME_PARSE.observe((time.perf_counter() - started) / len(frames))
+            FRAMES.inc(len(frames))
+        if decoder.corrupt != corrupt:
+            self.malformed_count += decoder.corrupt - corrupt
+            MALFORMED_FRAMES.inc(decoder.corrupt - corrupt)
+        if decoder.lost != lost:
+            self.lost_count += decoder.lost - lost
+            LOST_FRAMES.inc(decoder.lost - lost)
+            self.logger.warning(f"{decoder.lost - lost} frame(s) missing before seq {decoder.last_seq}")
+        return frames
+
+    def process(self, data: bytes) -> List[SensorFrame]:
+        """Feed raw bytes and publish every frame they complete"""
+        started = time.perf_counter()
+        frames = self.feed(data)
+        for frame in frames:
+            self._publish(frame)
+            FRAME_LATENCY.observe(time.perf_counter() - started)
+        return frames
+
+    def subscribe(self, maxsize: int = 256) -> queue.Queue:
+        """Register a queue that receives every subsequent frame"""
+        q = queue.Queue(maxsize=maxsize)
+        with self._condition:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._condition:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def frames(self, timeout: float = 1.0) -> Iterator[SensorFrame]:
+        """Yield every frame received from now on until the reader stops"""
+        q = self.subscribe()
+        try:
+            while self.running or not q.empty():
+                try:
+                    yield q.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+        finally:
+            self.unsubscribe(q)
+
+    def wait_for_frame(self, timeout: Optional[float] = None) -> Optional[SensorFrame]:
+        """Block until the next frame arrives and return it"""
+        with self._condition:
+            count = self.frame_count
+            self._condition.wait_for(
+                lambda: self.frame_count != count or not self.running, timeout
+            )
+            return self.latest if self.frame_count != count else None
+
+    def _publish(self, frame: SensorFrame):
+        with self._condition:
+            self.latest = frame
+            self.frame_count += 1
+            subscribers = list(self._subscribers)
+            self._condition.notify_all()
+
+        for q in subscribers:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                # Slow subscriber: drop its oldest frame to make room
+                self.dropped_count += 1
+                DROPPED_FRAMES.inc()
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(frame)
+
+        if self.on_frame is not None:
+            try:
+                self.on_frame(frame)
+            except Exception as e:
+                self.logger.error(f"Error handling frame: {str(e)}")
+
+    def _run(self):
+        self.logger.info(f"Streaming frames from {self.serial.port}")
+        while not self._stop.is_set():
+            try:
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                self.error = e
+                self.logger.error(f"Serial read failed: {str(e)}")
+                break
+            if data:
+                self.process(data)
+        with self._condition:
+            self._condition.notify_all()
+
 
 class ArduinoController:
-    def __init__(self, port=None, baud_rate=9600, db_path='../pulse_data.db'):
+    def __init__(self, port=None, baud_rate=9600, db_path='../pulse_data.db', writer=None,
+                 storage_policy=None, connection: Optional[serial.Serial] = None,
+                 protocol: Optional[str] = None):
+        """port is a device path, a USB identity ('vid:pid:serial') or None to auto-detect;
+        connection is an already open port, e.g. from PortDiscovery.connect_all.
+        protocol 'binary' asks the board for binary frames (ARDUINO_PROTOCOL),
+        falling back to text if it doesn't support them"""
         self.logger = logging.getLogger('arduino_controller')
-        
-        # Auto-detect Arduino port if none specified
-        if port is None:
-            port = self._find_arduino_port()
-            if port is None:
+        self.db_path = db_path
+        self.baud_rate = baud_rate
+        self.protocol = (protocol or os.getenv('ARDUINO_PROTOCOL', 'text')).lower()
+        self.binary_baud = int(os.getenv('ARDUINO_BINARY_BAUD', DEFAULT_BINARY_BAUD))
+        self.binary = False
+        self.writer = writer if writer is not None else get_writer(db_path)
+        self.storage_policy = storage_policy if storage_policy is not None else StoragePolicy.from_env()
+        self.rollups = get_rollups(self.writer)
+        self.cache = get_cache(db_path)
+        self.bus = get_bus(db_path)
+        self.reader: Optional[SerialFrameReader] = None
+        # Called with every saved frame, e.g. by the watering rules
+        self.frame_listeners: List[Callable[[SensorFrame], None]] = []
+        self.discovery = PortDiscovery.from_env(baud_rate)
+
+        if connection is not None:
+            self.serial = connection
+        elif port is None or is_identity(port):
+            # Auto-detect, or find a specific board wherever it is plugged in
+            self.serial = self.discovery.connect(port)
+            if self.serial is None:
                 error_msg = (
                     "No Arduino found. Please check:\n"
                     "1. Arduino is properly connected via USB\n"
@@ -24,12 +259,24 @@ class ArduinoController:
                 )
                 self.logger.error(error_msg)
                 raise RuntimeError(error_msg)
-        
+        else:
+            self.serial = self._open(port, baud_rate)
+        self.identity = self.discovery.identity_of(self.serial.port)
+        self.discovery.remember(self.identity, self.serial.port)
+        self.logger.info(f"Connected to Arduino on {self.serial.port} ({self.identity or 'unknown identity'})")
+        self._negotiate()
+
+    def _negotiate(self):
+        """Switch a freshly opened connection to binary frames if configured"""
+        self.binary = self.protocol == 'binary' and negotiate(self.serial, self.binary_baud)
+
+    def _open(self, port: str, baud_rate: int) -> serial.Serial:
         try:
             self.logger.info(f"Connecting to Arduino on port {port}")
-            self.serial = serial.Serial(port, baud_rate, timeout=1)
-            self.db_path = db_path
-            time.sleep(2)  # Wait for Arduino to reset
+            connection = serial.Serial(port, baud_rate, timeout=1)
+            # Wait for the Arduino to come out of reset, but no longer than it used to take
+            wait_until_ready(connection, timeout=2)
+            return connection
         except PermissionError:
             error_msg = (
                 f"Permission denied accessing port {port}. "
@@ -43,126 +290,107 @@ class ArduinoController:
             self.logger.error(error_msg)
             raise RuntimeError(error_msg)
 
-    def _find_arduino_port(self):
-        """Auto-detect the Arduino port"""
-        import serial.tools.list_ports
-        
-        self.logger.info("Searching for Arduino...")
-        ports = list(serial.tools.list_ports.comports())
-        self.logger.info(f"Found {len(ports)} ports:")
-        
-        for port in ports:
-            self.logger.info(f"  - {port.device}: {port.description}")
-            
-            # On Windows, Arduino usually shows up as "USB Serial Device"
-            if sys.platform.startswith('win'):
-                if "USB Serial" in port.description:
-                    self.logger.info(f"Found likely Arduino on {port.device}")
-                    
-                    # Try multiple times to connect
-                    for attempt in range(3):
-                        try:
-                            self.logger.info(f"Attempt {attempt + 1} to connect to {port.device}")
-                            s = serial.Serial(port.device, 9600, timeout=2)
-                            time.sleep(2)  # Wait for Arduino reset
-                            
-                            # Try to read the "READY" message
-                            start_time = time.time()
-                            while time.time() - start_time < 5:  # Wait up to 5 seconds
-                                if s.in_waiting:
-                                    msg = s.readline().decode('ascii').strip()
-                                    self.logger.info(f"Received: {msg}")
-                                    if msg == "READY":
-                                        s.close()
-                                        return port.device
-                                time.sleep(0.1)
-                            
-                            s.close()
-                        except PermissionError:
-                            self.logger.warning(
-                                f"Permission denied for {port.device}. "
-                                "Make sure no other program is using the port "
-                                "and you have sufficient permissions."
-                            )
-                            time.sleep(1)  # Wait before retry
-                        except Exception as e:
-                            self.logger.warning(f"Failed to connect to {port.device}: {str(e)}")
-                            break  # Don't retry for other errors
-            else:
-                # On Linux/Mac, look for ACM or USB devices
-                if "ACM" in port.device or "USB" in port.device:
-                    try:
-                        s = serial.Serial(port.device, 9600, timeout=2)
-                        s.close()
-                        return port.device
-                    except:
-                        continue
-        
-        self.logger.error("No Arduino found on any port")
-        return None
-
-    def save_moisture_readings(self, readings: Dict):
-        """Save moisture sensor readings and float sensor data to database"""
+    def save_moisture_readings(self, frame: SensorFrame):
+        """Queue moisture sensor readings and float sensor data for the database writer"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # Log all incoming readings
-                self.logger.info(f"Processing readings for save: {readings}")
-                
-                for sensor, value in readings.items():
-                    # Handle float sensors
-                    if sensor.startswith('F'):
-                        sensor_num = int(sensor[1:])
-                        # Skip if the value is NC (Not Connected)
-                        if value == 'NC':
-                            self.logger.warning(f"Float sensor {sensor_num} reported NC, skipping")
-                            continue
-                            
-                        try:
-                            # Value is already an integer, no need to parse
-                            status = value  # Remove the split() and float() conversion
-                            self.logger.info(f"Saving float sensor {sensor_num} - Status: {status}")
-                            
-                            conn.execute(
-                                """INSERT INTO float_sensor_readings 
-                                   (sensor_number, status, created_at) 
-                                   VALUES (?, ?, datetime('now'))""",
-                                (sensor_num, status)
-                            )
-                        except Exception as e:
-                            self.logger.error(f"Error saving float sensor {sensor_num}: {str(e)}")
-                    
-                    # Handle moisture sensors
-                    elif sensor.startswith('M') and not sensor.endswith('_raw'):
-                        sensor_num = int(sensor[1:])
-                        raw_value = readings.get(f"{sensor}_raw")
-                        
-                        if value != 'NC':
-                            conn.execute(
-                                """INSERT INTO moisture_readings 
-                                   (sensor_number, moisture_level, raw_value, created_at) 
-                                   VALUES (?, ?, ?, datetime('now'))""",
-                                (sensor_num, float(value), raw_value)
-                            )
-                            self.logger.info(f"Saved moisture reading for sensor {sensor_num}: {value}% (raw: {raw_value})")
-                
-                self.logger.info("Database save completed")
+            self.cache.update_frame(frame)
+            self.bus.publish('moisture', self.cache.moisture_snapshot())
+            received_at = frame.received_at or time.time()
+            ts = int(received_at)
+            # Same format as SQLite's datetime('now'), which the dashboard compares against
+            created_at = datetime.fromtimestamp(received_at, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+            policy = self.storage_policy
+            now = time.monotonic()
+
+            moisture_rows = []
+            for sensor_num, (level, raw_value) in enumerate(zip(frame.moisture, frame.raw), 1):
+                if level is None:
+                    policy.forget(sensor_num)
+                    continue
+                # Rollups see every sample, including the ones the policy doesn't store
+                self.rollups.add(moisture_series(sensor_num), received_at, level)
+                if policy.store_moisture(sensor_num, level, now):
+                    moisture_rows.append((sensor_num, level, raw_value, created_at, ts))
+
+            float_rows = [
+                (sensor_num, status, created_at, ts)
+                for sensor_num, status in enumerate(frame.floats, 1)
+                if status is not None and policy.store_float(sensor_num, status, now)
+            ]
+            policy.maybe_report(now)
+
+            if float_rows:
+                self.writer.submit_many(
+                    """INSERT INTO float_sensor_readings 
+                       (sensor_number, status, created_at, ts) 
+                       VALUES (?, ?, ?, ?)""",
+                    float_rows
+                )
+            if moisture_rows:
+                self.writer.submit_many(
+                    """INSERT INTO moisture_readings 
+                       (sensor_number, moisture_level, raw_value, created_at, ts) 
+                       VALUES (?, ?, ?, ?, ?)""",
+                    moisture_rows
+                )
+            self.logger.debug("Queued %d moisture and %d float readings", len(moisture_rows), len(float_rows))
         except Exception as e:
             self.logger.error(f"Database error: {str(e)}")
+        for listener in self.frame_listeners:
+            try:
+                listener(frame)
+            except Exception as e:
+                self.logger.error(f"Error in frame listener: {str(e)}")
 
-    def save_watering_event(self, pump_number: int, duration_ms: int):
-        """Log watering event to database"""
+    def save_watering_event(self, pump_number: int, duration_ms: int, source: str = 'manual',
+                            decision: str = 'watered', reason: Optional[str] = None,
+                            moisture_level: Optional[float] = None):
+        """Log watering event to database; automatic decisions that didn't water have duration 0"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    "INSERT INTO watering_events (pump_number, duration_ms, created_at) VALUES (?, ?, ?)",
-                    (pump_number, duration_ms, datetime.now().isoformat())
-                )
-            self.logger.info(f"Logged watering event: Pump {pump_number} for {duration_ms}ms")
+            now = time.time()
+            # UTC like the sensor tables, so range queries and retention treat them alike
+            created_at = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self.writer.submit(
+                """INSERT INTO watering_events
+                   (pump_number, duration_ms, created_at, ts, source, decision, reason, moisture_level)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (pump_number, duration_ms, created_at, int(now),
+                 source, decision, reason, moisture_level)
+            )
+            if decision != 'watered':
+                return
+            self.cache.update_watering(pump_number, duration_ms, now)
+            self.bus.publish('watering', {'pump_number': pump_number, 'duration_ms': duration_ms,
+                                          'ts': now, 'source': source})
+            self.logger.info(f"Logged watering event: Pump {pump_number} for {duration_ms}ms ({source})")
         except Exception as e:
             self.logger.error(f"Error logging watering event: {str(e)}")
 
-    def get_sensor_data(self) -> Dict:
-        """Read latest sensor data from Arduino"""
+    def start_streaming(self) -> SerialFrameReader:
+        """Start the background reader; every frame it receives is saved"""
+        if self.reader is None:
+            self.reader = SerialFrameReader(self.serial, on_frame=self.save_moisture_readings,
+                                            binary=self.binary)
+        return self.reader.start()
+
+    def stop_streaming(self):
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+
+    def frames(self) -> Iterator[SensorFrame]:
+        """Yield every frame from the background reader"""
+        return self.start_streaming().frames()
+
+    def get_sensor_data(self) -> Optional[SensorFrame]:
+        """Read latest sensor frame from Arduino and save it"""
+        if self.reader is not None and self.reader.running:
+            # The reader already saves every frame; just hand back the next one
+            return self.reader.wait_for_frame(timeout=2) or self.reader.latest
+        if self.binary:
+            return self._read_binary_frame()
+
         max_retries = 3
         for attempt in range(max_retries):
             try:
@@ -176,105 +404,81 @@ class ArduinoController:
                 self.serial.reset_input_buffer()
                 self.serial.reset_output_buffer()
                 
-                self.logger.info("Waiting for BEGIN marker...")
-                start_data = self.serial.read_until(b'BEGIN>')
-                self.logger.debug(f"Received start marker data: {start_data}")
+                self.logger.debug("Waiting for BEGIN marker...")
+                start_data = self.serial.read_until(BEGIN_MARKER)
                 
-                if b'BEGIN>' not in start_data:
+                if BEGIN_MARKER not in start_data:
                     raise TimeoutError("Never received BEGIN marker")
                 
                 # Read until end marker
-                data = self.serial.read_until(b'<END').decode('ascii').strip()
-                self.logger.info(f"Raw Arduino data: {data}")
-                
-                readings = {}
-                
-                # First split by comma and clean up each segment
-                segments = [seg.strip() for seg in data.split(',')]
-                self.logger.info(f"Split segments: {segments}")
-                
-                # Process each segment
-                for segment in segments:
-                    self.logger.debug(f"Processing segment: {segment}")
-                    
-                    # Handle moisture readings
-                    if 'M' in segment and '|' in segment:
-                        # Find the position of M and extract from there
-                        moisture_start = segment.find('M')
-                        reading_part = segment[moisture_start:]
-                        
-                        try:
-                            sensor, value = reading_part.split(':', 1)
-                            sensor = sensor.strip()
-                            
-                            if '|' in value:
-                                moisture_value, raw_value = value.split('|')
-                                try:
-                                    readings[sensor] = float(moisture_value)
-                                    readings[f"{sensor}_raw"] = int(raw_value)
-                                    self.logger.info(f"Parsed {sensor}: {readings[sensor]}% (raw: {raw_value})")
-                                except ValueError:
-                                    self.logger.warning(f"Invalid moisture reading: {value}")
-                                    readings[sensor] = 'NC'
-                                    readings[f"{sensor}_raw"] = None
-                        except Exception as e:
-                            self.logger.warning(f"Error parsing moisture reading: {reading_part}, error: {str(e)}")
-                            continue
-                    
-                    # Handle float sensors
-                    elif segment.startswith('F'):
-                        self.logger.info(f"Found float sensor data: {segment}")
-                        try:
-                            sensor, value = segment.split(':', 1)
-                            sensor = sensor.strip()
-                            value = value.split('(')[0].strip()  # Remove debug info in parentheses
-                            
-                            try:
-                                parsed_value = int(float(value))
-                                readings[sensor] = parsed_value
-                                self.logger.info(f"Float sensor {sensor} - Raw value: {value}, Parsed value: {parsed_value}")
-                            except ValueError:
-                                readings[sensor] = 'NC'
-                                self.logger.warning(f"Invalid float sensor value - Raw: {value}")
-                        except Exception as e:
-                            self.logger.error(f"Error parsing float segment '{segment}': {str(e)}")
-                            continue
-                
-                self.logger.info(f"Final readings dictionary: {readings}")
-                
-                # Save readings to database
-                if readings:
-                    self.save_moisture_readings(readings)
-                    self.logger.info("Saved readings to database")
-                else:
+                data = self.serial.read_until(END_MARKER)
+                if not data.endswith(END_MARKER):
+                    raise TimeoutError("Never received END marker")
+                self.logger.debug("Raw Arduino data: %r", data)
+
+                frame = parse_frame(data[:-len(END_MARKER)])
+                if frame is None:
                     self.logger.warning("No readings to save to database")
-                    
-                return readings
+                    return None
+
+                self.save_moisture_readings(frame)
+                return frame
                 
             except Exception as e:
-                self.logger.error(f"Error in get_sensor_data: {str(e)}")
-                return None
+                if attempt == max_retries - 1:
+                    self.logger.error(f"Error in get_sensor_data: {str(e)}")
+                    return None
+                self.logger.warning(f"Error in get_sensor_data (attempt {attempt + 1}): {str(e)}")
+                if isinstance(e, (serial.SerialException, OSError)):
+                    self.reset_connection()
+        return None
 
-    def control_pump(self, pump_number: int, duration_ms: int):
-        """Control a specific water pump"""
+    def _read_binary_frame(self, timeout: float = 2) -> Optional[SensorFrame]:
+        """Read until one binary frame arrives and save it"""
+        reader = SerialFrameReader(self.serial, binary=True)
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline:
+                frames = reader.feed(self.serial.read(self.serial.in_waiting or 1))
+                if frames:
+                    self.save_moisture_readings(frames[-1])
+                    return frames[-1]
+            self.logger.error("No binary frame received")
+        except (serial.SerialException, OSError) as e:
+            self.logger.error(f"Error in get_sensor_data: {str(e)}")
+            self.reset_connection()
+        return None
+
+    def control_pump(self, pump_number: int, duration_ms: int) -> bool:
+        """Control a specific water pump; returns True once the command has been written"""
         try:
             command = f"PUMP:{pump_number}:{duration_ms}\n"
             self.serial.write(command.encode())
+            self.serial.flush()
             self.logger.info(f"Sent pump command: {command.strip()}")
+            return True
         except Exception as e:
             self.logger.error(f"Error controlling pump: {str(e)}")
+            return False
 
     def reset_connection(self):
         """Reset the serial connection to the Arduino"""
         self.logger.info("Resetting Arduino connection...")
+        streaming = self.reader is not None
+        self.stop_streaming()
         try:
             if self.serial.is_open:
                 self.serial.close()
-            time.sleep(1)
-            self.serial = serial.Serial(self.serial.port, self.serial.baudrate, timeout=1)
-            time.sleep(2)  # Wait for Arduino reset
-            self.logger.info("Successfully reset Arduino connection")
+            # The board may come back on a different device path after re-enumerating
+            connection = self.discovery.connect(self.identity) if self.identity else None
+            if connection is None:
+                connection = self._open(self.serial.port, self.baud_rate)
+            self.serial = connection
+            self._negotiate()
+            if streaming:
+                self.start_streaming()
+            self.logger.info(f"Successfully reset Arduino connection on {self.serial.port}")
             return True
         except Exception as e:
             self.logger.error(f"Failed to reset Arduino connection: {str(e)}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,388 @@
+import asyncio
+import logging
+import os
+import signal
+from collections import deque
+from typing import List, Optional
+import aiohttp
+import serial
+from dotenv import load_dotenv
+from database import Database
+from arduino_controller import ArduinoController, SerialFrameReader
+from pulse_poller import BASE_URL, FETCH, FETCH_ERRORS, UNSAVED, parse_device_list, retry_after
+from retention import RetentionManager
+from query_service import QueryService
+from pump_service import PumpCommand, PumpService
+from watering_rules import WateringEngine
+from port_discovery import PortDiscovery, is_identity
+from serial_process import ProcessConnection, ReaderProcess
+from supervisor import Supervisor
+from log_config import setup_logging
+
+
+class AsyncPulseMonitor:
+    """Event-loop based collector.
+
+    Pulse API polling, serial frame ingestion and database flushing all run
+    as tasks on a single asyncio loop, so any number of Pulse devices and
+    Arduino controllers share one process. Pump commands are sent by the
+    pump service's worker thread.
+    """
+
+    def __init__(self, device_ids: Optional[List[str]] = None,
+                 serial_ports: Optional[List[Optional[str]]] = None):
+        self.logger = logging.getLogger('pulse_monitor')
+        load_dotenv()
+
+        self.db_path = os.getenv('DB_PATH', '../pulse_data.db')
+        self.db = Database(self.db_path)
+
+        self.fetch_interval = int(os.getenv('FETCH_INTERVAL', 60))
+        if device_ids is None:
+            self.devices = parse_device_list(
+                os.getenv('PULSE_DEVICE_IDS') or os.getenv('PULSE_DEVICE_ID', ''),
+                self.fetch_interval
+            )
+        else:
+            self.devices = {device_id: self.fetch_interval for device_id in device_ids}
+        self.device_ids = list(self.devices)
+        api_key = os.getenv('PULSE_API_KEY')
+        if not self.device_ids or not api_key:
+            raise ValueError("PULSE_DEVICE_ID and PULSE_API_KEY must be set in .env file")
+
+        self.headers = {
+            "x-api-key": api_key,
+            "Accept": "application/json"
+        }
+        self.request_timeout = float(os.getenv('REQUEST_TIMEOUT', 10))
+        self.base_url = os.getenv('PULSE_BASE_URL') or BASE_URL
+        self.flush_interval = float(os.getenv('DB_FLUSH_INTERVAL', 1.0))
+        self.supervisor = Supervisor(maximum=float(os.getenv('MAX_BACKOFF', 300)))
+        # Readings fetched while the database couldn't take them, oldest dropped first
+        self.unsaved: deque = deque(maxlen=10000)
+        self._save_lock = asyncio.Lock()
+        self.retention = RetentionManager.from_env(self.db_path)
+        self.retention_interval = float(os.getenv('RETENTION_INTERVAL', 3600))
+
+        # None means auto-detect a single board
+        self.serial_ports = serial_ports if serial_ports is not None else (_split_env('ARDUINO_PORTS') or [None])
+        self.controllers: List[ArduinoController] = []
+        # Decode each port in its own process instead of on the event loop
+        self.reader_processes = os.getenv('ARDUINO_READER_PROCESSES', 'false').lower() in ('1', 'true', 'yes')
+        self.ring_poll_interval = float(os.getenv('ARDUINO_RING_POLL', 0.05))
+        self.readers: List[ReaderProcess] = []
+
+        # Serial writes block, so pump commands run on the pump service's worker thread
+        self.pumps = PumpService(self.controllers)
+        self.watering: Optional[WateringEngine] = None
+        query_port = int(os.getenv('QUERY_SERVICE_PORT', 8765))
+        self.query_service = QueryService(
+            self.db.cache, self.db.bus, port=query_port, pumps=self.pumps, supervisor=self.supervisor,
+            db=self.db, max_pump_ms=int(os.getenv('PUMP_MAX_DURATION_MS', 30000)),
+            allowed_origins=[o.strip() for o in os.getenv('QUERY_SERVICE_ORIGINS', '').split(',') if o.strip()]
+        ) if query_port else None
+
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: asyncio.Event = None
+
+    def url_for(self, device_id: str) -> str:
+        return self.base_url.format(device_id=device_id)
+
+    async def submit_pump_command(self, pump_number: int, duration_ms: int, controller: int = 0) -> PumpCommand:
+        """Queue a pump command and wait until it has been sent"""
+        command = self.pumps.submit(pump_number, duration_ms, controller)
+        await asyncio.to_thread(command.wait)
+        return command
+
+    async def pulse_task(self, session: aiohttp.ClientSession, device_id: str):
+        """Poll one Pulse device forever"""
+        url = self.url_for(device_id)
+        source = f"pulse:{device_id}"
+        while True:
+            try:
+                with FETCH.time(device=device_id):
+                    async with session.get(url) as response:
+                        response.raise_for_status()
+                        data = await response.json()
+                self.logger.debug("Pulse %s response: %s", device_id, data)
+                self.supervisor.success(source)
+                if data or self.unsaved:
+                    await self.save_readings([data] if data else [])
+                await asyncio.sleep(max(self.devices[device_id], retry_after(response.headers) or 0))
+            except asyncio.CancelledError:
+                raise
+            except aiohttp.ClientResponseError as e:
+                FETCH_ERRORS.inc(device=device_id, reason=e.status)
+                self.logger.error(f"Error fetching data for device {device_id}: {str(e)}")
+                await asyncio.sleep(self.supervisor.failure(source, e, retry_after(e.headers or {})))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                FETCH_ERRORS.inc(device=device_id, reason=type(e).__name__)
+                self.logger.error(f"Error fetching data for device {device_id}: {str(e)}")
+                await asyncio.sleep(self.supervisor.failure(source, e))
+            except Exception as e:
+                self.logger.error(f"Error in Pulse task for device {device_id}: {str(e)}")
+                await asyncio.sleep(self.supervisor.failure(source, e))
+
+    async def save_readings(self, readings: List[dict]):
+        """Save readings along with any left over from a database outage, off the event loop"""
+        async with self._save_lock:
+            batch = list(self.unsaved) + readings
+            if not batch:
+                return
+            try:
+                # A full write queue blocks the caller for up to the writer's submit timeout
+                await asyncio.to_thread(self.db.save_readings, batch)
+            except RuntimeError as e:
+                # Write queue full: keep the batch and retry it with the next poll
+                self.unsaved = deque(batch, maxlen=self.unsaved.maxlen)
+                UNSAVED.set(len(self.unsaved))
+                self.supervisor.failure('database', e)
+                self.logger.warning(f"Holding {len(self.unsaved)} unsaved reading(s) until the database recovers")
+                return
+            self.unsaved.clear()
+            UNSAVED.set(0)
+            self.supervisor.success('database')
+
+    async def serial_task(self, controller: ArduinoController):
+        """Feed serial bytes into a frame reader as soon as the port is readable, reconnecting on failure"""
+        source = f"serial:{controller.serial.port}"
+        while True:
+            try:
+                await self._read_serial(controller, source)
+            except (serial.SerialException, OSError) as e:
+                delay = self.supervisor.failure(source, e)
+                self.logger.error(f"Serial read failed on {controller.serial.port} ({e}), reconnecting in {delay:.1f}s")
+                # Forget the reader so reset_connection doesn't start a background thread for it
+                controller.reader = None
+                await asyncio.sleep(delay)
+                await asyncio.to_thread(controller.reset_connection)
+
+    async def _read_serial(self, controller: ArduinoController, source: str):
+        loop = asyncio.get_running_loop()
+        reader = SerialFrameReader(controller.serial, on_frame=controller.save_moisture_readings,
+                                  binary=controller.binary)
+        controller.reader = reader
+        port = controller.serial
+
+        try:
+            fd = port.fileno()
+        except Exception:
+            fd = None
+
+        if fd is None:
+            # No pollable descriptor (e.g. Windows): read in short blocking slices
+            while True:
+                data = await asyncio.to_thread(port.read, port.in_waiting or 1)
+                if data:
+                    await asyncio.to_thread(reader.process, data)
+                    self.supervisor.success(source)
+
+        readable = asyncio.Event()
+        loop.add_reader(fd, readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                data = port.read(port.in_waiting)
+                if data:
+                    # Saving a frame can block on a full database write queue
+                    await asyncio.to_thread(reader.process, data)
+                    self.supervisor.success(source)
+        finally:
+            loop.remove_reader(fd)
+
+    async def ring_task(self, controller: ArduinoController, reader: ReaderProcess):
+        """Save the frames a reader process has put in its ring, restarting it if it dies"""
+        source = f"serial:{reader.device}"
+        while True:
+            frames = reader.read()
+            if frames:
+                await asyncio.to_thread(_save_frames, controller, frames)
+                self.supervisor.success(source)
+            if not reader.alive:
+                # A reader that dies at startup (bad path, no permission) is restarted with backoff
+                delay = self.supervisor.failure(source, "reader process exited")
+                await asyncio.sleep(delay)
+                reader.start()
+                continue
+            await asyncio.sleep(self.ring_poll_interval)
+
+    async def flush_task(self):
+        """Periodically wait for the database writer to commit queued rows"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.db.flush, self.flush_interval * 5)
+
+    async def retention_task(self):
+        """Expire old rows and vacuum in the background"""
+        while True:
+            try:
+                await asyncio.to_thread(self.retention.run_once)
+            except Exception as e:
+                self.logger.error(f"Retention pass failed: {str(e)}")
+            await asyncio.sleep(self.retention_interval)
+
+    def resolve_devices(self) -> List[str]:
+        """Device paths of the configured boards, probing where needed"""
+        discovery = PortDiscovery.from_env()
+        if self.serial_ports == ['all']:
+            connections = discovery.connect_all()
+        else:
+            connections = []
+            for port in self.serial_ports:
+                if port is not None and not is_identity(port):
+                    connections.append(port)
+                    continue
+                connection = discovery.connect(port)
+                if connection is not None:
+                    connections.append(connection)
+        devices = []
+        for connection in connections:
+            if isinstance(connection, str):
+                devices.append(connection)
+            else:
+                # The reader process opens the port itself
+                devices.append(connection.port)
+                connection.close()
+        return devices
+
+    async def start_readers(self):
+        protocol = os.getenv('ARDUINO_PROTOCOL', 'text').lower()
+        binary_baud = int(os.getenv('ARDUINO_BINARY_BAUD', 115200))
+        for device in await asyncio.to_thread(self.resolve_devices):
+            reader = ReaderProcess(device, protocol=protocol, binary_baud=binary_baud).start()
+            # Frames are decoded by the reader; the controller saves them and sends pump commands
+            controller = await asyncio.to_thread(
+                ArduinoController, db_path=self.db_path, writer=self.db.writer,
+                connection=ProcessConnection(reader), protocol='text'
+            )
+            self.readers.append(reader)
+            self.controllers.append(controller)
+        self.logger.info(f"Started {len(self.readers)} serial reader process(es)")
+
+    async def connect_controllers(self):
+        if self.reader_processes:
+            await self.start_readers()
+            return
+
+        if self.serial_ports == ['all']:
+            # Probe every candidate port at once and keep each board that answers
+            discovery = PortDiscovery.from_env()
+            connections = await asyncio.to_thread(discovery.connect_all)
+            for connection in connections:
+                controller = await asyncio.to_thread(
+                    ArduinoController, db_path=self.db_path, writer=self.db.writer, connection=connection
+                )
+                self.controllers.append(controller)
+            self.logger.info(f"Found {len(self.controllers)} Arduino controller(s)")
+            return
+
+        for port in self.serial_ports:
+            try:
+                # Port discovery and the Arduino reset delay block, so keep them off the loop
+                controller = await asyncio.to_thread(
+                    ArduinoController, port=port, db_path=self.db_path, writer=self.db.writer
+                )
+                self.controllers.append(controller)
+                self.logger.info(f"Arduino controller on {controller.serial.port} initialized")
+            except Exception as e:
+                self.logger.error(f"Failed to initialize Arduino controller: {str(e)}")
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not supported on Windows; KeyboardInterrupt still cancels asyncio.run
+
+        await self.connect_controllers()
+        self.pumps.start()
+        if self.controllers:
+            # Watering rules apply to the first board's sensors and pumps
+            self.watering = WateringEngine.from_env(self.pumps, self.controllers[0])
+            if self.watering:
+                self.controllers[0].frame_listeners.append(self.watering.on_frame)
+                self.watering.start()
+        if self.query_service:
+            self.query_service.start()
+
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+            self._tasks = [
+                asyncio.create_task(self.pulse_task(session, device_id), name=f"pulse-{device_id}")
+                for device_id in self.device_ids
+            ]
+            if self.readers:
+                self._tasks += [
+                    asyncio.create_task(self.ring_task(controller, reader), name=f"ring-{reader.device}")
+                    for controller, reader in zip(self.controllers, self.readers)
+                ]
+            else:
+                self._tasks += [
+                    asyncio.create_task(self.serial_task(controller), name=f"serial-{controller.serial.port}")
+                    for controller in self.controllers
+                ]
+            self._tasks.append(asyncio.create_task(self.flush_task(), name='db-flush'))
+            self._tasks.append(asyncio.create_task(self.retention_task(), name='retention'))
+            self.logger.info(
+                f"Running {len(self.device_ids)} Pulse device(s) and "
+                f"{len(self.controllers)} Arduino controller(s)"
+            )
+
+            try:
+                await self._stopping.wait()
+            finally:
+                await self.shutdown()
+
+    async def shutdown(self):
+        self.logger.info("Shutting down...")
+        for task in self._tasks:
+            task.cancel()
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        for task, result in zip(self._tasks, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Task {task.get_name()} failed: {str(result)}")
+        self._tasks = []
+
+        if self.query_service:
+            self.query_service.stop()
+        if self.watering:
+            self.watering.stop()
+        await asyncio.to_thread(self.pumps.stop)
+
+        for controller, reader in zip(self.controllers, self.readers):
+            await asyncio.to_thread(reader.stop)
+            for frame in reader.read():
+                controller.save_moisture_readings(frame)
+            reader.close()
+
+        for controller in self.controllers:
+            try:
+                controller.serial.close()
+            except Exception as e:
+                self.logger.error(f"Error closing serial port: {str(e)}")
+
+        self.logger.info("Flushing pending database writes...")
+        await asyncio.to_thread(self.db.close)
+
+
+def _save_frames(controller: ArduinoController, frames):
+    for frame in frames:
+        controller.save_moisture_readings(frame)
+
+
+def _split_env(name: str) -> List[str]:
+    return [value.strip() for value in os.getenv(name, '').split(',') if value.strip()]
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    setup_logging(os.getenv('LOG_FILE', 'pulse_api.log'))
+    asyncio.run(AsyncPulseMonitor().run())
@@ -0,0 +1,144 @@
+import binascii
+import logging
+import struct
+import time
+from typing import List, Optional, Tuple
+import serial
+from frame_parser import FLOAT_SENSORS, MOISTURE_SENSORS, SensorFrame
+
+# Binary frame, as sent by plant_controller.ino once binary mode is negotiated:
+#
+#   A5 5A | length (1) | seq (2, LE) | payload (length) | CRC-16/CCITT (2, LE)
+#
+# The CRC covers length, seq and payload. Payload version 1:
+#   moisture percent x6 (uint8, 0xFF = disconnected)
+#   raw value x6        (uint16 LE, 0xFFFF = disconnected)
+#   float sensors       (uint8 bitmask, bit N-1 = float sensor N)
+SYNC = b'\xa5\x5a'
+HEADER = struct.Struct('<BH')
+PAYLOAD = struct.Struct(f'<{MOISTURE_SENSORS}B{MOISTURE_SENSORS}HB')
+CRC = struct.Struct('<H')
+FRAME_SIZE = len(SYNC) + HEADER.size + PAYLOAD.size + CRC.size
+NC_PERCENT = 0xFF
+NC_RAW = 0xFFFF
+
+DEFAULT_BINARY_BAUD = 115200
+MODE_REQUEST = 'MODE:BIN:{baud}\n'
+MODE_REPLY = b'OK:BIN:'
+
+logger = logging.getLogger('arduino_controller')
+
+
+def crc16(data: bytes, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE, as computed by the firmware's crc16()"""
+    return binascii.crc_hqx(data, crc)
+
+
+def encode_frame(frame: SensorFrame, seq: int) -> bytes:
+    """Binary encoding of a frame; used by the simulator and benchmarks"""
+    percent = [NC_PERCENT if level is None else int(level) for level in frame.moisture]
+    raw = [NC_RAW if level is None or value is None else value
+           for level, value in zip(frame.moisture, frame.raw)]
+    floats = sum(1 << i for i, status in enumerate(frame.floats) if status)
+    body = HEADER.pack(PAYLOAD.size, seq & 0xFFFF) + PAYLOAD.pack(*percent, *raw, floats)
+    return SYNC + body + CRC.pack(crc16(body))
+
+
+def decode_payload(payload: bytes, received_at: float) -> SensorFrame:
+    values = PAYLOAD.unpack(payload)
+    percent = values[:MOISTURE_SENSORS]
+    raw = values[MOISTURE_SENSORS:2 * MOISTURE_SENSORS]
+    floats = values[-1]
+    disconnected = [p == NC_PERCENT or r == NC_RAW for p, r in zip(percent, raw)]
+    return SensorFrame(
+        [None if nc else float(p) for p, nc in zip(percent, disconnected)],
+        [None if nc else r for r, nc in zip(raw, disconnected)],
+        [(floats >> i) & 1 for i in range(FLOAT_SENSORS)],
+        received_at,
+    )
+
+
+class BinaryFrameDecoder:
+    """Cuts binary frames out of a byte stream.
+
+    Frames with a bad CRC or an unexpected length are counted as corrupt and
+    the decoder resynchronises on the next sync word. Gaps in the sequence
+    number count frames that were lost entirely.
+    """
+
+    def __init__(self):
+        self.corrupt = 0
+        self.lost = 0
+        self.last_seq: Optional[int] = None
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes, received_at: Optional[float] = None) -> List[Tuple[int, SensorFrame]]:
+        """Append raw bytes and return (seq, frame) for every frame they complete"""
+        buf = self._buffer
+        buf += data
+        frames = []
+        while True:
+            start = buf.find(SYNC)
+            if start == -1:
+                # Keep a trailing A5 that could be the first half of the sync word
+                del buf[:max(0, len(buf) - 1)]
+                break
+            del buf[:start]
+            if len(buf) < len(SYNC) + HEADER.size:
+                break
+            length, seq = HEADER.unpack_from(buf, len(SYNC))
+            if length != PAYLOAD.size:
+                self.corrupt += 1
+                del buf[:len(SYNC)]
+                continue
+            end = len(SYNC) + HEADER.size + length + CRC.size
+            if len(buf) < end:
+                break
+            body = bytes(buf[len(SYNC):end - CRC.size])
+            if CRC.unpack_from(buf, end - CRC.size)[0] != crc16(body):
+                self.corrupt += 1
+                del buf[:len(SYNC)]
+                continue
+            del buf[:end]
+            self._track(seq)
+            frames.append((seq, decode_payload(body[HEADER.size:],
+                                               time.time() if received_at is None else received_at)))
+        return frames
+
+    def _track(self, seq: int):
+        if self.last_seq is not None:
+            gap = (seq - self.last_seq - 1) & 0xFFFF
+            # A huge gap is the board restarting its counter, not 60k lost frames
+            if gap < 0x8000:
+                self.lost += gap
+        self.last_seq = seq
+
+
+def negotiate(connection: serial.Serial, baud_rate: int = DEFAULT_BINARY_BAUD, timeout: float = 2) -> bool:
+    """Ask the board to switch to binary frames at baud_rate.
+
+    Firmware that doesn't know the request never answers, and the link
+    stays in text mode at its current speed. Opening the port resets the
+    board, so it always starts out in text mode.
+    """
+    connection.reset_input_buffer()
+    connection.write(MODE_REQUEST.format(baud=baud_rate).encode())
+    connection.flush()
+    deadline = time.monotonic() + timeout
+    previous_timeout = connection.timeout
+    connection.timeout = 0.2
+    try:
+        while time.monotonic() < deadline:
+            line = connection.readline().strip()
+            if line.startswith(MODE_REPLY):
+                break
+        else:
+            logger.info(f"{connection.port}: no reply to binary mode request, using text frames")
+            return False
+    finally:
+        connection.timeout = previous_timeout
+    if connection.baudrate != baud_rate:
+        connection.baudrate = baud_rate
+    connection.reset_input_buffer()
+    logger.info(f"{connection.port}: binary frames at {baud_rate} baud")
+    return True
@@ -1,15 +1,37 @@
 import argparse
+import os
+import sys
+import requests
+from dotenv import load_dotenv
 from arduino_controller import ArduinoController
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--pump', type=int, required=True)
     parser.add_argument('--duration', type=int, required=True)
+    parser.add_argument('--controller', type=int, default=0)
     args = parser.parse_args()
 
+    load_dotenv()
+    collector_url = os.getenv('COLLECTOR_URL', 'http://127.0.0.1:8765')
+
+    # The running collector owns the serial port, so send the command through it
+    try:
+        response = requests.post(
+            f"{collector_url}/pump",
+            json={'pump': args.pump, 'duration_ms': args.duration, 'controller': args.controller},
+            timeout=10
+        )
+        print(response.text)
+        sys.exit(0 if response.ok else 1)
+    except requests.ConnectionError:
+        pass
+
+    # No collector running: open the port directly
     controller = ArduinoController()
-    controller.control_pump(args.pump, args.duration)
+    if not controller.control_pump(args.pump, args.duration):
+        sys.exit(1)
     controller.save_watering_event(args.pump, args.duration)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,20 +1,353 @@
 import sqlite3
+import heapq
+from collections import OrderedDict
 import logging
-from datetime import datetime
-from typing import Dict, List
+import queue
+import threading
+import atexit
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
 import os
+from rollups import RESOLUTIONS, get_rollups, pick_resolution
+from latest_cache import get_cache
+from event_bus import get_bus
+from supervisor import Backoff
+from metrics import counter, gauge, histogram
+from downsample import lttb_rows
+from partitions import PARTITIONED_TABLES, catalog, select_range
+
+# Sentinels understood by the writer thread
+_FLUSH = object()
+_STOP = object()
+
+
+DB_WRITE = histogram('db_write_seconds', "Time to commit one batch")
+DB_ROWS = counter('db_rows_written_total', "Rows committed by the writer")
+DB_DROPPED = counter('db_rows_dropped_total', "Rows dropped because the write queue was full")
+DB_FAILURES = counter('db_write_failures_total', "Batches that failed because the database was unavailable")
+
+
+class DatabaseWriter:
+    """Owns the single long-lived write connection to the database.
+
+    Inserts are queued by any thread and written by a background thread in
+    batches with executemany, one transaction per batch. If the database is
+    locked, full or unreachable, rows are held and the batch is retried with
+    backoff instead of being dropped.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 10000, max_pending: int = 50000):
+        self.logger = logging.getLogger('database')
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Rows held in memory while the database is unavailable, before the queue starts filling
+        self.max_pending = max_pending
+        self.outage_since: Optional[float] = None
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._close_hooks = []
+        # Set by close(); seen by the writer thread even when the queue is full
+        self._stopping = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='db-writer', daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def submit(self, query: str, params: Sequence, timeout: float = 5.0) -> bool:
+        """Queue one row for insertion, blocking up to timeout if the queue is full"""
+        return self.submit_many(query, [params], timeout) == 1
+
+    def submit_many(self, query: str, rows: List[Sequence], timeout: float = 5.0) -> int:
+        """Queue rows that will be committed in the same transaction"""
+        self.start()
+        rows = [tuple(params) for params in rows]
+        try:
+            self.queue.put((query, rows), timeout=timeout)
+            return len(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+            DB_DROPPED.inc(len(rows))
+            self.logger.error(f"Write queue full, dropped {len(rows)} row(s) for: {query.split('(')[0].strip()}")
+            return 0
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far has been committed; False on timeout"""
+        if self._thread is None or not self._thread.is_alive():
+            return self.queue.empty()
+        done = threading.Event()
+        started = time.monotonic()
+        try:
+            # The queue stays full while the database is down
+            self.queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(None if timeout is None else max(0.0, timeout - (time.monotonic() - started)))
+
+    def add_close_hook(self, hook):
+        """Call hook() at the start of close(), e.g. to submit buffered rows"""
+        self._close_hooks.append(hook)
+
+    def close(self, timeout: float = 10.0):
+        """Flush remaining rows and stop the writer thread"""
+        for hook in self._close_hooks:
+            try:
+                hook()
+            except Exception as e:
+                self.logger.error(f"Error in writer close hook: {str(e)}")
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        try:
+            self.queue.put_nowait((_STOP, None))
+        except queue.Full:
+            pass  # the writer checks _stopping instead
+        thread.join(timeout)
+        if thread.is_alive():
+            self.logger.error("Database writer did not stop in time, some rows may be lost")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self):
+        conn = None
+        pending = {}
+        count = 0
+        deadline = None
+        waiters = []  # flush() events released by the next successful commit
+        backoff = Backoff(base=0.5, maximum=30)
+        while True:
+            if backoff.failures and count >= self.max_pending:
+                # The database is down and the buffer is full; new rows wait in the queue
+                self._stopping.wait(max(0.0, deadline - time.monotonic()))
+                query = None
+            else:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    query, rows = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    query = None
+
+            stopping = query is _STOP or self._stopping.is_set()
+            if stopping:
+                # Take whatever is still queued along into the last write
+                count += self._drain(pending, waiters)
+            if query is _FLUSH:
+                waiters.append(rows)
+                if not backoff.failures:
+                    deadline = time.monotonic()
+            elif query is not None and query is not _STOP:
+                pending.setdefault(query, []).extend(rows)
+                count += len(rows)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if not (stopping or (count >= self.batch_size and not backoff.failures)
+                    or (deadline is not None and time.monotonic() >= deadline)):
+                continue
+
+            try:
+                conn = conn or self._connect()
+                self._write(conn, pending)
+            except sqlite3.Error as e:
+                # Database unavailable: keep the rows and try again later
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                DB_FAILURES.inc()
+                delay = backoff.next_delay()
+                if backoff.failures == 1:
+                    self.outage_since = time.time()
+                self.logger.error(f"Database write failed, holding {count} row(s), retrying in {delay:.1f}s: {str(e)}")
+                deadline = time.monotonic() + delay
+                if stopping:
+                    self.dropped += count
+                    self.logger.error(f"Stopping with {count} unwritten row(s)")
+                    return
+                continue
+
+            if backoff.failures:
+                self.logger.info(f"Database writes recovered after {time.time() - self.outage_since:.0f}s")
+                backoff.reset()
+                self.outage_since = None
+            pending, count, deadline = {}, 0, None
+            for done in waiters:
+                done.set()
+            waiters = []
+            if stopping:
+                conn.close()
+                return
+
+    def _drain(self, pending: Dict[str, List[tuple]], waiters: List[threading.Event]) -> int:
+        count = 0
+        while True:
+            try:
+                query, rows = self.queue.get_nowait()
+            except queue.Empty:
+                return count
+            if query is _FLUSH:
+                waiters.append(rows)
+            elif query is not _STOP:
+                pending.setdefault(query, []).extend(rows)
+                count += len(rows)
+
+    def _write(self, conn: sqlite3.Connection, pending: Dict[str, List[tuple]]):
+        """Commit pending rows; raises if the database itself is unavailable"""
+        if not pending:
+            return
+        count = sum(len(rows) for rows in pending.values())
+        try:
+            with DB_WRITE.time():
+                with conn:
+                    for query, rows in pending.items():
+                        conn.executemany(query, rows)
+            DB_ROWS.inc(count)
+            self.logger.debug("Committed %d rows", count)
+        except sqlite3.Error as e:
+            if is_outage(e):
+                raise
+            # Retry row by row so one bad row doesn't cost the whole batch
+            self.logger.error(f"Batch write failed, retrying rows individually: {str(e)}")
+            for query, rows in pending.items():
+                for params in rows:
+                    try:
+                        with conn:
+                            conn.execute(query, params)
+                    except sqlite3.Error as row_error:
+                        if is_outage(row_error):
+                            raise
+                        self.logger.error(f"Failed to write row {params}: {str(row_error)}")
+
+
+# Primary SQLite result codes that mean the database is unavailable rather than the rows bad:
+# BUSY, LOCKED, READONLY, IOERR, FULL, CANTOPEN
+_OUTAGE_CODES = {5, 6, 8, 10, 13, 14}
+
+
+def is_outage(error: sqlite3.Error) -> bool:
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in _OUTAGE_CODES
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and any(
+        text in message for text in ('locked', 'busy', 'disk', 'readonly', 'unable to open')
+    )
+
+
+def parse_timestamp(value) -> float:
+    """Convert a stored or API timestamp to epoch seconds; naive times are UTC"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+# Column each time-series table is keyed by, for range and latest queries
+SENSOR_COLUMNS = {
+    'readings': 'device_id',
+    'moisture_readings': 'sensor_number',
+    'float_sensor_readings': 'sensor_number',
+    'watering_events': 'pump_number',
+}
+
+# SQL that derives ts from created_at when migrating rows written before ts existed.
+# watering_events rows from before ts existed stored naive local time; the others stored UTC.
+TS_BACKFILL = {
+    'readings': "strftime('%s', created_at)",
+    'moisture_readings': "strftime('%s', created_at)",
+    'float_sensor_readings': "strftime('%s', created_at)",
+    'watering_events': "strftime('%s', created_at, 'utc')",
+}
+
+
+# Columns added to watering_events for the watering rules' decisions
+WATERING_EVENT_COLUMNS = {
+    'source': "TEXT NOT NULL DEFAULT 'manual'",
+    'decision': "TEXT NOT NULL DEFAULT 'watered'",
+    'reason': "TEXT",
+    'moisture_level': "REAL",
+}
+
+
+# Numeric columns that can be charted with Database.downsample
+CHART_COLUMNS = {
+    'readings': ('temperature_c', 'humidity_rh', 'co2', 'vpd', 'air_pressure', 'dew_point_c'),
+    'moisture_readings': ('moisture_level', 'raw_value'),
+    'float_sensor_readings': ('status',),
+}
+
+
+_writers: Dict[str, DatabaseWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_path: str) -> DatabaseWriter:
+    """Return the shared writer for db_path, creating it on first use"""
+    key = os.path.abspath(db_path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = DatabaseWriter(
+                db_path,
+                batch_size=int(os.getenv('DB_BATCH_SIZE', 500)),
+                flush_interval=float(os.getenv('DB_FLUSH_INTERVAL', 1.0)),
+                max_queue=int(os.getenv('DB_QUEUE_SIZE', 10000)),
+            )
+            _writers[key] = writer
+        return writer
+
+
+gauge('db_queue_depth', "Batches waiting for the database writer",
+      lambda: sum(writer.queue.qsize() for writer in list(_writers.values())))
+
+
+@atexit.register
+def close_writers():
+    """Flush and close every shared writer"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
+
 
 class Database:
     def __init__(self, db_path: str = "../pulse_data.db"):
         self.logger = logging.getLogger('database')
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(console_handler)
-        self.logger.setLevel(logging.INFO)
-        
         self.db_path = db_path
         self.logger.info(f"Initializing database at: {os.path.abspath(db_path)}")
         self.init_db()
+        self.writer = get_writer(db_path).start()
+        self.rollups = get_rollups(self.writer)
+        self.cache = get_cache(db_path)
+        self.bus = get_bus(db_path)
+
+        # Last createdAt saved per device, so unchanged API responses cost nothing
+        self._last_seen: Dict[int, str] = self._load_last_seen()
+        self._last_seen_lock = threading.Lock()
+        self.duplicates_skipped = 0
+
+        # (table, column, sensor, start step, end step, width) -> downsampled points
+        self._downsampled: OrderedDict = OrderedDict()
+        self._downsampled_lock = threading.Lock()
+        self.downsample_cache_size = 256
     
     def init_db(self):
         try:
@@ -26,6 +359,11 @@ class Database:
                 self.logger.debug(f"Schema contents: {schema}")
             
             with sqlite3.connect(self.db_path) as conn:
+                # Only takes effect on a new database; lets retention return free pages
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                # WAL lets the dashboard read while the collector writes
+                conn.execute("PRAGMA journal_mode=WAL")
+                self.migrate(conn)
                 self.logger.info("Executing schema...")
                 conn.executescript(schema)
                 self.logger.info("Schema executed successfully")
@@ -34,49 +372,281 @@ class Database:
             self.logger.error(f"Failed to initialize database: {str(e)}")
             raise
     
+    def migrate(self, conn: sqlite3.Connection):
+        """Bring an existing database up to date before the schema is applied"""
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+        if 'readings' in tables and 'idx_readings_device_created_at' not in indexes:
+            # The unique index can't be built while duplicate polls are present
+            removed = conn.execute("""
+                DELETE FROM readings WHERE id NOT IN (
+                    SELECT MIN(id) FROM readings GROUP BY device_id, created_at
+                )
+            """).rowcount
+            self.logger.info(f"Removed {removed} duplicate reading(s)")
+
+        # Add the epoch ts column, derived from each table's historical created_at format
+        for table, expression in TS_BACKFILL.items():
+            if table not in tables:
+                continue
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if 'ts' not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+                updated = conn.execute(f"UPDATE {table} SET ts = CAST({expression} AS INTEGER)").rowcount
+                self.logger.info(f"Added ts to {updated} row(s) in {table}")
+
+        if 'watering_events' in tables:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(watering_events)")}
+            for column, definition in WATERING_EVENT_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE watering_events ADD COLUMN {column} {definition}")
+
+    def _load_last_seen(self) -> Dict[int, str]:
+        with sqlite3.connect(self.db_path) as conn:
+            return dict(conn.execute(
+                "SELECT device_id, MAX(created_at) FROM readings GROUP BY device_id"
+            ).fetchall())
+
+    READING_COLUMNS = (
+        'temperature_c', 'humidity_rh', 'co2', 'vpd',
+        'air_pressure', 'dew_point_c', 'created_at', 'device_id', 'ts'
+    )
+
+    READING_QUERY = """
+    INSERT INTO readings (
+        temperature_c, humidity_rh, co2, vpd,
+        air_pressure, dew_point_c, created_at, device_id, ts
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(device_id, created_at) DO UPDATE SET
+        temperature_c = excluded.temperature_c,
+        humidity_rh = excluded.humidity_rh,
+        co2 = excluded.co2,
+        vpd = excluded.vpd,
+        air_pressure = excluded.air_pressure,
+        dew_point_c = excluded.dew_point_c
+    """
+
+    @staticmethod
+    def _reading_params(data: Dict) -> tuple:
+        return (
+            data['temperatureC'],
+            data['humidityRh'],
+            data['co2'],
+            data['vpd'],
+            data['airPressure'],
+            data['dpC'],
+            data['createdAt'],
+            data['deviceId'],
+            int(parse_timestamp(data['createdAt']))
+        )
+
     def save_reading(self, data: Dict):
+        self.save_readings([data])
+
+    def save_readings(self, readings: List[Dict]):
+        """Queue a batch of Pulse readings; they are committed together.
+
+        Readings whose createdAt matches the last one saved for the device
+        are skipped, and the unique (device_id, created_at) index turns any
+        remaining repeat into an update instead of a new row.
+        """
         try:
-            query = """
-            INSERT INTO readings (
-                temperature_c, humidity_rh, co2, vpd,
-                air_pressure, dew_point_c, created_at, device_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            self.logger.debug(f"Saving reading: {data}")
-            
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(query, (
-                    data['temperatureC'],
-                    data['humidityRh'],
-                    data['co2'],
-                    data['vpd'],
-                    data['airPressure'],
-                    data['dpC'],
-                    data['createdAt'],
-                    data['deviceId']
-                ))
-                self.logger.info("Reading saved successfully")
+            self.logger.debug("Saving readings: %s", readings)
+            rows = []
+            saved = []
+            previous = {}
+            with self._last_seen_lock:
+                for data in readings:
+                    params = self._reading_params(data)
+                    created_at, device_id = params[6], params[7]
+                    if self._last_seen.get(device_id) == created_at:
+                        self.duplicates_skipped += 1
+                        continue
+                    previous.setdefault(device_id, self._last_seen.get(device_id))
+                    self._last_seen[device_id] = created_at
+                    rows.append(params)
+                    saved.append(data)
+            if not rows:
+                self.logger.debug("No new readings to save")
+                return
+
+            queued = self.writer.submit_many(self.READING_QUERY, rows)
+            if queued < len(rows):
+                # Forget these readings so the next poll retries them
+                with self._last_seen_lock:
+                    self._last_seen.update(previous)
+                raise RuntimeError("Database write queue is full")
+            self.logger.debug("%d reading(s) queued for save", len(rows))
+
+            for data, params in zip(saved, rows):
+                self.rollups.add_reading(data, params[8])
+                row = dict(zip(self.READING_COLUMNS, params))
+                self.cache.update_reading(row)
+                self.bus.publish('reading', row)
                 
         except Exception as e:
             self.logger.error(f"Failed to save reading: {str(e)}")
-            self.logger.error(f"Data: {data}")
+            self.logger.error(f"Data: {readings}")
             raise
     
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued writes to be committed"""
+        return self.writer.flush(timeout)
+
+    def close(self):
+        """Flush pending writes and stop the writer"""
+        self.writer.close()
+
+    def get_series(self, series: str, start, end, resolution: Optional[str] = None) -> List[Dict]:
+        """Min/max/avg/count buckets for one rollup series between two timestamps.
+
+        Without an explicit resolution, the finest one that keeps the result
+        to a chart-sized number of buckets is used.
+        """
+        start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+        resolution = resolution or pick_resolution(start_ts, end_ts)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown rollup resolution: {resolution}")
+        width = RESOLUTIONS[resolution]
+
+        query = f"""
+        SELECT bucket, min_value, max_value, sum_value / count AS avg_value, count
+        FROM rollup_{resolution}
+        WHERE series = ? AND bucket >= ? AND bucket < ?
+        ORDER BY bucket
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.execute(query, (series, int(start_ts // width * width), end_ts))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def list_series(self) -> List[str]:
+        """Every series that has day-level rollups"""
+        with sqlite3.connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT series FROM rollup_day ORDER BY series")]
+
+    def _sensor_column(self, table: str) -> str:
+        try:
+            return SENSOR_COLUMNS[table]
+        except KeyError:
+            raise ValueError(f"Not a time-series table: {table}")
+
+    def _sensors(self, conn: sqlite3.Connection, table: str) -> List[int]:
+        """Distinct sensors of a table, found with one index seek each"""
+        column = self._sensor_column(table)
+        sensors = []
+        sensor = conn.execute(f"SELECT MIN({column}) FROM {table}").fetchone()[0]
+        while sensor is not None:
+            sensors.append(sensor)
+            sensor = conn.execute(
+                f"SELECT MIN({column}) FROM {table} WHERE {column} > ?", (sensor,)
+            ).fetchone()[0]
+        return sensors
+
+    def _columns(self, conn: sqlite3.Connection, table: str) -> List[str]:
+        return [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+
+    def range(self, table: str, start, end, sensor: Optional[int] = None) -> List[Dict]:
+        """Rows of a time-series table with start <= ts < end, oldest first.
+
+        start and end may be epoch seconds or ISO timestamps. Each sensor
+        (device, sensor or pump number) is read with a seek on the table's
+        (sensor, ts) index; without a sensor, all of them are merged by ts.
+        Ranges reaching into archived periods also read the partition files
+        they overlap.
+        """
+        column = self._sensor_column(table)
+        start_ts, end_ts = int(parse_timestamp(start)), int(parse_timestamp(end))
+        query = f"SELECT * FROM {table} WHERE {column} = ? AND ts >= ? AND ts < ? ORDER BY ts"
+        with sqlite3.connect(self.db_path, uri=True) as conn:
+            conn.row_factory = sqlite3.Row
+            if table in PARTITIONED_TABLES and catalog(conn, self.db_path, start_ts, end_ts):
+                where, params = "ts >= ? AND ts < ?", [start_ts, end_ts]
+                if sensor is not None:
+                    where += f" AND {column} = ?"
+                    params.append(sensor)
+                return [dict(row) for row in select_range(
+                    conn, self.db_path, table, self._columns(conn, table), where, params, start_ts, end_ts
+                )]
+            sensors = [sensor] if sensor is not None else self._sensors(conn, table)
+            series = [
+                [dict(row) for row in conn.execute(query, (s, start_ts, end_ts))]
+                for s in sensors
+            ]
+        if len(series) == 1:
+            return series[0]
+        return list(heapq.merge(*series, key=lambda row: row['ts']))
+
+    def latest_per_sensor(self, table: str) -> Dict[int, Dict]:
+        """Most recent row for each sensor of a time-series table in the open period"""
+        column = self._sensor_column(table)
+        query = f"SELECT * FROM {table} WHERE {column} = ? ORDER BY ts DESC LIMIT 1"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            latest = {}
+            for sensor in self._sensors(conn, table):
+                row = conn.execute(query, (sensor,)).fetchone()
+                if row:
+                    latest[sensor] = dict(row)
+            return latest
+
     def get_latest(self) -> Dict:
-        query = "SELECT * FROM readings ORDER BY created_at DESC LIMIT 1"
+        query = "SELECT * FROM readings ORDER BY ts DESC LIMIT 1"
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute(query)
             row = cursor.fetchone()
             return dict(row) if row else None
     
-    def get_daily_readings(self) -> List[Dict]:
-        query = """
-        SELECT * FROM readings 
-        WHERE date(created_at) = date('now')
-        ORDER BY created_at
+    def downsample(self, table: str, column: str, start, end, width: int = 500,
+                   sensor: Optional[int] = None) -> List[List[float]]:
+        """At most `width` [ts, value] points of one column between two timestamps, picked with LTTB.
+
+        Rows are loaded in one pass from the cursor. Results are cached per
+        (series, range, width); the range is rounded to the width of one
+        output point, so repeated chart refreshes of a moving window hit
+        the cache until it has moved by a point.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute(query)
-            return [dict(row) for row in cursor.fetchall()] 
\ No newline at end of file
+        if column not in CHART_COLUMNS.get(table, ()):
+            raise ValueError(f"Not a chartable column: {table}.{column}")
+        start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+        step = max(1.0, (end_ts - start_ts) / max(width, 1))
+        key = (table, column, sensor, int(start_ts // step), int(end_ts // step), width)
+        with self._downsampled_lock:
+            points = self._downsampled.get(key)
+            if points is not None:
+                self._downsampled.move_to_end(key)
+                return points
+
+        where = f"ts >= ? AND ts < ? AND {column} IS NOT NULL"
+        params = [int(start_ts), int(end_ts)]
+        if sensor is not None:
+            where += f" AND {self._sensor_column(table)} = ?"
+            params.append(sensor)
+        with sqlite3.connect(self.db_path, uri=True) as conn:
+            rows = select_range(conn, self.db_path, table, ('ts', column), where, params, start_ts, end_ts)
+
+        points = lttb_rows(rows, width)
+
+        with self._downsampled_lock:
+            self._downsampled[key] = points
+            while len(self._downsampled) > self.downsample_cache_size:
+                self._downsampled.popitem(last=False)
+        return points
+
+    def get_daily_series(self, width: int = 500, device_id: Optional[int] = None) -> Dict[str, List[List[float]]]:
+        """Every Pulse metric since midnight UTC, downsampled to at most width points each"""
+        now = datetime.now(timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return {
+            column: self.downsample('readings', column, midnight.timestamp(), now.timestamp() + 1,
+                                    width, device_id)
+            for column in CHART_COLUMNS['readings']
+        }
+
+    def get_daily_readings(self) -> List[Dict]:
+        """Every reading since midnight UTC"""
+        now = datetime.now(timezone.utc)
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.range('readings', midnight.timestamp(), now.timestamp() + 1)
@@ -0,0 +1,101 @@
+import math
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # The pure Python version gives the same points, only slower
+    np = None
+
+HAVE_NUMPY = np is not None
+
+
+def lttb(x: Sequence[float], y: Sequence[float], threshold: int) -> Tuple[List[float], List[float]]:
+    """Largest-Triangle-Three-Buckets: `threshold` points that keep the shape of (x, y).
+
+    The first and last points are kept; the points in between are split
+    into threshold - 2 buckets and from each bucket the point forming the
+    largest triangle with the previously kept point and the average of the
+    next bucket is kept, which preserves peaks and troughs. x must be
+    sorted. Points whose y is NaN are left out; inputs with no more than
+    threshold points after that are returned as is.
+    """
+    if HAVE_NUMPY:
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        keep = ~np.isnan(y)
+        if not keep.all():
+            x, y = x[keep], y[keep]
+        if threshold >= len(x) or threshold < 3:
+            return x.tolist(), y.tolist()
+        return _lttb_numpy(x, y, threshold)
+    if any(math.isnan(value) for value in y):
+        points = [(a, b) for a, b in zip(x, y) if not math.isnan(b)]
+        x, y = [a for a, _ in points], [b for _, b in points]
+    if threshold >= len(x) or threshold < 3:
+        return list(x), list(y)
+    return _lttb_python(x, y, threshold)
+
+
+def lttb_rows(rows: Sequence[Tuple[float, float]], threshold: int) -> List[List[float]]:
+    """lttb() of (x, y) rows straight from a cursor, as [x, y] points"""
+    if not rows:
+        return []
+    if HAVE_NUMPY:
+        data = np.array(rows, dtype=float)
+        x, y = lttb(data[:, 0], data[:, 1], threshold)
+    else:
+        x, y = lttb([row[0] for row in rows], [float(row[1]) for row in rows], threshold)
+    return [list(point) for point in zip(x, y)]
+
+
+def _bucket_edges(n: int, threshold: int) -> List[int]:
+    """Start index of each of the threshold - 2 middle buckets, plus the final point"""
+    every = (n - 2) / (threshold - 2)
+    return [int(i * every) + 1 for i in range(threshold - 2)] + [n - 1]
+
+
+def _lttb_numpy(x, y, threshold: int) -> Tuple[List[float], List[float]]:
+    n = len(x)
+    edges = np.array(_bucket_edges(n, threshold))
+    # Mean of every bucket in one pass; the last "bucket" is the final point
+    counts = np.diff(np.append(edges, n))
+    avg_x = np.add.reduceat(x, edges) / counts
+    avg_y = np.add.reduceat(y, edges) / counts
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return x[selected].tolist(), y[selected].tolist()
+
+
+def _lttb_python(x: Sequence[float], y: Sequence[float], threshold: int) -> Tuple[List[float], List[float]]:
+    n = len(x)
+    edges = _bucket_edges(n, threshold) + [n]
+    out_x, out_y = [x[0]], [y[0]]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        count = next_end - next_start
+        avg_x = sum(x[next_start:next_end]) / count
+        avg_y = sum(y[next_start:next_end]) / count
+
+        ax, ay = x[a], y[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        out_x.append(x[a])
+        out_y.append(y[a])
+    out_x.append(x[n - 1])
+    out_y.append(y[n - 1])
+    return out_x, out_y
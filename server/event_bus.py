@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from metrics import counter, gauge
+
+STREAM_DROPPED = counter('stream_events_dropped_total', "Events a slow stream client never received")
+
+
+class Subscription:
+    """Bounded per-subscriber buffer; the oldest event is dropped when it is full"""
+
+    def __init__(self, maxsize: int = 100):
+        self._events = deque(maxlen=maxsize)
+        self._ready = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, event: Tuple[str, object]):
+        with self._ready:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+                STREAM_DROPPED.inc()
+            self._events.append(event)
+            self._ready.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[str, object]]:
+        """Next (name, data) event, or None on timeout or once closed"""
+        with self._ready:
+            if not self._events and not self.closed:
+                self._ready.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class EventBus:
+    """Fans collector events out to any number of subscribers.
+
+    Publishing never blocks: each subscriber has its own bounded buffer, so
+    a slow client only loses its own oldest events and never holds up
+    ingestion or other clients.
+    """
+
+    def __init__(self, maxsize: int = 100):
+        self.maxsize = maxsize
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, maxsize: Optional[int] = None) -> Subscription:
+        subscription = Subscription(maxsize or self.maxsize)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+        subscription.close()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, name: str, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put((name, data))
+
+    def close(self):
+        """Wake and detach every subscriber"""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscription in subscribers:
+            subscription.close()
+
+
+_buses: Dict[str, EventBus] = {}
+_buses_lock = threading.Lock()
+
+
+gauge('stream_clients', "Connected live stream subscribers",
+      lambda: sum(bus.subscriber_count for bus in list(_buses.values())))
+
+
+def get_bus(db_path: str) -> EventBus:
+    """Return the shared event bus for the collector writing db_path"""
+    key = os.path.abspath(db_path)
+    with _buses_lock:
+        bus = _buses.get(key)
+        if bus is None:
+            bus = _buses[key] = EventBus(int(os.getenv('STREAM_BUFFER_SIZE', 100)))
+        return bus
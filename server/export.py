@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+from partitions import PARTITIONED_TABLES, catalog, read_only_uri
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for exports
+    pa = None
+
+# Tables exported by default; each has an increasing id and an epoch ts
+EXPORT_TABLES = ('readings', 'moisture_readings', 'float_sensor_readings', 'watering_events')
+
+STATE_FILE = '_export_state.json'
+STATS_FILE = '_stats.json'
+
+
+def arrow_type(declared: str):
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if 'REAL' in declared or 'FLOA' in declared or 'DOUB' in declared:
+        return pa.float64()
+    return pa.string()
+
+
+def iter_chunks(conn: sqlite3.Connection, table: str, after_id: int, chunk_size: int) -> Iterator[List[tuple]]:
+    """Yield rows with id > after_id in id order, chunk_size at a time"""
+    cursor = conn.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id", (after_id,))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+class ParquetExporter:
+    """Streams SQLite tables into day-partitioned Parquet files.
+
+    Rows are read with a cursor chunk_size at a time and appended to the
+    open partition file, so peak memory depends on the chunk size, not the
+    table size. The last exported id per table is stored in the output
+    directory, and each run only exports rows added since then. Archived
+    partitions keep their ids and are read before the main file.
+    """
+
+    def __init__(self, db_path: str, out_dir: str, chunk_size: int = 50000):
+        if pa is None:
+            raise RuntimeError("Parquet export requires pyarrow: pip install pyarrow")
+        self.logger = logging.getLogger('export')
+        self.db_path = db_path
+        self.out_dir = out_dir
+        self.chunk_size = chunk_size
+        self.state_path = os.path.join(out_dir, STATE_FILE)
+
+    def load_state(self) -> Dict[str, int]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def save_state(self, state: Dict[str, int]):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _schema(self, conn: sqlite3.Connection, table: str):
+        columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        return pa.schema([(column[1], arrow_type(column[2])) for column in columns])
+
+    def _load_stats(self, table: str) -> Dict:
+        path = os.path.join(self.out_dir, table, STATS_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_stats(self, table: str, stats: Dict):
+        path = os.path.join(self.out_dir, table, STATS_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _update_stats(partition: Dict, batch) -> None:
+        partition['rows'] = partition.get('rows', 0) + batch.num_rows
+        columns = partition.setdefault('columns', {})
+        for name, column in zip(batch.schema.names, batch.columns):
+            if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+                continue
+            result = pc.min_max(column)
+            low, high = result['min'].as_py(), result['max'].as_py()
+            if low is None:
+                continue
+            current = columns.get(name)
+            if current is None:
+                columns[name] = {'min': low, 'max': high}
+            else:
+                current['min'] = min(current['min'], low)
+                current['max'] = max(current['max'], high)
+
+    def export_table(self, conn: sqlite3.Connection, table: str, after_id: int) -> Tuple[int, int]:
+        """Export rows newer than after_id; returns the new high-water mark and row count"""
+        schema = self._schema(conn, table)
+        names = schema.names
+        ts_index = names.index('ts')
+        id_index = names.index('id')
+        stats = self._load_stats(table)
+
+        writers = {}  # day -> open ParquetWriter
+        last_id = after_id
+        exported = 0
+        try:
+            for rows in iter_chunks(conn, table, after_id, self.chunk_size):
+                by_day: Dict[str, List[tuple]] = {}
+                for row in rows:
+                    day = datetime.fromtimestamp(row[ts_index] or 0, timezone.utc).strftime('%Y-%m-%d')
+                    by_day.setdefault(day, []).append(row)
+
+                for day, day_rows in by_day.items():
+                    batch = pa.RecordBatch.from_arrays(
+                        [pa.array(column, type=field.type) for column, field in zip(zip(*day_rows), schema)],
+                        schema=schema
+                    )
+                    if day not in writers:
+                        # Rows arrive in time order, so earlier days are complete
+                        for open_day in [d for d in writers if d < day]:
+                            writers.pop(open_day).close()
+                        partition_dir = os.path.join(self.out_dir, table, f"date={day}")
+                        os.makedirs(partition_dir, exist_ok=True)
+                        path = os.path.join(partition_dir, f"part-{day_rows[0][id_index]:012d}.parquet")
+                        writers[day] = pq.ParquetWriter(path, schema, compression='zstd')
+                    writers[day].write_batch(batch)
+                    self._update_stats(stats.setdefault(day, {}), batch)
+
+                last_id = rows[-1][id_index]
+                exported += len(rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        if exported:
+            self._save_stats(table, stats)
+        self.logger.info(f"Exported {exported} row(s) from {table}")
+        return last_id, exported
+
+    def run(self, tables=EXPORT_TABLES) -> Dict[str, int]:
+        """Incrementally export each table; returns rows exported per table"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        state = self.load_state()
+        exported = {}
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for table in tables:
+                exported[table] = 0
+                parts = catalog(conn, self.db_path) if table in PARTITIONED_TABLES else []
+                for path in [part['path'] for part in parts] + [None]:
+                    source = conn if path is None else sqlite3.connect(read_only_uri(path), uri=True)
+                    try:
+                        state[table], count = self.export_table(source, table, state.get(table, 0))
+                    finally:
+                        if source is not conn:
+                            source.close()
+                    exported[table] += count
+                    # Save after every source so an interrupted run resumes where it stopped
+                    self.save_state(state)
+        finally:
+            conn.close()
+        return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sensor history to day-partitioned Parquet files")
+    parser.add_argument('--db', default=os.getenv('DB_PATH', '../pulse_data.db'))
+    parser.add_argument('--out', default=os.getenv('EXPORT_DIR', '../export'))
+    parser.add_argument('--table', action='append', choices=EXPORT_TABLES,
+                        help="Table to export (repeatable, default: all)")
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--full', action='store_true',
+                        help="Delete previous exports of the selected tables and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    tables = args.table or EXPORT_TABLES
+    exporter = ParquetExporter(args.db, args.out, args.chunk_size)
+    if args.full:
+        state = exporter.load_state()
+        for table in tables:
+            state.pop(table, None)
+            shutil.rmtree(os.path.join(args.out, table), ignore_errors=True)
+        if os.path.isdir(args.out):
+            exporter.save_state(state)
+    exporter.run(tables)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import re
+import time
+from typing import Iterator, List, Optional
+
+# Channel layout from plant_controller.ino
+MOISTURE_SENSORS = 6
+FLOAT_SENSORS = 2
+WATER_PUMPS = 8  # 6 plant pumps + 2 humidity tray pumps
+
+BEGIN_MARKER = b'BEGIN>'
+END_MARKER = b'<END'
+
+# One channel reading, e.g. "M3:42|517", "M4:NC" or "F1:1 (Pin 2 = 0)"
+_CHANNEL = re.compile(rb'([MF])(\d+):\s*(NC|-?\d+(?:\.\d+)?)(?:\|(-?\d+))?')
+_DEBUG_LINE = re.compile(rb'DEBUG:[^\n]*')
+
+
+class SensorFrame:
+    """Decoded contents of one BEGIN>...<END frame.
+
+    Channels are stored by position (sensor N at index N-1); disconnected or
+    missing channels are None.
+    """
+
+    __slots__ = ('moisture', 'raw', 'floats', 'received_at')
+
+    def __init__(self, moisture: Optional[List] = None, raw: Optional[List] = None,
+                 floats: Optional[List] = None, received_at: float = 0.0):
+        self.moisture = moisture if moisture is not None else [None] * MOISTURE_SENSORS
+        self.raw = raw if raw is not None else [None] * MOISTURE_SENSORS
+        self.floats = floats if floats is not None else [None] * FLOAT_SENSORS
+        self.received_at = received_at
+
+    def __eq__(self, other):
+        if not isinstance(other, SensorFrame):
+            return NotImplemented
+        return (self.moisture == other.moisture and self.raw == other.raw
+                and self.floats == other.floats)
+
+    def __repr__(self):
+        return f"SensorFrame(moisture={self.moisture}, raw={self.raw}, floats={self.floats})"
+
+    def as_dict(self) -> dict:
+        """Legacy readings dict: M1, M1_raw, ..., F1, F2 with 'NC' for disconnected channels"""
+        readings = {}
+        for i, (level, raw) in enumerate(zip(self.moisture, self.raw), 1):
+            readings[f"M{i}"] = 'NC' if level is None else level
+            readings[f"M{i}_raw"] = raw
+        for i, status in enumerate(self.floats, 1):
+            readings[f"F{i}"] = 'NC' if status is None else status
+        return readings
+
+
+def parse_frame(body: bytes, received_at: Optional[float] = None) -> Optional[SensorFrame]:
+    """Decode the bytes between BEGIN> and <END into a SensorFrame.
+
+    DEBUG: lines and the float sensors' "(Pin N = x)" suffix are ignored.
+    Returns None if the body contains no channel readings.
+    """
+    if b'DEBUG:' in body:
+        body = _DEBUG_LINE.sub(b'', body)
+
+    moisture = [None] * MOISTURE_SENSORS
+    raw = [None] * MOISTURE_SENSORS
+    floats = [None] * FLOAT_SENSORS
+    found = False
+
+    for kind, number, value, raw_value in _CHANNEL.findall(body):
+        index = int(number) - 1
+        if kind == b'M':
+            if 0 <= index < MOISTURE_SENSORS:
+                found = True
+                # A percentage without a raw value is a truncated reading
+                if value != b'NC' and raw_value:
+                    moisture[index] = float(value)
+                    raw[index] = int(raw_value)
+        elif 0 <= index < FLOAT_SENSORS:
+            found = True
+            if value != b'NC':
+                floats[index] = int(float(value))
+
+    if not found:
+        return None
+    return SensorFrame(moisture, raw, floats,
+                       time.time() if received_at is None else received_at)
+
+
+def split_frames(data: bytes) -> Iterator[bytes]:
+    """Yield the body of every complete frame in a captured byte stream"""
+    start = data.find(BEGIN_MARKER)
+    while start != -1:
+        start += len(BEGIN_MARKER)
+        end = data.find(END_MARKER, start)
+        if end == -1:
+            return
+        # A BEGIN> inside the body means the previous frame was cut short
+        restart = data.rfind(BEGIN_MARKER, start, end)
+        if restart != -1:
+            start = restart + len(BEGIN_MARKER)
+        yield data[start:end]
+        start = data.find(BEGIN_MARKER, end + len(END_MARKER))
+
+
+def parse_capture(data: bytes) -> Iterator[SensorFrame]:
+    """Parse every valid frame in a recorded serial capture"""
+    for body in split_frames(data):
+        frame = parse_frame(body, received_at=0.0)
+        if frame is not None:
+            yield frame
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+FLOAT_SENSORS = 2
+
+
+def _utc_text(ts: float) -> str:
+    # Same format as SQLite's datetime('now'), which the dashboard already parses
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LatestCache:
+    """Thread-safe latest value of every channel the collector ingests.
+
+    Holds the newest Pulse reading per device, the newest value of each
+    moisture and float sensor, and the last watering of each pump, so hot
+    dashboard reads never have to touch the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readings: Dict[int, Dict] = {}
+        self._moisture: Dict[int, Dict] = {}
+        self._floats: Dict[int, Dict] = {}
+        self._watering: Dict[int, Dict] = {}
+
+    def update_reading(self, row: Dict):
+        """Store a Pulse reading shaped like a readings row"""
+        with self._lock:
+            current = self._readings.get(row['device_id'])
+            if current is None or row['ts'] >= current['ts']:
+                self._readings[row['device_id']] = row
+
+    def update_frame(self, frame):
+        """Store every channel of a SensorFrame; disconnected channels are cleared"""
+        ts = frame.received_at or time.time()
+        created_at = _utc_text(ts)
+        with self._lock:
+            for sensor, (level, raw_value) in enumerate(zip(frame.moisture, frame.raw), 1):
+                if level is None:
+                    self._moisture.pop(sensor, None)
+                else:
+                    self._moisture[sensor] = {
+                        'sensor_number': sensor,
+                        'moisture_level': level,
+                        'raw_value': raw_value,
+                        'created_at': created_at,
+                        'ts': ts,
+                    }
+            for sensor, status in enumerate(frame.floats, 1):
+                if status is None:
+                    self._floats.pop(sensor, None)
+                else:
+                    self._floats[sensor] = {
+                        'sensor_number': sensor,
+                        'status': status,
+                        'created_at': created_at,
+                        'ts': ts,
+                    }
+
+    def update_watering(self, pump_number: int, duration_ms: int, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            self._watering[pump_number] = {
+                'pump_number': pump_number,
+                'duration_ms': duration_ms,
+                'created_at': _utc_text(ts),
+                'ts': ts,
+            }
+
+    def latest_reading(self, device_id: Optional[int] = None) -> Optional[Dict]:
+        with self._lock:
+            if device_id is not None:
+                return self._readings.get(device_id)
+            if not self._readings:
+                return None
+            return max(self._readings.values(), key=lambda row: row['ts'])
+
+    def readings(self) -> List[Dict]:
+        with self._lock:
+            return [self._readings[device_id] for device_id in sorted(self._readings)]
+
+    def moisture(self, max_age: Optional[float] = None) -> List[Dict]:
+        """Current moisture sensors, optionally only those heard from within max_age seconds"""
+        oldest = time.time() - max_age if max_age is not None else None
+        with self._lock:
+            return [
+                row for sensor, row in sorted(self._moisture.items())
+                if oldest is None or row['ts'] >= oldest
+            ]
+
+    def floats(self, max_age: Optional[float] = None) -> List[Dict]:
+        oldest = time.time() - max_age if max_age is not None else None
+        with self._lock:
+            return [
+                row for sensor, row in sorted(self._floats.items())
+                if oldest is None or row['ts'] >= oldest
+            ]
+
+    def moisture_snapshot(self, max_age: Optional[float] = None) -> Dict:
+        """Current sensors in the same shape as the dashboard's /api/moisture"""
+        float_sensors = [False] * FLOAT_SENSORS
+        for row in self.floats(max_age):
+            if 1 <= row['sensor_number'] <= FLOAT_SENSORS:
+                float_sensors[row['sensor_number'] - 1] = row['status'] == 1
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'readings': self.moisture(max_age),
+            'float_sensors': float_sensors,
+        }
+
+    def watering(self) -> List[Dict]:
+        with self._lock:
+            return [self._watering[pump] for pump in sorted(self._watering)]
+
+
+_caches: Dict[str, LatestCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(db_path: str) -> LatestCache:
+    """Return the shared latest-value cache for the collector writing db_path"""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = LatestCache()
+        return cache
@@ -0,0 +1,108 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from typing import Dict, Optional
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _gzip_namer(name: str) -> str:
+    return name + '.gz'
+
+
+def _gzip_rotator(source: str, dest: str):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def parse_levels(value: str) -> Dict[str, int]:
+    """'database=WARNING,arduino_controller=DEBUG' -> {logger name: level}"""
+    levels = {}
+    for item in value.split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def file_handler(path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5,
+                 when: Optional[str] = None) -> logging.Handler:
+    """Rotating log file; rotated files are gzipped.
+
+    Rotates by size unless `when` is given (e.g. 'midnight', 'H'), in which
+    case it rotates by time like TimedRotatingFileHandler.
+    """
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backups)
+    else:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging(log_file: Optional[str] = None, level: Optional[str] = None):
+    """Route every logger through one queue drained by a background thread.
+
+    Loggers only put records on an in-memory queue, so the serial, API and
+    writer threads never wait on the console or disk; the listener thread
+    formats and writes them to stderr and the rotating log file. Safe to
+    call more than once; only the first call configures anything.
+
+    Environment: LOG_LEVEL, LOG_LEVELS (per-logger overrides),
+    LOG_MAX_BYTES, LOG_BACKUPS and LOG_ROTATE_WHEN.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(file_handler(
+            log_file,
+            max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+            backups=int(os.getenv('LOG_BACKUPS', 5)),
+            when=os.getenv('LOG_ROTATE_WHEN') or None,
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    for name, logger_level in parse_levels(os.getenv('LOG_LEVELS', '')).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Write out queued records and stop the background thread.
+
+    Anything logged afterwards (e.g. by other exit handlers) is written
+    directly by the same handlers instead of being lost.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
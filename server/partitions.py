@@ -0,0 +1,315 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.request import pathname2url
+
+# Raw tables whose closed periods move out of the main database file
+PARTITIONED_TABLES = ('readings', 'moisture_readings', 'float_sensor_readings')
+
+# Partitions ATTACHed to one connection at a time; SQLite's default limit is 10
+MAX_ATTACHED = 8
+
+SCHEMES = ('month', 'week')
+
+
+def period_of(ts: float, scheme: str = 'month') -> Tuple[str, int, int]:
+    """(name, start, end) of the UTC month or ISO week containing ts"""
+    moment = datetime.fromtimestamp(ts, timezone.utc)
+    if scheme == 'month':
+        start = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + timedelta(days=32)).replace(day=1)
+        name = start.strftime('%Y-%m')
+    elif scheme == 'week':
+        start = (moment - timedelta(days=moment.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=7)
+        year, week, _ = start.isocalendar()
+        name = f"{year}-W{week:02d}"
+    else:
+        raise ValueError(f"Unknown partition scheme: {scheme}")
+    return name, int(start.timestamp()), int(end.timestamp())
+
+
+def partition_path(db_path: str, name: str) -> str:
+    """File of one partition, next to the main database: pulse_data.2026-09.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.{name}{ext or '.db'}"
+
+
+def catalog(conn: sqlite3.Connection, db_path: str, start_ts: Optional[float] = None,
+            end_ts: Optional[float] = None) -> List[Dict]:
+    """Partitions overlapping [start_ts, end_ts), oldest first; all of them without a range"""
+    query = "SELECT name, path, start_ts, end_ts, rows, bytes FROM main.partitions"
+    params = []
+    if start_ts is not None and end_ts is not None:
+        query += " WHERE end_ts > ? AND start_ts < ?"
+        params = [start_ts, end_ts]
+    try:
+        rows = conn.execute(query + " ORDER BY start_ts", params).fetchall()
+    except sqlite3.OperationalError:
+        return []  # A database from before partitioning
+    directory = os.path.dirname(os.path.abspath(db_path))
+    return [
+        {'name': name, 'path': os.path.join(directory, path), 'start_ts': start, 'end_ts': end,
+         'rows': count, 'bytes': size}
+        for name, path, start, end, count, size in rows
+    ]
+
+
+def archived_until(conn: sqlite3.Connection) -> int:
+    """End of the newest partition; rows before it in the main file have been moved out"""
+    try:
+        return conn.execute("SELECT COALESCE(MAX(end_ts), 0) FROM main.partitions").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+
+def read_only_uri(path: str) -> str:
+    # immutable: closed partitions never change, so SQLite can skip locking them
+    return f"file:{pathname2url(path)}?mode=ro&immutable=1"
+
+
+def _attach_read_only(conn: sqlite3.Connection, path: str, schema: str):
+    conn.execute("ATTACH DATABASE ? AS " + schema, (read_only_uri(path),))
+
+
+def select_range(conn: sqlite3.Connection, db_path: str, table: str, columns: Sequence[str],
+                 where: str, params: Sequence, start_ts: float, end_ts: float,
+                 order_by: Optional[str] = 'ts') -> List[tuple]:
+    """Rows of table from the main file and every partition overlapping [start_ts, end_ts).
+
+    The partitions are ATTACHed read-only, MAX_ATTACHED at a time, and read
+    with one UNION ALL per batch, oldest first; where and params apply to
+    every part, and rows the main file still holds for archived periods are
+    skipped. The connection must be opened with uri=True. order_by sorts
+    within a batch, which is enough for ts since batches follow each other
+    in time. Columns a partition is missing (added to the table after it
+    was closed) read as NULL.
+    """
+    if table in PARTITIONED_TABLES:
+        parts, boundary = catalog(conn, db_path, start_ts, end_ts), archived_until(conn)
+    else:
+        parts, boundary = [], 0
+    sources = [part['path'] for part in parts]
+    if end_ts > boundary:
+        sources.append(None)
+
+    rows = []
+    for offset in range(0, len(sources), MAX_ATTACHED):
+        batch = sources[offset:offset + MAX_ATTACHED]
+        schemas = []
+        try:
+            selects = []
+            for index, path in enumerate(batch):
+                if path is None:
+                    schema, clause = 'main', f"({where}) AND ts >= {int(boundary)}"
+                else:
+                    schema, clause = f"part{index}", where
+                    _attach_read_only(conn, path, schema)
+                    schemas.append(schema)
+                present = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+                if not present:
+                    continue
+                selected = ', '.join(column if column in present else f"NULL AS {column}" for column in columns)
+                selects.append(f"SELECT {selected} FROM {schema}.{table} WHERE {clause}")
+            if not selects:
+                continue
+            query = ' UNION ALL '.join(selects)
+            if order_by:
+                query += f" ORDER BY {order_by}"
+            rows.extend(conn.execute(query, list(params) * len(selects)).fetchall())
+        finally:
+            for schema in schemas:
+                conn.execute(f"DETACH DATABASE {schema}")
+    return rows
+
+
+def _create_in(conn: sqlite3.Connection, schema: str, table: str):
+    """Create table and its indexes in an attached schema, as they are defined in main"""
+    sql = conn.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0]
+    conn.execute(re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?["`]?\w+["`]?',
+                        f"CREATE TABLE {schema}.{table}", sql, flags=re.IGNORECASE))
+    return [
+        re.sub(r'^CREATE\s+(UNIQUE\s+)?INDEX\s+(IF NOT EXISTS\s+)?["`]?(\w+)["`]?',
+               lambda m: f"CREATE {m.group(1) or ''}INDEX {schema}.{m.group(3)}", index_sql, flags=re.IGNORECASE)
+        for (index_sql,) in conn.execute(
+            "SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        )
+    ]
+
+
+class PartitionManager:
+    """Moves each closed month (or week) of raw readings into its own file.
+
+    The collector always writes to the main database, which then only holds
+    the open period, so its indexes stay small and inserts cost the same
+    however much history there is. Once a period has been closed for
+    `grace` seconds its rows are copied into pulse_data.<period>.db, which
+    is compacted with VACUUM and made read-only, registered in the
+    partitions table, and then deleted from the main file in small slices.
+    Dropping a partition is a file delete.
+    """
+
+    def __init__(self, db_path: str, scheme: str = 'month', grace: float = 86400,
+                 slice_rows: int = 500, pause: float = 0.05):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown partition scheme: {scheme}")
+        self.logger = logging.getLogger('partitions')
+        self.db_path = db_path
+        self.scheme = scheme
+        self.grace = grace
+        self.slice_rows = slice_rows
+        self.pause = pause
+
+    @classmethod
+    def from_env(cls, db_path: str) -> Optional['PartitionManager']:
+        """A manager for DB_PARTITION (month or week), or None when partitioning is off"""
+        scheme = os.getenv('DB_PARTITION', '').strip().lower()
+        if scheme in ('', 'none', 'off'):
+            return None
+        return cls(db_path, scheme, grace=float(os.getenv('PARTITION_GRACE_HOURS', 24)) * 3600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.isolation_level = None  # transactions are explicit
+        return conn
+
+    def _oldest(self, conn: sqlite3.Connection, boundary: int) -> Optional[int]:
+        """Oldest ts in the main file that hasn't been archived yet"""
+        oldest = None
+        for table in PARTITIONED_TABLES:
+            # Rows are inserted in time order, so the lowest id is the oldest
+            row = conn.execute(
+                f"SELECT ts FROM {table} WHERE ts >= ? ORDER BY id LIMIT 1", (boundary,)
+            ).fetchone()
+            if row is not None and (oldest is None or row[0] < oldest):
+                oldest = row[0]
+        return oldest
+
+    def closed_periods(self, conn: sqlite3.Connection, now: float) -> List[Tuple[str, int, int]]:
+        """Periods with rows in the main file that ended at least grace seconds ago"""
+        periods = []
+        oldest = self._oldest(conn, archived_until(conn))
+        while oldest is not None:
+            period = period_of(oldest, self.scheme)
+            if period[2] + self.grace > now:
+                break
+            periods.append(period)
+            oldest = self._oldest(conn, period[2])
+        return periods
+
+    def archive(self, conn: sqlite3.Connection, name: str, start_ts: int, end_ts: int) -> int:
+        """Copy one period into its compacted, read-only partition file and register it"""
+        path = partition_path(self.db_path, name)
+        tmp_path = path + '.tmp'
+        for stale in (tmp_path, tmp_path + '-journal'):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+        conn.execute("ATTACH DATABASE ? AS part", (tmp_path,))
+        try:
+            rows = 0
+            conn.execute("BEGIN")
+            for table in PARTITIONED_TABLES:
+                indexes = _create_in(conn, 'part', table)
+                rows += conn.execute(
+                    f"INSERT INTO part.{table} SELECT * FROM main.{table} WHERE ts >= ? AND ts < ? ORDER BY id",
+                    (start_ts, end_ts)
+                ).rowcount
+                # Built after the copy, so each index is written once, in order
+                for index_sql in indexes:
+                    conn.execute(index_sql)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute("DETACH DATABASE part")
+
+        part = sqlite3.connect(tmp_path)
+        try:
+            part.execute("VACUUM")
+        finally:
+            part.close()
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO partitions (name, path, start_ts, end_ts, rows, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, os.path.basename(path), start_ts, end_ts, rows, os.path.getsize(path))
+            )
+        self.logger.info(f"Archived {rows} row(s) of {name} into {os.path.basename(path)} "
+                         f"({os.path.getsize(path) / 1e6:.1f} MB)")
+        return rows
+
+    def release(self, conn: sqlite3.Connection, stop: Optional[threading.Event] = None) -> int:
+        """Delete rows of archived periods from the main file, a slice at a time"""
+        boundary = archived_until(conn)
+        deleted = 0
+        for table in PARTITIONED_TABLES:
+            while not (stop and stop.is_set()):
+                removed = conn.execute(f"""
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM {table} WHERE ts < ? ORDER BY id LIMIT ?
+                    )""", (boundary, self.slice_rows)).rowcount
+                deleted += removed
+                if removed < self.slice_rows:
+                    break
+                time.sleep(self.pause)
+        return deleted
+
+    def run_once(self, stop: Optional[threading.Event] = None, now: Optional[float] = None) -> Dict:
+        """Archive every closed period and release its rows; returns a report"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            archived = {}
+            # Rows an interrupted run left behind, or that arrived after their period was archived
+            released = self.release(conn, stop)
+            if released:
+                self.logger.warning(f"Dropped {released} row(s) of already archived periods from the main file")
+            for name, start_ts, end_ts in self.closed_periods(conn, now):
+                if stop and stop.is_set():
+                    break
+                archived[name] = self.archive(conn, name, start_ts, end_ts)
+                removed = self.release(conn, stop)
+                if removed > archived[name]:
+                    self.logger.warning(
+                        f"{removed - archived[name]} row(s) arrived for periods before {name} "
+                        f"after they were archived and were dropped"
+                    )
+                released += removed
+        finally:
+            conn.close()
+        return {'archived': archived, 'released': released}
+
+    def drop_before(self, conn: sqlite3.Connection, cutoff: float, keep_from: Optional[float] = None) -> List[str]:
+        """Delete the partitions that ended before cutoff.
+
+        Partitions starting before keep_from are kept (retention passes the
+        first rollup bucket, so raw rows that were never summarised survive).
+        """
+        dropped = []
+        for part in catalog(conn, self.db_path):
+            if part['end_ts'] > cutoff:
+                break
+            if keep_from is not None and part['start_ts'] < keep_from:
+                continue
+            with conn:
+                conn.execute("DELETE FROM partitions WHERE name = ?", (part['name'],))
+            if os.path.exists(part['path']):
+                os.chmod(part['path'], 0o644)
+                os.remove(part['path'])
+            dropped.append(part['name'])
+            self.logger.info(f"Dropped partition {part['name']} ({part['rows']} row(s))")
+        return dropped
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import serial
+import serial.tools.list_ports
+
+# USB vendor ids of Arduino boards and the usual USB-serial bridges on clones
+ARDUINO_VIDS = {0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4}
+
+# Lines that show the sketch is running: the startup banner or the start of a frame
+READY_LINES = (b'READY', b'BEGIN>')
+
+_IDENTITY = re.compile(r'^[0-9a-f]{4}:[0-9a-f]{4}(:.*)?$', re.IGNORECASE)
+
+
+def port_identity(port) -> Optional[str]:
+    """Stable 'vid:pid:serial' name for a USB port, or None for non-USB ports"""
+    if port.vid is None:
+        return None
+    identity = f"{port.vid:04x}:{port.pid:04x}"
+    return f"{identity}:{port.serial_number}" if port.serial_number else identity
+
+
+def is_identity(value: Optional[str]) -> bool:
+    return bool(value) and bool(_IDENTITY.match(value))
+
+
+def is_candidate(port) -> bool:
+    if port.vid in ARDUINO_VIDS:
+        return True
+    if sys.platform.startswith('win'):
+        # On Windows, Arduino usually shows up as "USB Serial Device"
+        return "USB Serial" in (port.description or '')
+    # On Linux/Mac, look for ACM or USB devices
+    return "ACM" in port.device or "USB" in port.device
+
+
+def wait_until_ready(connection: serial.Serial, timeout: float) -> bool:
+    """Read lines until the sketch announces itself or timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = connection.readline().strip()
+        if line in READY_LINES:
+            return True
+    return False
+
+
+class PortDiscovery:
+    """Finds Arduino boards by USB identity.
+
+    The identity (vid:pid:serial) of every board that answered is saved to
+    a small JSON file with the device path it was last seen on. Known boards
+    are looked up by identity without probing; unknown candidates are probed
+    in parallel. A probed port is handed back still open, so the caller
+    doesn't pay for a second reset.
+    """
+
+    def __init__(self, cache_path: str, baud_rate: int = 9600, probe_timeout: float = 4):
+        self.logger = logging.getLogger('port_discovery')
+        self.cache_path = cache_path
+        self.baud_rate = baud_rate
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, baud_rate: int = 9600) -> 'PortDiscovery':
+        return cls(
+            os.getenv('ARDUINO_PORT_CACHE', '../.arduino_ports.json'),
+            baud_rate=baud_rate,
+            probe_timeout=float(os.getenv('ARDUINO_PROBE_TIMEOUT', 4)),
+        )
+
+    def load(self) -> Dict[str, str]:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def remember(self, identity: Optional[str], device: str):
+        if identity is None:
+            return
+        with self._lock:
+            known = self.load()
+            if known.get(identity) == device:
+                return
+            known[identity] = device
+            try:
+                with open(self.cache_path + '.tmp', 'w') as f:
+                    json.dump(known, f, indent=2)
+                os.replace(self.cache_path + '.tmp', self.cache_path)
+            except OSError as e:
+                self.logger.warning(f"Could not save port cache: {str(e)}")
+
+    def identity_of(self, device: str) -> Optional[str]:
+        for port in serial.tools.list_ports.comports():
+            if port.device == device:
+                return port_identity(port)
+        return None
+
+    def open(self, device: str, timeout: Optional[float] = None) -> Optional[serial.Serial]:
+        """Open a port and wait for the sketch; returns the open connection or None"""
+        try:
+            connection = serial.Serial(device, self.baud_rate, timeout=0.2)
+        except (serial.SerialException, OSError) as e:
+            self.logger.warning(f"Failed to open {device}: {str(e)}")
+            return None
+        if wait_until_ready(connection, self.probe_timeout if timeout is None else timeout):
+            connection.timeout = 1
+            return connection
+        connection.close()
+        self.logger.debug(f"No Arduino answered on {device}")
+        return None
+
+    def _probe_all(self, ports) -> List[serial.Serial]:
+        if not ports:
+            return []
+        with ThreadPoolExecutor(max_workers=len(ports), thread_name_prefix='probe') as executor:
+            results = list(executor.map(lambda port: self.open(port.device), ports))
+        connections = []
+        for port, connection in zip(ports, results):
+            if connection is not None:
+                self.remember(port_identity(port), port.device)
+                connections.append(connection)
+        return connections
+
+    def connect(self, identity: Optional[str] = None) -> Optional[serial.Serial]:
+        """Open the board with this identity, or the first board found"""
+        ports = list(serial.tools.list_ports.comports())
+        self.logger.info(f"Found {len(ports)} ports: {', '.join(port.device for port in ports)}")
+
+        if identity is not None:
+            matches = [port for port in ports if port_identity(port) == identity]
+            for port in matches:
+                connection = self.open(port.device)
+                if connection is not None:
+                    self.remember(identity, port.device)
+                    return connection
+            self.logger.error(f"No Arduino with identity {identity} is attached")
+            return None
+
+        # Boards that answered before are tried first, one at a time
+        known = self.load()
+        remembered = [port for port in ports if port_identity(port) in known]
+        for port in remembered:
+            connection = self.open(port.device)
+            if connection is not None:
+                self.remember(port_identity(port), port.device)
+                return connection
+
+        candidates = [port for port in ports if port not in remembered and is_candidate(port)]
+        connections = self._probe_all(candidates)
+        for extra in connections[1:]:
+            extra.close()
+        return connections[0] if connections else None
+
+    def connect_all(self) -> List[serial.Serial]:
+        """Open every attached board, probing all candidates at once"""
+        ports = [port for port in serial.tools.list_ports.comports() if is_candidate(port)]
+        return self._probe_all(ports)
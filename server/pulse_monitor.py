@@ -1,132 +1,139 @@
-import requests
-import json
-import time
 import logging
-from datetime import datetime
 import os
 from typing import Optional
 from dotenv import load_dotenv
 from database import Database
 from arduino_controller import ArduinoController
+from pulse_poller import BASE_URL, PulsePoller, parse_device_list
+from retention import RetentionManager
+from query_service import QueryService
+from pump_service import PumpService
+from watering_rules import WateringEngine
+from supervisor import Supervisor
+from log_config import setup_logging
 import threading
 
 class PulseMonitor:
     def __init__(self):
+        # Load environment variables
+        load_dotenv()
+
         # Set up logging
         self.log_file = os.getenv('LOG_FILE', 'pulse_api.log')
         self.setup_logging()
         
-        # Load environment variables
-        load_dotenv()
-        
         # Set database path
         self.db_path = os.getenv('DB_PATH', '../pulse_data.db')
         
         # Debug logging for environment variables
         self.logger.info("Environment variables after loading:")
         self.logger.info(f"PULSE_DEVICE_ID: {os.getenv('PULSE_DEVICE_ID')}")
+        self.logger.info(f"PULSE_DEVICE_IDS: {os.getenv('PULSE_DEVICE_IDS')}")
         self.logger.info(f"PULSE_API_KEY: {'*' * len(os.getenv('PULSE_API_KEY', ''))} (masked)")
         
-        # Initialize database connection
-        self.db = Database()
+        # Initialize database; its writer is shared with the Arduino controller
+        self.db = Database(self.db_path)
         
         # Get configuration from environment
-        self.device_id = os.getenv('PULSE_DEVICE_ID')
         api_key = os.getenv('PULSE_API_KEY')
         self.fetch_interval = int(os.getenv('FETCH_INTERVAL', 60))
+        self.devices = parse_device_list(
+            os.getenv('PULSE_DEVICE_IDS') or os.getenv('PULSE_DEVICE_ID', ''),
+            self.fetch_interval
+        )
         
-        if not self.device_id or not api_key:
+        if not self.devices or not api_key:
             raise ValueError("PULSE_DEVICE_ID and PULSE_API_KEY must be set in .env file")
 
-        self.base_url = f"https://api.pulsegrow.com/devices/{self.device_id}/recent-data"
-        self.headers = {
-            "x-api-key": api_key,
-            "Accept": "application/json"
-        }
+        # Tracks the health of every source and how long to back off when one fails
+        self.supervisor = Supervisor(maximum=float(os.getenv('MAX_BACKOFF', 300)))
+
+        self.device_id = next(iter(self.devices))
+        self.poller = PulsePoller(
+            self.devices, api_key, self.db,
+            jitter=float(os.getenv('FETCH_JITTER', 0.1)),
+            timeout=float(os.getenv('REQUEST_TIMEOUT', 10)),
+            base_url=os.getenv('PULSE_BASE_URL') or BASE_URL,
+            supervisor=self.supervisor
+        )
 
         # Initialize Arduino controller
         try:
-            self.arduino = ArduinoController(db_path=self.db_path)
+            self.arduino = ArduinoController(
+                port=os.getenv('ARDUINO_PORT') or None, db_path=self.db_path, writer=self.db.writer
+            )
             self.logger.info("Arduino controller initialized successfully")
         except Exception as e:
             self.logger.error(f"Failed to initialize Arduino controller: {str(e)}")
             self.arduino = None
 
-        # Set Arduino polling interval (5 seconds)
-        self.arduino_interval = 5
+        # Reconnect the Arduino when no frame has arrived for this long
+        self.stall_timeout = float(os.getenv('ARDUINO_STALL_TIMEOUT', 30))
+
+        # Background expiry of old rows and incremental vacuum
+        self.retention = RetentionManager.from_env(self.db_path)
+        self.retention_interval = float(os.getenv('RETENTION_INTERVAL', 3600))
+        self.stop_event = threading.Event()
+
+        # Pump commands go through this process, which already owns the serial port
+        self.pumps = PumpService([self.arduino]) if self.arduino else None
+        # Closed-loop watering from the live frames, if WATERING_RULES is set
+        self.watering = WateringEngine.from_env(self.pumps, self.arduino) if self.arduino else None
+        if self.watering:
+            self.arduino.frame_listeners.append(self.watering.on_frame)
+
+        # Serves the latest values from memory to the dashboard and accepts pump commands
+        query_port = int(os.getenv('QUERY_SERVICE_PORT', 8765))
+        self.query_service = QueryService(
+            self.db.cache, self.db.bus, port=query_port, pumps=self.pumps, supervisor=self.supervisor,
+            db=self.db, max_pump_ms=int(os.getenv('PUMP_MAX_DURATION_MS', 30000)),
+            allowed_origins=[o.strip() for o in os.getenv('QUERY_SERVICE_ORIGINS', '').split(',') if o.strip()]
+        ) if query_port else None
 
     def setup_logging(self):
-        # Configure logging for API interactions
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        
-        # Create file handler for API logs
-        api_handler = logging.FileHandler(self.log_file)
-        api_handler.setFormatter(
-            logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        )
-        
-        # Set up loggers
+        setup_logging(self.log_file)
         self.logger = logging.getLogger('pulse_monitor')
-        self.logger.addHandler(api_handler)
-        
-        # Also log database operations
-        db_logger = logging.getLogger('database')
-        db_logger.addHandler(api_handler)
 
-    def fetch_data(self) -> Optional[dict]:
-        try:
-            # Log the complete request details
-            self.logger.info(f"Making request to: {self.base_url}")
-            self.logger.info(f"Headers: {json.dumps({k: v if k != 'Authorization' else '[MASKED]' for k, v in self.headers.items()})}")
-            
-            response = requests.get(self.base_url, headers=self.headers)
-            response.raise_for_status()
-            
-            # Log the response
-            self.logger.info(f"Response status: {response.status_code}")
-            self.logger.info(f"Response body: {response.text}")
-            
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Error fetching data: {str(e)}")
-            return None
+    def fetch_data(self, device_id: Optional[str] = None) -> Optional[dict]:
+        """Fetch the latest reading for one device (the first configured one by default)"""
+        return self.poller.fetch(device_id or self.device_id)
 
     def save_data(self, data: dict):
         if not data:
             return
         try:
             self.db.save_reading(data)
-            self.logger.info("Data saved to database")
+            self.logger.debug("Data saved to database")
         except Exception as e:
             self.logger.error(f"Error saving data: {str(e)}")
 
     def arduino_loop(self):
-        """Separate loop for Arduino polling"""
-        while True:
+        """Keep the Arduino frame stream running, reconnecting with backoff when it fails or stalls"""
+        while self.arduino and not self.stop_event.is_set():
             try:
-                if self.arduino:
-                    arduino_data = self.arduino.get_sensor_data()
-                    if arduino_data:
-                        self.logger.debug(f"Arduino readings: {arduino_data}")
-                time.sleep(self.arduino_interval)
+                # The reader saves each frame as it arrives; this loop only watches it
+                reader = self.arduino.start_streaming()
+                frame = reader.wait_for_frame(timeout=self.stall_timeout)
+                if frame is not None:
+                    self.logger.debug("Arduino readings: %r", frame)
+                    self.supervisor.success('arduino')
+                    continue
+                if self.stop_event.is_set():
+                    return
+                error = reader.error or f"no frame for {self.stall_timeout:.0f}s"
             except Exception as e:
-                self.logger.error(f"Error in Arduino loop: {str(e)}")
-                time.sleep(1)  # Short wait before retry
+                error = e
+
+            delay = self.supervisor.failure('arduino', error)
+            self.logger.error(f"Arduino stream failed ({error}), reconnecting in {delay:.1f}s")
+            if self.stop_event.wait(delay):
+                return
+            self.arduino.reset_connection()
 
     def pulse_loop(self):
-        """Separate loop for Pulse API polling"""
-        while True:
-            try:
-                data = self.fetch_data()
-                self.save_data(data)
-                time.sleep(self.fetch_interval)
-            except Exception as e:
-                self.logger.error(f"Error in Pulse loop: {str(e)}")
-                time.sleep(5)
+        """Separate loop for Pulse API polling of every configured device"""
+        self.logger.info(f"Polling {len(self.devices)} Pulse device(s)")
+        self.poller.run(self.stop_event)
 
     def run(self):
         """Start separate threads for Pulse and Arduino polling"""
@@ -135,9 +142,34 @@ class PulseMonitor:
         arduino_thread.start()
         self.logger.info("Started Arduino polling thread")
 
+        retention_thread = threading.Thread(
+            target=self.retention.run, args=(self.stop_event, self.retention_interval), daemon=True
+        )
+        retention_thread.start()
+        self.logger.info("Started retention thread")
+
+        if self.pumps:
+            self.pumps.start()
+        if self.watering:
+            self.watering.start()
+        if self.query_service:
+            self.query_service.start()
+
         # Run Pulse polling in main thread
         self.logger.info("Starting Pulse polling loop")
-        self.pulse_loop()
+        try:
+            self.pulse_loop()
+        finally:
+            self.stop_event.set()
+            if self.query_service:
+                self.query_service.stop()
+            if self.watering:
+                self.watering.stop()
+            if self.pumps:
+                self.pumps.stop()
+            self.poller.close()
+            self.logger.info("Flushing pending database writes...")
+            self.db.close()
 
 if __name__ == "__main__":
     monitor = PulseMonitor()
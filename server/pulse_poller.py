@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from supervisor import Supervisor
+from metrics import counter, gauge, histogram
+
+FETCH = histogram('pulse_fetch_seconds', "Pulse API request latency", labels=('device',))
+FETCH_ERRORS = counter('pulse_fetch_errors_total', "Failed Pulse API requests", labels=('device', 'reason'))
+UNSAVED = gauge('pulse_unsaved_readings', "Readings held while the database write queue is full")
+
+BASE_URL = "https://api.pulsegrow.com/devices/{device_id}/recent-data"
+
+
+def parse_device_list(value: str, default_interval: int) -> Dict[str, int]:
+    """Parse "id[:interval],..." into {device_id: interval_seconds}"""
+    devices = {}
+    for entry in value.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        device_id, _, interval = entry.partition(':')
+        devices[device_id.strip()] = int(interval) if interval.strip() else default_interval
+    return devices
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the API asked us to wait, from Retry-After or rate-limit headers"""
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    remaining = headers.get('X-RateLimit-Remaining') or headers.get('RateLimit-Remaining')
+    reset = headers.get('X-RateLimit-Reset') or headers.get('RateLimit-Reset')
+    if remaining is not None and reset:
+        try:
+            if float(remaining) > 0:
+                return None
+            reset = float(reset)
+        except ValueError:
+            return None
+        # Either seconds until the window resets or an epoch timestamp
+        return max(0.0, reset - time.time()) if reset > 1e9 else reset
+    return None
+
+
+class PulsePoller:
+    """Polls many Pulse devices over pooled keep-alive connections.
+
+    Each device has its own interval; due times are jittered so devices
+    don't all hit the API at once. Devices that fall due together are
+    fetched concurrently and their readings saved as one batch.
+
+    Failing devices are retried with exponential backoff, rate-limit
+    headers push the next request back, and readings that can't be queued
+    for the database are kept and retried with the next batch.
+    """
+
+    def __init__(self, devices: Dict[str, int], api_key: str, db, jitter: float = 0.1,
+                 timeout: float = 10, max_workers: int = 8, base_url: str = BASE_URL,
+                 supervisor: Optional[Supervisor] = None, max_unsaved: int = 10000):
+        self.logger = logging.getLogger('pulse_monitor')
+        self.devices = devices
+        self.db = db
+        self.jitter = jitter
+        self.timeout = timeout
+        self.base_url = base_url
+        self.supervisor = supervisor or Supervisor()
+        # Readings fetched while the database couldn't take them, oldest dropped first
+        self.unsaved: deque = deque(maxlen=max_unsaved)
+        # device_id -> seconds to wait before its next request, set by a failed or throttled fetch
+        self._delays: Dict[str, float] = {}
+
+        pool_size = max(1, min(max_workers, len(devices)))
+        self.session = requests.Session()
+        self.session.headers.update({
+            "x-api-key": api_key,
+            "Accept": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='pulse-fetch')
+
+        # Spread the first round over a fraction of each interval
+        now = time.monotonic()
+        self.next_due = {
+            device_id: now + random.uniform(0, jitter * interval)
+            for device_id, interval in devices.items()
+        }
+
+    def url_for(self, device_id: str) -> str:
+        return self.base_url.format(device_id=device_id)
+
+    def fetch(self, device_id: str) -> Optional[dict]:
+        source = f"pulse:{device_id}"
+        try:
+            with FETCH.time(device=device_id):
+                response = self.session.get(self.url_for(device_id), timeout=self.timeout)
+            wait = retry_after(response.headers)
+            response.raise_for_status()
+            self.logger.debug("Device %s response %s: %s", device_id, response.status_code, response.text)
+            data = response.json()
+        except requests.exceptions.HTTPError as e:
+            FETCH_ERRORS.inc(device=device_id, reason=e.response.status_code)
+            self.logger.error(f"Error fetching data for device {device_id}: {str(e)}")
+            self._delays[device_id] = self.supervisor.failure(source, e, wait)
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            FETCH_ERRORS.inc(device=device_id, reason=type(e).__name__)
+            self.logger.error(f"Error fetching data for device {device_id}: {str(e)}")
+            self._delays[device_id] = self.supervisor.failure(source, e)
+            return None
+
+        self.supervisor.success(source)
+        if wait:
+            # Out of requests for this window; hold off until it resets
+            self.logger.warning(f"Rate limited on device {device_id}, next request in {wait:.0f}s")
+            self._delays[device_id] = max(wait, self.devices[device_id])
+        return data
+
+    def schedule(self, device_id: str, now: float):
+        delay = self._delays.pop(device_id, None)
+        if delay is not None:
+            self.next_due[device_id] = now + delay
+            return
+        interval = self.devices[device_id]
+        self.next_due[device_id] = now + interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def save(self, readings: List[dict]):
+        """Save readings along with any left over from a database outage"""
+        batch = list(self.unsaved) + readings
+        if not batch:
+            return
+        try:
+            self.db.save_readings(batch)
+        except RuntimeError as e:
+            # Write queue full: keep the batch and retry it with the next poll
+            self.unsaved = deque(batch, maxlen=self.unsaved.maxlen)
+            UNSAVED.set(len(self.unsaved))
+            self.supervisor.failure('database', e)
+            self.logger.warning(f"Holding {len(self.unsaved)} unsaved reading(s) until the database recovers")
+            return
+        self.unsaved.clear()
+        UNSAVED.set(0)
+        self.supervisor.success('database')
+
+    def poll_once(self, now: Optional[float] = None) -> List[dict]:
+        """Fetch every device that is due and save the results as one batch"""
+        now = time.monotonic() if now is None else now
+        due = [device_id for device_id, when in self.next_due.items() if when <= now]
+        if not due:
+            return []
+
+        readings = [data for data in self.executor.map(self.fetch, due) if data]
+        for device_id in due:
+            self.schedule(device_id, now)
+
+        if readings or self.unsaved:
+            self.save(readings)
+            self.logger.debug("Saved %d reading(s) from %d due device(s)", len(readings), len(due))
+        return readings
+
+    def seconds_until_due(self) -> float:
+        return max(0.0, min(self.next_due.values()) - time.monotonic())
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """Poll until stop is set"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.logger.error(f"Error in Pulse poller: {str(e)}")
+            stop.wait(self.seconds_until_due())
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
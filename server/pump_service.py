@@ -0,0 +1,145 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+from metrics import counter, histogram
+
+PUMP_COMMANDS = counter('pump_commands_total', "Pump commands by result", labels=('result',))
+PUMP_LATENCY = histogram('pump_command_seconds', "From submitting a pump command until it was sent")
+
+_STOP = object()
+
+
+class PumpCommand:
+    """One queued pump run; wait() returns once it has been sent or has failed"""
+
+    def __init__(self, pump_number: int, duration_ms: int, controller: int = 0, source: str = 'manual',
+                 reason: Optional[str] = None, moisture_level: Optional[float] = None):
+        self.pump_number = pump_number
+        self.duration_ms = duration_ms
+        self.controller = controller
+        self.source = source
+        self.reason = reason
+        self.moisture_level = moisture_level
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.ok = False
+        self.error: Optional[str] = None
+        self.cancelled = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def finish(self, ok: bool, error: Optional[str] = None):
+        self.ok = ok
+        self.error = error
+        self.completed_at = time.monotonic()
+        PUMP_COMMANDS.inc(result='ok' if ok else 'failed')
+        PUMP_LATENCY.observe(self.completed_at - self.submitted_at)
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def start(self) -> bool:
+        """Claim the command for sending; False if it was cancelled first"""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.started_at = time.monotonic()
+            return True
+
+    def cancel(self) -> bool:
+        """Withdraw a command that is still queued; False once it is being sent"""
+        with self._lock:
+            if self.started_at is not None or self.done:
+                return False
+            self.cancelled = True
+        self.finish(False, "Cancelled before it was sent")
+        return True
+
+    def as_dict(self) -> Dict:
+        result = {
+            'pump': self.pump_number,
+            'duration_ms': self.duration_ms,
+            'controller': self.controller,
+            'source': self.source,
+            'ok': self.ok,
+            'error': self.error,
+        }
+        if self.started_at is not None:
+            result['queued_ms'] = round((self.started_at - self.submitted_at) * 1000, 2)
+        if self.completed_at is not None:
+            result['total_ms'] = round((self.completed_at - self.submitted_at) * 1000, 2)
+        return result
+
+
+class PumpService:
+    """Runs pump commands against the collector's own serial connections.
+
+    Commands are queued and sent one at a time by a single worker thread,
+    so callers never open the port themselves and never race the frame
+    reader for it. Each command is acknowledged once its bytes have been
+    written to the board and the watering event has been logged.
+    """
+
+    def __init__(self, controllers: List, max_queue: int = 32):
+        self.logger = logging.getLogger('pump_service')
+        self.controllers = controllers
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='pump-service', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, pump_number: int, duration_ms: int, controller: int = 0, source: str = 'manual',
+               reason: Optional[str] = None, moisture_level: Optional[float] = None) -> PumpCommand:
+        command = PumpCommand(pump_number, duration_ms, controller, source, reason, moisture_level)
+        try:
+            self._queue.put_nowait(command)
+        except queue.Full:
+            command.finish(False, "Pump command queue is full")
+        return command
+
+    def _run(self):
+        while True:
+            command = self._queue.get()
+            if command is _STOP:
+                return
+            if not command.start():
+                self.logger.info(f"Skipping cancelled pump command {command.as_dict()}")
+                continue
+            try:
+                if not 0 <= command.controller < len(self.controllers):
+                    command.finish(False, f"No Arduino controller {command.controller}")
+                elif self.controllers[command.controller].control_pump(command.pump_number, command.duration_ms):
+                    self.controllers[command.controller].save_watering_event(
+                        command.pump_number, command.duration_ms, command.source,
+                        reason=command.reason, moisture_level=command.moisture_level
+                    )
+                    command.finish(True)
+                else:
+                    command.finish(False, "Failed to send pump command")
+            except Exception as e:
+                command.finish(False, str(e))
+            if not command.ok and command.source != 'manual' and 0 <= command.controller < len(self.controllers):
+                # Automatic decisions are recorded even when the pump couldn't be run
+                self.controllers[command.controller].save_watering_event(
+                    command.pump_number, 0, command.source, decision='failed',
+                    reason=command.error, moisture_level=command.moisture_level
+                )
+            self.logger.info(f"Pump command {command.as_dict()}")
+
+    def stop(self, timeout: float = 5):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
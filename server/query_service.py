@@ -0,0 +1,265 @@
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from event_bus import EventBus
+from latest_cache import LatestCache
+from pump_service import PumpService
+from supervisor import Supervisor
+from metrics import REGISTRY
+from frame_parser import WATER_PUMPS
+
+# Host headers accepted besides the bound address; anything else is a rebound DNS name
+LOCAL_HOSTS = {'127.0.0.1', 'localhost', '::1'}
+
+
+class QueryService:
+    """Local HTTP endpoint serving the collector's in-memory state.
+
+    Binds to localhost only; the dashboard server reads from it instead of
+    querying SQLite for the latest values.
+
+        GET /latest[?device_id=N]   newest Pulse reading
+        GET /readings               newest Pulse reading of every device
+        GET /moisture               same shape as the dashboard's /api/moisture
+        GET /watering               last watering of each pump
+        GET /stream                 Server-Sent Events: reading, moisture and watering
+        GET /history[?width=N&device_id=N]
+                                    today's Pulse metrics, each downsampled to at most width points
+        GET /series?table=T&column=C&start=S&end=E[&width=N&sensor=N]
+                                    one column between two timestamps, downsampled
+        GET /health                 state of each supervised source
+        GET /metrics                counters and histograms in the Prometheus text format
+        POST /pump                  {"pump": N, "duration_ms": N[, "controller": N]}
+
+    /pump only accepts application/json, which a web page can't send
+    cross-origin without a preflight, and refuses requests with a browser
+    Origin that isn't in allowed_origins. Requests whose Host header isn't
+    this machine are refused too. A pump command still queued when
+    pump_timeout runs out is cancelled before answering 504.
+    """
+
+    def __init__(self, cache: LatestCache, bus: Optional[EventBus] = None, host: str = '127.0.0.1',
+                 port: int = 8765, max_age: float = 30, keepalive: float = 15,
+                 pumps: Optional[PumpService] = None, pump_timeout: float = 5,
+                 supervisor: Optional[Supervisor] = None, db=None, max_width: int = 2000,
+                 max_pump_ms: int = 30000, allowed_origins: Optional[List[str]] = None):
+        self.logger = logging.getLogger('query_service')
+        self.cache = cache
+        self.bus = bus
+        self.pumps = pumps
+        self.pump_timeout = pump_timeout
+        self.max_pump_ms = max_pump_ms
+        self.allowed_origins = set(allowed_origins or ())
+        self.supervisor = supervisor
+        self.db = db
+        self.max_width = max_width
+        self.keepalive = keepalive
+        self.host = host
+        self.port = port
+        self.max_age = max_age
+        self.routes: Dict[str, Callable[[Dict], Tuple[int, object]]] = {
+            '/latest': self.latest,
+            '/readings': lambda params: (200, self.cache.readings()),
+            '/moisture': self.moisture,
+            '/watering': lambda params: (200, self.cache.watering()),
+            '/history': self.history,
+            '/series': self.series,
+            '/health': self.health,
+        }
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def latest(self, params: Dict) -> Tuple[int, object]:
+        device_id = params.get('device_id')
+        row = self.cache.latest_reading(int(device_id) if device_id else None)
+        return (200, row) if row else (404, {'error': 'No reading yet'})
+
+    def moisture(self, params: Dict) -> Tuple[int, object]:
+        return 200, self.cache.moisture_snapshot(float(params.get('max_age', self.max_age)))
+
+    def _width(self, params: Dict) -> int:
+        return max(3, min(int(params.get('width', 500)), self.max_width))
+
+    def history(self, params: Dict) -> Tuple[int, object]:
+        if self.db is None:
+            return 503, {'error': 'No database'}
+        device_id = params.get('device_id')
+        return 200, self.db.get_daily_series(self._width(params), int(device_id) if device_id else None)
+
+    def series(self, params: Dict) -> Tuple[int, object]:
+        if self.db is None:
+            return 503, {'error': 'No database'}
+        try:
+            table, column, start, end = params['table'], params['column'], params['start'], params['end']
+        except KeyError:
+            raise ValueError("table, column, start and end are required")
+        start, end = (float(value) if value.replace('.', '', 1).isdigit() else value for value in (start, end))
+        sensor = params.get('sensor')
+        return 200, self.db.downsample(table, column, start, end, self._width(params),
+                                       int(sensor) if sensor else None)
+
+    def health(self, params: Dict) -> Tuple[int, object]:
+        sources = self.supervisor.health() if self.supervisor else {}
+        healthy = all(source['healthy'] for source in sources.values())
+        return (200 if healthy else 503), sources
+
+    def pump(self, params: Dict) -> Tuple[int, object]:
+        if self.pumps is None:
+            return 503, {'error': 'No Arduino controller'}
+        try:
+            pump, duration_ms = int(params['pump']), int(params['duration_ms'])
+            controller = int(params.get('controller', 0))
+        except KeyError:
+            raise ValueError("pump and duration_ms are required")
+        except (TypeError, ValueError):
+            raise ValueError("pump, duration_ms and controller must be integers")
+        if not 1 <= pump <= WATER_PUMPS:
+            raise ValueError(f"pump must be between 1 and {WATER_PUMPS}")
+        if not 0 < duration_ms <= self.max_pump_ms:
+            raise ValueError(f"duration_ms must be between 1 and {self.max_pump_ms}")
+        if not 0 <= controller < len(self.pumps.controllers):
+            raise ValueError(f"No controller {controller}")
+        command = self.pumps.submit(pump, duration_ms, controller)
+        if not command.wait(self.pump_timeout):
+            # Withdraw it so it can't run after the client has given up (and maybe retried)
+            if command.cancel():
+                return 504, {'error': 'Pump command not sent in time and was cancelled', 'cancelled': True}
+            return 504, {'error': 'Pump command is being sent but was not acknowledged in time',
+                         'cancelled': False}
+        return (200 if command.ok else 503), command.as_dict()
+
+    def snapshot(self) -> List[Tuple[str, object]]:
+        """Events sent to a new stream client so it can render before the next update"""
+        events = [('reading', row) for row in self.cache.readings()]
+        events.append(('moisture', self.cache.moisture_snapshot(self.max_age)))
+        return events
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def local_host(self) -> bool:
+                host = self.headers.get('Host', '')
+                hostname = urlparse(f"//{host}").hostname or ''
+                if hostname in LOCAL_HOSTS or hostname == service.host:
+                    return True
+                self.respond(403, {'error': 'Forbidden host'})
+                return False
+
+            def do_GET(self):
+                if not self.local_host():
+                    return
+                url = urlparse(self.path)
+                if url.path == '/stream' and service.bus is not None:
+                    self.stream()
+                    return
+                if url.path == '/metrics':
+                    self.send_text(REGISTRY.render())
+                    return
+                route = service.routes.get(url.path)
+                if route is None:
+                    self.respond(404, {'error': 'Not found'})
+                    return
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    self.respond(*route(params))
+                except ValueError as e:
+                    self.respond(400, {'error': str(e)})
+
+            def respond(self, status: int, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != '/pump':
+                    self.respond(404, {'error': 'Not found'})
+                    return
+                if not self.local_host():
+                    return
+                origin = self.headers.get('Origin')
+                if origin is not None and origin not in service.allowed_origins:
+                    self.respond(403, {'error': 'Cross-origin requests are not allowed'})
+                    return
+                if self.headers.get_content_type() != 'application/json':
+                    self.respond(415, {'error': 'Expected application/json'})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    params = json.loads(self.rfile.read(length) or b'{}')
+                    if not isinstance(params, dict):
+                        raise ValueError("Expected a JSON object")
+                    self.respond(*service.pump(params))
+                except ValueError as e:
+                    self.respond(400, {'error': str(e)})
+
+            def stream(self):
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+
+                subscription = service.bus.subscribe()
+                service.logger.info(f"Stream client connected ({service.bus.subscriber_count} total)")
+                try:
+                    for name, data in service.snapshot():
+                        self.send_event(name, data)
+                    while not subscription.closed:
+                        event = subscription.get(timeout=service.keepalive)
+                        if event is None:
+                            self.wfile.write(b': keepalive\n\n')
+                            self.wfile.flush()
+                        else:
+                            self.send_event(*event)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    service.bus.unsubscribe(subscription)
+                    service.logger.info(
+                        f"Stream client disconnected ({subscription.dropped} event(s) dropped)"
+                    )
+
+            def send_text(self, text: str):
+                body = text.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_event(self, name: str, data):
+                self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                service.logger.debug(format, *args)
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='query-service', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Query service listening on http://{self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        if self.bus is not None:
+            # Ends the open streams so their handler threads return
+            self.bus.close()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
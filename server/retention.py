@@ -0,0 +1,202 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from partitions import PARTITIONED_TABLES, PartitionManager
+
+DAY = 86400
+
+# Raw tables that are summarised in the rollup tables before they age out
+ROLLED_UP_TABLES = ('readings', 'moisture_readings')
+
+
+class RetentionManager:
+    """Ages old rows out of pulse_data.db and gives the space back.
+
+    Rows are deleted in small slices, each its own short transaction, and
+    free pages are returned with incremental vacuum a slice at a time, so
+    the collector's writer is never locked out for long. Raw readings are
+    only removed once they are covered by the rollup tables. With
+    partitioning, closed periods are archived first and expired partitions
+    are dropped as whole files.
+    """
+
+    def __init__(self, db_path: str, retention_days: Dict[str, float], slice_rows: int = 500,
+                 vacuum_pages: int = 200, pause: float = 0.05, partitions: Optional[PartitionManager] = None):
+        self.logger = logging.getLogger('retention')
+        self.db_path = db_path
+        # table -> days to keep; tables that aren't listed (or 0) are kept forever
+        self.retention_days = {table: days for table, days in retention_days.items() if days}
+        self.slice_rows = slice_rows
+        self.vacuum_pages = vacuum_pages
+        self.pause = pause
+        self.partitions = partitions
+
+    @classmethod
+    def from_env(cls, db_path: str) -> 'RetentionManager':
+        raw_days = float(os.getenv('RETENTION_DAYS', 90))
+        return cls(db_path, {
+            'readings': raw_days,
+            'moisture_readings': raw_days,
+            'float_sensor_readings': raw_days,
+            'watering_events': float(os.getenv('WATERING_RETENTION_DAYS', 0)),
+            'rollup_minute': float(os.getenv('ROLLUP_MINUTE_RETENTION_DAYS', 30)),
+            'rollup_hour': float(os.getenv('ROLLUP_HOUR_RETENTION_DAYS', 730)),
+        }, partitions=PartitionManager.from_env(db_path))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.isolation_level = None  # each statement commits on its own
+        return conn
+
+    def size(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {
+            'bytes': page_size * page_count,
+            'pages': page_count,
+            'free_pages': free_pages,
+        }
+
+    def _cutoff(self, conn: sqlite3.Connection, table: str, now: float) -> Optional[int]:
+        cutoff = int(now - self.retention_days[table] * DAY)
+        if table.startswith('rollup_'):
+            return cutoff
+        oldest, untimed = conn.execute(f"SELECT MIN(ts), COUNT(*) - COUNT(ts) FROM {table}").fetchone()
+        if untimed:
+            # Migrated rows whose created_at couldn't be parsed; they never match ts < cutoff
+            self.logger.warning(f"{untimed} row(s) in {table} have no ts and are never expired")
+        if oldest is None or oldest >= cutoff:
+            return None
+        if table in ROLLED_UP_TABLES:
+            # Raw rows older than the first rollup were never summarised; keep them
+            # until `python3 rollups.py` has backfilled their buckets
+            first_rollup = conn.execute("SELECT MIN(bucket) FROM rollup_day").fetchone()[0]
+            if first_rollup is None or oldest < first_rollup:
+                self.logger.warning(
+                    f"Rows in {table} predate the rollups; run `python3 rollups.py` before they can expire"
+                )
+                return None
+        return cutoff
+
+    def _delete_slice(self, conn: sqlite3.Connection, table: str, cutoff: int) -> int:
+        if table.startswith('rollup_'):
+            # Rollups have no rowid; buckets are deleted through the primary key order
+            query = f"""
+            DELETE FROM {table} WHERE (series, bucket) IN (
+                SELECT series, bucket FROM {table} WHERE bucket < ? LIMIT ?
+            )"""
+        else:
+            # Rows are inserted in time order, so the oldest ones have the lowest ids
+            query = f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM {table} WHERE ts < ? ORDER BY id LIMIT ?
+            )"""
+        return conn.execute(query, (cutoff, self.slice_rows)).rowcount
+
+    def expire(self, conn: sqlite3.Connection, table: str, now: float,
+               stop: Optional[threading.Event] = None) -> int:
+        cutoff = self._cutoff(conn, table, now)
+        if cutoff is None:
+            return 0
+        deleted = 0
+        while not (stop and stop.is_set()):
+            removed = self._delete_slice(conn, table, cutoff)
+            deleted += removed
+            if removed < self.slice_rows:
+                break
+            time.sleep(self.pause)
+        return deleted
+
+    def drop_partitions(self, conn: sqlite3.Connection, now: float) -> List[str]:
+        """Delete partition files once every table in them has expired"""
+        if any(table not in self.retention_days for table in PARTITIONED_TABLES):
+            return []
+        cutoff = now - max(self.retention_days[table] for table in PARTITIONED_TABLES) * DAY
+        first_rollup = conn.execute("SELECT MIN(bucket) FROM rollup_day").fetchone()[0]
+        if first_rollup is None:
+            return []
+        return self.partitions.drop_before(conn, cutoff, keep_from=first_rollup)
+
+    def vacuum(self, conn: sqlite3.Connection, stop: Optional[threading.Event] = None) -> int:
+        """Release free pages back to the filesystem a slice at a time"""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.logger.warning(
+                "Incremental vacuum is not enabled on this database; "
+                "run `python3 retention.py --enable-incremental-vacuum` once while the collector is stopped"
+            )
+            return 0
+        reclaimed = 0
+        while not (stop and stop.is_set()):
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free_pages:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+            reclaimed += free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            time.sleep(self.pause)
+        return reclaimed
+
+    def run_once(self, stop: Optional[threading.Event] = None) -> Dict:
+        """Expire every table once and vacuum; returns a report"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            before = self.size(conn)
+            partitions = self.partitions.run_once(stop, now) if self.partitions else {}
+            deleted = {table: self.expire(conn, table, now, stop) for table in self.retention_days}
+            if self.partitions:
+                partitions['dropped'] = self.drop_partitions(conn, now)
+            reclaimed = self.vacuum(conn, stop)
+            after = self.size(conn)
+        finally:
+            conn.close()
+
+        report = {'deleted': deleted, 'reclaimed_pages': reclaimed, 'before': before, 'after': after}
+        if partitions:
+            report['partitions'] = partitions
+        self.logger.info(
+            f"Retention: deleted {sum(deleted.values())} row(s) {deleted}, reclaimed {reclaimed} page(s), "
+            f"database {before['bytes'] / 1e6:.1f} MB -> {after['bytes'] / 1e6:.1f} MB "
+            f"({after['free_pages']} free page(s))"
+        )
+        return report
+
+    def run(self, stop: threading.Event, interval: float = 3600):
+        """Run a retention pass every interval until stop is set"""
+        while not stop.is_set():
+            try:
+                self.run_once(stop)
+            except sqlite3.Error as e:
+                self.logger.error(f"Retention pass failed: {str(e)}")
+            stop.wait(interval)
+
+
+def enable_incremental_vacuum(db_path: str):
+    """Switch an existing database to incremental auto-vacuum (rewrites the file)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expire old rows and compact the database")
+    parser.add_argument('--db', default=os.getenv('DB_PATH', '../pulse_data.db'))
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help="One-time conversion of an existing database; stop the collector first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+    RetentionManager.from_env(args.db).run_once()
+
+
+if __name__ == '__main__':
+    main()
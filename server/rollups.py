@@ -0,0 +1,191 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Bucket width in seconds for each rollup table, finest first
+RESOLUTIONS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+# Pulse metrics rolled up per device, as readings column names
+READING_METRICS = ('temperature_c', 'humidity_rh', 'co2', 'vpd', 'air_pressure', 'dew_point_c')
+
+MERGE_QUERY = """
+INSERT INTO rollup_{resolution} (series, bucket, min_value, max_value, sum_value, count)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(series, bucket) DO UPDATE SET
+    min_value = MIN(min_value, excluded.min_value),
+    max_value = MAX(max_value, excluded.max_value),
+    sum_value = sum_value + excluded.sum_value,
+    count = count + excluded.count
+"""
+
+
+def reading_series(metric: str, device_id) -> str:
+    return f"{metric}:{device_id}"
+
+
+def moisture_series(sensor_number: int) -> str:
+    return f"moisture:{sensor_number}"
+
+
+def pick_resolution(start: float, end: float, max_points: int = 1000) -> str:
+    """Finest resolution that returns at most max_points buckets for the range"""
+    span = max(0.0, end - start)
+    for resolution, width in RESOLUTIONS.items():
+        if span / width <= max_points:
+            return resolution
+    return 'day'
+
+
+class RollupAggregator:
+    """Maintains the minute/hour/day rollup tables as samples arrive.
+
+    Samples are folded into in-memory min/max/sum/count accumulators and
+    periodically merged into the rollup tables through the shared writer, so
+    each bucket costs one upsert per flush rather than one per sample.
+    """
+
+    def __init__(self, writer, flush_interval: float = 10):
+        self.logger = logging.getLogger('rollups')
+        self.writer = writer
+        self.flush_interval = flush_interval
+        # (resolution, series, bucket) -> [min, max, sum, count]
+        self._pending: Dict[Tuple[str, str, int], list] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Pending buckets must reach the writer before it shuts down
+        writer.add_close_hook(self.flush)
+
+    def add(self, series: str, timestamp: float, value: float):
+        """Fold one sample into every resolution"""
+        if value is None:
+            return
+        value = float(value)
+        with self._lock:
+            for resolution, width in RESOLUTIONS.items():
+                key = (resolution, series, int(timestamp // width * width))
+                acc = self._pending.get(key)
+                if acc is None:
+                    self._pending[key] = [value, value, value, 1]
+                else:
+                    if value < acc[0]:
+                        acc[0] = value
+                    if value > acc[1]:
+                        acc[1] = value
+                    acc[2] += value
+                    acc[3] += 1
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def add_reading(self, data: Dict, timestamp: float):
+        device_id = data['deviceId']
+        for metric, key in zip(READING_METRICS, ('temperatureC', 'humidityRh', 'co2', 'vpd', 'airPressure', 'dpC')):
+            self.add(reading_series(metric, device_id), timestamp, data.get(key))
+
+    def flush(self):
+        """Merge pending accumulators into the rollup tables"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        rows: Dict[str, List[tuple]] = {}
+        for (resolution, series, bucket), (low, high, total, count) in pending.items():
+            rows.setdefault(resolution, []).append((series, bucket, low, high, total, count))
+        for resolution, resolution_rows in rows.items():
+            self.writer.submit_many(MERGE_QUERY.format(resolution=resolution), resolution_rows)
+        self.logger.debug("Flushed %d rollup bucket(s)", len(pending))
+
+
+_aggregators: Dict[str, RollupAggregator] = {}
+_aggregators_lock = threading.Lock()
+
+
+def get_rollups(writer) -> RollupAggregator:
+    """Return the shared rollup aggregator for a database writer"""
+    key = os.path.abspath(writer.db_path)
+    with _aggregators_lock:
+        aggregator = _aggregators.get(key)
+        if aggregator is None:
+            aggregator = RollupAggregator(
+                writer,
+                flush_interval=float(os.getenv('ROLLUP_FLUSH_INTERVAL', 10)),
+            )
+            _aggregators[key] = aggregator
+        return aggregator
+
+
+def backfill(db_path: str, since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, int]:
+    """Build rollups from raw rows that predate the live aggregator.
+
+    Only complete buckets that end before `until` (default: now) are
+    written, recomputed from every raw row in them; `since` is widened to
+    the start of its bucket. A bucket that already exists is replaced when
+    the raw rows hold more samples than it does, e.g. the partial bucket
+    left by a collector restarted mid-bucket. Moisture rollups see samples
+    the storage policy doesn't keep, so a live bucket with more samples
+    than the raw rows is left alone.
+    """
+    from database import parse_timestamp
+
+    until_ts = int(parse_timestamp(until) if until else time.time())
+    counts = {}
+    with sqlite3.connect(db_path) as conn:
+        for resolution, width in RESOLUTIONS.items():
+            where = f"WHERE ts >= ? / {width} * {width}" if since else ""
+            bucket = f"ts / {width} * {width}"
+            having = f"HAVING {bucket} + {width} <= ?"
+            selects = [
+                f"""SELECT '{metric}:' || device_id, {bucket}, MIN({metric}), MAX({metric}),
+                           SUM({metric}), COUNT({metric})
+                    FROM readings {where} GROUP BY device_id, {bucket} {having}"""
+                for metric in READING_METRICS
+            ]
+            selects.append(
+                f"""SELECT 'moisture:' || sensor_number, {bucket}, MIN(moisture_level), MAX(moisture_level),
+                           SUM(moisture_level), COUNT(moisture_level)
+                    FROM moisture_readings {where} GROUP BY sensor_number, {bucket} {having}"""
+            )
+            params = ((int(parse_timestamp(since)),) if since else ()) + (until_ts,)
+            # "WHERE true" lets SQLite tell the upsert clause apart from a join constraint
+            cursor = conn.execute(
+                f"""INSERT INTO rollup_{resolution}
+                    (series, bucket, min_value, max_value, sum_value, count)
+                    SELECT * FROM ({' UNION ALL '.join(selects)}) WHERE true
+                    ON CONFLICT(series, bucket) DO UPDATE SET
+                        min_value = excluded.min_value,
+                        max_value = excluded.max_value,
+                        sum_value = excluded.sum_value,
+                        count = excluded.count
+                    WHERE excluded.count > rollup_{resolution}.count""",
+                params * len(selects)
+            )
+            counts[resolution] = cursor.rowcount
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup table maintenance")
+    parser.add_argument('--db', default=os.getenv('DB_PATH', '../pulse_data.db'))
+    parser.add_argument('--since', help="Only backfill rows created at or after this timestamp")
+    parser.add_argument('--until', help="Only backfill buckets that end before this timestamp (default: now)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Make sure the rollup tables exist
+    from database import Database
+    Database(args.db).close()
+    for resolution, count in backfill(args.db, args.since, args.until).items():
+        logging.getLogger('rollups').info(f"Backfilled {count} {resolution} bucket(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,30 +7,102 @@ CREATE TABLE IF NOT EXISTS readings (
     air_pressure REAL NOT NULL,
     dew_point_c REAL NOT NULL,
     created_at TEXT NOT NULL,
-    device_id INTEGER NOT NULL
+    device_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL  -- created_at as epoch seconds (UTC)
 );
 
 CREATE INDEX IF NOT EXISTS idx_readings_created_at 
 ON readings(created_at); 
 
+-- One row per sample: repeated polls of the same reading are upserted
+CREATE UNIQUE INDEX IF NOT EXISTS idx_readings_device_created_at
+ON readings(device_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_readings_ts
+ON readings(ts);
+
+CREATE INDEX IF NOT EXISTS idx_readings_device_ts
+ON readings(device_id, ts);
+
 CREATE TABLE IF NOT EXISTS moisture_readings (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     sensor_number INTEGER NOT NULL,
     moisture_level REAL NOT NULL,
     created_at TEXT NOT NULL,
-    raw_value INTEGER
+    raw_value INTEGER,
+    ts INTEGER NOT NULL
 );
 
+CREATE INDEX IF NOT EXISTS idx_moisture_readings_sensor_ts
+ON moisture_readings(sensor_number, ts);
+
+-- Manual runs, and every decision of the watering rules (duration_ms is 0 when nothing ran)
 CREATE TABLE IF NOT EXISTS watering_events (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     pump_number INTEGER NOT NULL,
     duration_ms INTEGER NOT NULL,
-    created_at TEXT NOT NULL
+    created_at TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    source TEXT NOT NULL DEFAULT 'manual',    -- manual or auto
+    decision TEXT NOT NULL DEFAULT 'watered', -- watered, blocked, satisfied or failed
+    reason TEXT,
+    moisture_level REAL                       -- reading the decision was based on
 );
 
+CREATE INDEX IF NOT EXISTS idx_watering_events_pump_ts
+ON watering_events(pump_number, ts);
+
 CREATE TABLE IF NOT EXISTS float_sensor_readings (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     sensor_number INTEGER NOT NULL,
     status INTEGER NOT NULL,  -- 0 for no water, 1 for water detected
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-); 
\ No newline at end of file
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ts INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_float_sensor_readings_sensor_ts
+ON float_sensor_readings(sensor_number, ts);
+
+-- Closed periods of readings, moisture_readings and float_sensor_readings that were moved
+-- out of this file into read-only partition files next to it (see partitions.py)
+CREATE TABLE IF NOT EXISTS partitions (
+    name TEXT PRIMARY KEY,      -- period, e.g. 2026-09 or 2026-W38
+    path TEXT NOT NULL,         -- file name, relative to this database's directory
+    start_ts INTEGER NOT NULL,  -- the partition holds rows with start_ts <= ts < end_ts
+    end_ts INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+
+-- Rollups of each Pulse metric ("<column>:<device_id>") and moisture sensor
+-- ("moisture:<sensor_number>"), maintained by the collector as data arrives.
+-- bucket is the bucket start in epoch seconds (UTC); avg is sum_value / count.
+CREATE TABLE IF NOT EXISTS rollup_minute (
+    series TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    sum_value REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_hour (
+    series TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    sum_value REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_day (
+    series TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    sum_value REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series, bucket)
+) WITHOUT ROWID;
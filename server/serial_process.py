@@ -0,0 +1,284 @@
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import struct
+from multiprocessing import shared_memory
+from typing import List, Optional
+import serial
+from frame_parser import FLOAT_SENSORS, MOISTURE_SENSORS, SensorFrame
+from arduino_controller import DROPPED_FRAMES, FRAMES, LOST_FRAMES, MALFORMED_FRAMES, SerialFrameReader
+from binary_protocol import negotiate
+from port_discovery import wait_until_ready
+from supervisor import Backoff
+
+# Ring header: frames written, slots, reader connected, binary mode, malformed and lost frame counts
+HEADER = struct.Struct('<QIIIII')
+HEADER_SIZE = 32
+# One frame: its write number, received_at, moisture (NaN = disconnected), raw (-1), floats (-1)
+RECORD = struct.Struct(f'<Qd{MOISTURE_SENSORS}f{MOISTURE_SENSORS}h{FLOAT_SENSORS}b')
+RECORD_SIZE = (RECORD.size + 7) // 8 * 8
+HEAD = struct.Struct('<Q')
+
+
+class FrameRing:
+    """Fixed-size frame records in shared memory, one writer and one reader.
+
+    The writer fills slot head % slots and then publishes head + 1; the
+    reader walks from its own position up to head. A reader that falls more
+    than `slots` frames behind skips the overwritten ones and counts them in
+    `dropped`, so the writer never waits for the reader.
+    """
+
+    def __init__(self, name: Optional[str] = None, slots: int = 1024):
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + slots * RECORD_SIZE)
+            HEADER.pack_into(self.shm.buf, 0, 0, slots, 0, 0, 0, 0)
+        else:
+            # Reader processes share the collector's resource tracker, which unlinks the segment
+            # if the collector dies without closing the ring
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+        self.slots = HEADER.unpack_from(self.buf, 0)[1]
+        self.tail = 0
+        self.dropped = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def header(self):
+        """(head, slots, connected, binary, malformed, lost)"""
+        return HEADER.unpack_from(self.buf, 0)
+
+    def set_status(self, connected: bool, binary: bool, malformed: int, lost: int):
+        head = HEAD.unpack_from(self.buf, 0)[0]
+        HEADER.pack_into(self.buf, 0, head, self.slots, int(connected), int(binary), malformed, lost)
+
+    def put(self, frame: SensorFrame):
+        head = HEAD.unpack_from(self.buf, 0)[0]
+        RECORD.pack_into(
+            self.buf, HEADER_SIZE + (head % self.slots) * RECORD_SIZE,
+            head, frame.received_at,
+            *(math.nan if level is None else level for level in frame.moisture),
+            *(-1 if raw is None else raw for raw in frame.raw),
+            *(-1 if status is None else status for status in frame.floats),
+        )
+        # Publish only after the record is complete
+        HEAD.pack_into(self.buf, 0, head + 1)
+
+    def read(self, limit: Optional[int] = None) -> List[SensorFrame]:
+        """Every frame written since the last call, oldest first"""
+        head = HEAD.unpack_from(self.buf, 0)[0]
+        if head - self.tail >= self.slots:
+            # The oldest slots have been overwritten (the oldest may be mid-write)
+            self.dropped += head - self.slots + 1 - self.tail
+            self.tail = head - self.slots + 1
+        if limit is not None:
+            head = min(head, self.tail + limit)
+
+        records = [
+            RECORD.unpack_from(self.buf, HEADER_SIZE + (number % self.slots) * RECORD_SIZE)
+            for number in range(self.tail, head)
+        ]
+        # Records the writer reached again while we were copying may be torn
+        oldest_intact = HEAD.unpack_from(self.buf, 0)[0] - self.slots + 1
+        frames = []
+        for number, values in zip(range(self.tail, head), records):
+            if number < oldest_intact or values[0] != number:
+                self.dropped += 1
+                continue
+            moisture = values[2:2 + MOISTURE_SENSORS]
+            raw = values[2 + MOISTURE_SENSORS:2 + 2 * MOISTURE_SENSORS]
+            floats = values[2 + 2 * MOISTURE_SENSORS:]
+            frames.append(SensorFrame(
+                [None if math.isnan(level) else level for level in moisture],
+                [None if value == -1 else value for value in raw],
+                [None if status == -1 else status for status in floats],
+                values[1],
+            ))
+        self.tail = head
+        return frames
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def reader_main(device: str, baud_rate: int, protocol: str, binary_baud: int, ring_name: str,
+                commands, stop, log_level: str = 'INFO'):
+    """Entry point of a reader process: own one serial port and fill its ring"""
+    logging.basicConfig(level=log_level, format=f'%(asctime)s - reader {device} - %(levelname)s - %(message)s')
+    logger = logging.getLogger('serial_process')
+    ring = FrameRing(ring_name)
+    backoff = Backoff(1, maximum=30)
+
+    while not stop.is_set():
+        try:
+            connection = serial.Serial(device, baud_rate, timeout=0.1)
+        except (serial.SerialException, OSError) as e:
+            logger.error(f"Failed to open {device}: {str(e)}")
+            stop.wait(backoff.next_delay())
+            continue
+        try:
+            wait_until_ready(connection, timeout=2)
+            binary = protocol == 'binary' and negotiate(connection, binary_baud)
+            reader = SerialFrameReader(connection, binary=binary)
+            stale = _discard_commands(commands)
+            if stale:
+                logger.warning(f"Discarded {stale} command(s) queued before {device} reconnected")
+            backoff.reset()
+            logger.info(f"Reading {'binary' if binary else 'text'} frames from {device}")
+            while not stop.is_set():
+                _send_commands(connection, commands)
+                data = connection.read(connection.in_waiting or 1)
+                if data:
+                    for frame in reader.feed(data):
+                        ring.put(frame)
+                ring.set_status(True, binary, reader.malformed_count, reader.lost_count)
+        except (serial.SerialException, OSError) as e:
+            logger.error(f"Serial read failed: {str(e)}")
+        finally:
+            ring.set_status(False, False, *ring.header()[4:])
+            connection.close()
+        stop.wait(backoff.next_delay())
+    ring.close()
+
+
+def _discard_commands(commands) -> int:
+    discarded = 0
+    while True:
+        try:
+            commands.get_nowait()
+        except queue.Empty:
+            return discarded
+        discarded += 1
+
+
+def _send_commands(connection: serial.Serial, commands):
+    while True:
+        try:
+            command = commands.get_nowait()
+        except queue.Empty:
+            return
+        connection.write(command)
+        connection.flush()
+
+
+class ProcessConnection:
+    """Stands in for the serial.Serial of a port owned by a reader process.
+
+    Lets ArduinoController send pump commands unchanged: writes are handed
+    to the reader process, which owns the port.
+    """
+
+    def __init__(self, process: 'ReaderProcess'):
+        self.process = process
+        self.port = process.device
+        self.baudrate = process.baud_rate
+
+    @property
+    def is_open(self) -> bool:
+        return self.process.alive
+
+    def write(self, data: bytes) -> int:
+        # Like a closed port: a command queued now would only run whenever the board comes back
+        if not (self.process.alive and self.process.connected):
+            raise serial.SerialException(f"{self.port} is not connected")
+        self.process.commands.put(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ReaderProcess:
+    """A child process that reads one serial port into a FrameRing.
+
+    Decoding runs in the child, on its own core, and keeps running while
+    the collector is busy; the collector only copies fixed-size records
+    out of shared memory. The child reconnects by itself when the port
+    fails, and pump commands for the board are passed to it on a queue.
+    """
+
+    def __init__(self, device: str, baud_rate: int = 9600, protocol: str = 'text',
+                 binary_baud: int = 115200, slots: int = 1024):
+        self.logger = logging.getLogger('serial_process')
+        self.device = device
+        self.baud_rate = baud_rate
+        self.protocol = protocol
+        self.binary_baud = binary_baud
+        self.ring = FrameRing(slots=slots)
+        # spawn: the collector runs threads, which fork would copy in an unknown state
+        self._context = multiprocessing.get_context('spawn')
+        self.commands = self._context.Queue()
+        self._stop = self._context.Event()
+        self.process: Optional[multiprocessing.Process] = None
+        self._malformed = 0
+        self._lost = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.ring.header()[2])
+
+    @property
+    def binary(self) -> bool:
+        return bool(self.ring.header()[3])
+
+    def start(self):
+        if self.alive:
+            return self
+        self._stop.clear()
+        self.process = self._context.Process(
+            target=reader_main, name=f"serial-reader-{os.path.basename(self.device)}", daemon=True,
+            args=(self.device, self.baud_rate, self.protocol, self.binary_baud, self.ring.name,
+                  self.commands, self._stop, logging.getLevelName(logging.getLogger().getEffectiveLevel())),
+        )
+        self.process.start()
+        self.logger.info(f"Started reader process {self.process.pid} for {self.device}")
+        return self
+
+    def read(self, limit: Optional[int] = None) -> List[SensorFrame]:
+        """Frames the reader has decoded since the last call"""
+        dropped = self.ring.dropped
+        frames = self.ring.read(limit)
+        if frames:
+            FRAMES.inc(len(frames))
+        if self.ring.dropped != dropped:
+            DROPPED_FRAMES.inc(self.ring.dropped - dropped)
+            self.logger.warning(f"{self.device}: collector fell behind, {self.ring.dropped - dropped} frame(s) dropped")
+
+        malformed, lost = self.ring.header()[4:]
+        # The reader's counters restart whenever it reconnects
+        if malformed != self._malformed:
+            MALFORMED_FRAMES.inc(malformed - self._malformed if malformed > self._malformed else malformed)
+        if lost != self._lost:
+            LOST_FRAMES.inc(lost - self._lost if lost > self._lost else lost)
+        self._malformed, self._lost = malformed, lost
+        return frames
+
+    def stop(self, timeout: float = 3):
+        self._stop.set()
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+            self.process = None
+
+    def close(self):
+        """Stop the reader and release the ring; read() the remaining frames first"""
+        self.stop()
+        self.commands.close()
+        self.ring.close()
@@ -0,0 +1,351 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tty
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from frame_parser import BEGIN_MARKER, END_MARKER, FLOAT_SENSORS, MOISTURE_SENSORS, parse_frame, split_frames
+from binary_protocol import MODE_REPLY, encode_frame
+
+# Calibration values from plant_controller.ino
+AIR_VALUE = 620
+WATER_VALUE = 310
+FLOAT_PINS = (2, 3)
+
+_PUMP_COMMAND = re.compile(rb'PUMP:(\d+):(\d+)')
+_MODE_REQUEST = re.compile(rb'MODE:BIN:(\d+)')
+
+
+def synthetic_frame(rng: random.Random, disconnected: float = 0.05) -> bytes:
+    """One frame exactly as plant_controller.ino prints it, including its debug lines"""
+    fields = []
+    for sensor in range(1, MOISTURE_SENSORS + 1):
+        if rng.random() < disconnected:
+            fields.append(f"M{sensor}:NC")
+            continue
+        raw_value = rng.randint(WATER_VALUE, AIR_VALUE)
+        percent = (AIR_VALUE - raw_value) * 100 // (AIR_VALUE - WATER_VALUE)
+        fields.append(f"M{sensor}:{percent}|{raw_value}")
+    lines = ["DEBUG: Starting sensor reading cycle", "BEGIN>", "DEBUG: Starting sensor data transmission"]
+    floats = ""
+    for sensor in range(1, FLOAT_SENSORS + 1):
+        value = rng.randint(0, 1)
+        floats += f",F{sensor}:{value} (Pin {FLOAT_PINS[sensor - 1]} = {1 - value})\r\n"
+    lines.append(",".join(fields) + floats.rstrip("\r\n"))
+    lines.append("<END")
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def binary_frame(text_frame: bytes, seq: int) -> bytes:
+    """The binary encoding of a text frame, as the firmware sends it in binary mode"""
+    body = text_frame[text_frame.index(BEGIN_MARKER) + len(BEGIN_MARKER):text_frame.index(END_MARKER)]
+    frame = parse_frame(body, received_at=0.0)
+    # A damaged frame in a replayed capture has nothing to encode
+    return encode_frame(frame, seq) if frame is not None else b''
+
+
+def malformed_binary_frame(rng: random.Random, frame: bytes) -> bytes:
+    """A binary frame with a flipped byte or cut short"""
+    if rng.random() < 0.5:
+        return frame[:rng.randint(1, len(frame) - 1)]
+    position = rng.randrange(2, len(frame))
+    return frame[:position] + bytes([frame[position] ^ 0xFF]) + frame[position + 1:]
+
+
+def malformed_frame(rng: random.Random) -> bytes:
+    """A frame damaged the ways a real serial line damages them"""
+    frame = synthetic_frame(rng)
+    kind = rng.choice(('truncated', 'garbage', 'no_begin', 'corrupt'))
+    if kind == 'truncated':
+        # Cut off before <END; the next BEGIN> has to resynchronise the reader
+        return frame[:rng.randint(len(BEGIN_MARKER), frame.index(END_MARKER))]
+    if kind == 'garbage':
+        return bytes(rng.randint(0, 255) for _ in range(rng.randint(1, 64))) + frame
+    if kind == 'no_begin':
+        return frame.replace(BEGIN_MARKER, b'', 1)
+    position = rng.randrange(len(frame))
+    return frame[:position] + bytes([rng.randint(0, 255)]) + frame[position + 1:]
+
+
+class VirtualArduino:
+    """pty-backed stand-in for a board running plant_controller.ino.
+
+    Opening `port` behaves like the real board: it prints READY, then one
+    frame every 1/rate seconds, either synthetic or replayed from a
+    capture. Pump commands written to the port are counted. Unless
+    text_only is set it accepts the binary mode request like the current
+    firmware and switches to binary frames.
+    """
+
+    def __init__(self, rate: float = 2.0, malformed: float = 0.0, capture: Optional[bytes] = None,
+                 seed: Optional[int] = None, burst: int = 1, text_only: bool = False):
+        self.logger = logging.getLogger('simulator')
+        self.rate = rate
+        self.malformed = malformed
+        self.burst = burst
+        self.rng = random.Random(seed)
+        # Replay recorded frames in a loop instead of generating them
+        self.frames: List[bytes] = [
+            BEGIN_MARKER + b'\r\n' + body + END_MARKER + b'\r\n' for body in split_frames(capture)
+        ] if capture else []
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)  # no echo or newline translation, like a USB serial line
+        self.port = os.ttyname(self.slave)
+
+        self.sent = 0
+        self.sent_malformed = 0
+        self.pump_commands: List[tuple] = []
+        self.text_only = text_only
+        self.binary = False
+        self.seq = 0
+        self._mode_reply: Optional[bytes] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def next_frame(self) -> bytes:
+        damaged = self.malformed and self.rng.random() < self.malformed
+        if damaged:
+            self.sent_malformed += 1
+        if self.binary:
+            text = self.frames[self.sent % len(self.frames)] if self.frames else synthetic_frame(self.rng)
+            frame = binary_frame(text, self.seq)
+            self.seq = (self.seq + 1) & 0xFFFF
+            return malformed_binary_frame(self.rng, frame) if damaged else frame
+        if damaged:
+            return malformed_frame(self.rng)
+        if self.frames:
+            return self.frames[self.sent % len(self.frames)]
+        return synthetic_frame(self.rng)
+
+    def start(self):
+        for target in (self._write_loop, self._read_loop):
+            thread = threading.Thread(target=target, name=f"virtual-arduino-{self.port}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _write_loop(self):
+        try:
+            for _ in range(3):
+                os.write(self.master, b"READY\r\n")
+            interval = self.burst / self.rate if self.rate else 0
+            next_send = time.monotonic()
+            while not self._stop.is_set():
+                if self._mode_reply is not None:
+                    os.write(self.master, self._mode_reply)
+                    self._mode_reply = None
+                    self.binary = True
+                os.write(self.master, b"".join(self.next_frame() for _ in range(self.burst)))
+                self.sent += self.burst
+                next_send += interval
+                self._stop.wait(max(0.0, next_send - time.monotonic()))
+        except OSError as e:
+            # The pty buffer can't drain once the reader stops; keep quiet on shutdown
+            if not self._stop.is_set():
+                self.logger.error(f"{self.port}: write failed: {str(e)}")
+
+    def _read_loop(self):
+        buffer = b''
+        while not self._stop.is_set():
+            try:
+                buffer += os.read(self.master, 1024)
+            except OSError:
+                return
+            for pump, duration in _PUMP_COMMAND.findall(buffer):
+                self.pump_commands.append((int(pump), int(duration)))
+                self.logger.info(f"{self.port}: pump {int(pump)} for {int(duration)}ms")
+            for baud in _MODE_REQUEST.findall(buffer):
+                if not self.text_only:
+                    self._mode_reply = MODE_REPLY + baud + b'\r\n'
+            buffer = buffer[buffer.rfind(b'\n') + 1:]
+
+    def stop(self):
+        self._stop.set()
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def fake_reading(device_id: str, rng: random.Random) -> Dict:
+    """A recent-data response shaped like the Pulse API's"""
+    temperature = rng.uniform(18, 30)
+    humidity = rng.uniform(35, 75)
+    return {
+        'deviceId': int(device_id) if device_id.isdigit() else device_id,
+        'temperatureC': round(temperature, 2),
+        'humidityRh': round(humidity, 2),
+        'co2': rng.randint(400, 1500),
+        'vpd': round(rng.uniform(0.4, 1.8), 2),
+        'airPressure': round(rng.uniform(98000, 103000), 1),
+        'dpC': round(temperature - (100 - humidity) / 5, 2),
+        'lightLux': round(rng.uniform(0, 30000), 1),
+        'createdAt': datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
+    }
+
+
+class FakePulseAPI:
+    """Local stand-in for GET /devices/{id}/recent-data.
+
+    Fails a fraction of requests with 500 and can rate-limit clients with
+    429 + Retry-After, to exercise the collector's backoff.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, failure_rate: float = 0.0,
+                 rate_limit: Optional[int] = None, seed: Optional[int] = None):
+        self.logger = logging.getLogger('simulator')
+        self.host = host
+        self.port = port
+        self.failure_rate = failure_rate
+        # At most this many requests per device per minute
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self._windows: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/devices/{{device_id}}/recent-data"
+
+    def respond(self, path: str):
+        match = re.fullmatch(r'/devices/([^/]+)/recent-data', path)
+        if match is None:
+            return 404, {}, {'error': 'Not found'}
+        device_id = match.group(1)
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                window = [t for t in self._windows.get(device_id, []) if now - t < 60]
+                if len(window) >= self.rate_limit:
+                    self._windows[device_id] = window
+                    return 429, {'Retry-After': str(int(60 - (now - window[0])) + 1)}, {'error': 'Too many requests'}
+                window.append(now)
+                self._windows[device_id] = window
+            if self.rng.random() < self.failure_rate:
+                return 500, {}, {'error': 'Simulated failure'}
+            return 200, {}, fake_reading(device_id, self.rng)
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers, payload = api.respond(self.path.split('?')[0])
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                api.logger.debug(format, *args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='fake-pulse-api', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def record(port: str, seconds: float, out_path: str, baud_rate: int = 9600) -> int:
+    """Capture raw bytes from a real board for later replay"""
+    import serial
+
+    total = 0
+    with serial.Serial(port, baud_rate, timeout=0.5) as connection, open(out_path, 'wb') as out:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            data = connection.read(connection.in_waiting or 1)
+            out.write(data)
+            total += len(data)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual Arduino boards and a fake Pulse API for hardware-free testing")
+    parser.add_argument('--boards', type=int, default=1, help="Number of virtual boards")
+    parser.add_argument('--rate', type=float, default=2.0, help="Frames per second per board")
+    parser.add_argument('--burst', type=int, default=1, help="Frames written per write, for load tests")
+    parser.add_argument('--malformed', type=float, default=0.0, help="Fraction of frames to damage")
+    parser.add_argument('--text-only', action='store_true',
+                        help="Ignore binary mode requests, like firmware from before binary framing")
+    parser.add_argument('--replay', help="Replay frames from a capture made with --record")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--pulse-port', type=int, default=8080, help="Fake Pulse API port (0 disables)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of API requests that fail")
+    parser.add_argument('--rate-limit', type=int, help="API requests allowed per device per minute")
+    parser.add_argument('--record', metavar='PORT', help="Record a real board instead of simulating")
+    parser.add_argument('--seconds', type=float, default=60, help="How long to record")
+    parser.add_argument('--out', default='capture.bin', help="Capture file for --record")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('simulator')
+
+    if args.record:
+        logger.info(f"Recorded {record(args.record, args.seconds, args.out)} bytes to {args.out}")
+        return
+
+    capture = None
+    if args.replay:
+        with open(args.replay, 'rb') as f:
+            capture = f.read()
+
+    boards = [
+        VirtualArduino(args.rate, args.malformed, capture,
+                       seed=None if args.seed is None else args.seed + i, burst=args.burst,
+                       text_only=args.text_only).start()
+        for i in range(args.boards)
+    ]
+    api = None
+    if args.pulse_port:
+        api = FakePulseAPI(port=args.pulse_port, failure_rate=args.failure_rate,
+                           rate_limit=args.rate_limit, seed=args.seed).start()
+
+    print("Point the collector at the simulator with:")
+    print(f"  ARDUINO_PORT={boards[0].port}  (pulse_monitor.py)")
+    print(f"  ARDUINO_PORTS={','.join(board.port for board in boards)}  (async_monitor.py)")
+    if api:
+        print(f"  PULSE_BASE_URL={api.base_url}")
+    print(flush=True)
+
+    try:
+        while True:
+            time.sleep(10)
+            logger.info(
+                f"Sent {sum(board.sent for board in boards)} frame(s) "
+                f"({sum(board.sent_malformed for board in boards)} malformed), "
+                f"{sum(len(board.pump_commands) for board in boards)} pump command(s)"
+                + (f", {api.requests} API request(s)" if api else "")
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for board in boards:
+            board.stop()
+        if api:
+            api.stop()
+
+
+if __name__ == '__main__':
+    main()
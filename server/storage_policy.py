@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+def parse_channel_map(value: str) -> Dict[int, float]:
+    """Parse "sensor:value,..." into {sensor_number: value}"""
+    channels = {}
+    for entry in value.split(','):
+        sensor, sep, setting = entry.partition(':')
+        if sep and sensor.strip():
+            channels[int(sensor)] = float(setting)
+    return channels
+
+
+class StoragePolicy:
+    """Decides which sensor samples are worth writing to the database.
+
+    Moisture samples are stored when they move at least the channel's
+    deadband (in percentage points; the firmware reports whole percent)
+    away from the last stored value, float sensors only when their state
+    changes, and every channel at least once per heartbeat interval so
+    readers can tell a quiet sensor from a dead one.
+    """
+
+    def __init__(self, moisture_deadband: float = 1.0, deadbands: Optional[Dict[int, float]] = None,
+                 heartbeat: float = 60, report_interval: float = 300):
+        self.logger = logging.getLogger('storage_policy')
+        self.moisture_deadband = moisture_deadband
+        self.deadbands = deadbands or {}
+        self.heartbeat = heartbeat
+        self.report_interval = report_interval
+
+        # sensor_number -> (last stored value, time stored)
+        self._moisture: Dict[int, tuple] = {}
+        self._floats: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._last_report = time.monotonic()
+
+        self.written = {'moisture': 0, 'float': 0}
+        self.suppressed = {'moisture': 0, 'float': 0}
+
+    @classmethod
+    def from_env(cls) -> 'StoragePolicy':
+        return cls(
+            moisture_deadband=float(os.getenv('MOISTURE_DEADBAND', 1.0)),
+            deadbands=parse_channel_map(os.getenv('MOISTURE_DEADBANDS', '')),
+            heartbeat=float(os.getenv('STORAGE_HEARTBEAT', 60)),
+        )
+
+    def _should_store(self, last: Dict[int, tuple], kind: str, sensor: int,
+                      value, deadband: float, now: float) -> bool:
+        with self._lock:
+            previous = last.get(sensor)
+            store = (
+                previous is None
+                or (value != previous[0] and abs(value - previous[0]) >= deadband)
+                or now - previous[1] >= self.heartbeat
+            )
+            if store:
+                last[sensor] = (value, now)
+                self.written[kind] += 1
+            else:
+                self.suppressed[kind] += 1
+            return store
+
+    def store_moisture(self, sensor: int, level: float, now: Optional[float] = None) -> bool:
+        deadband = self.deadbands.get(sensor, self.moisture_deadband)
+        return self._should_store(self._moisture, 'moisture', sensor, level, deadband,
+                                  time.monotonic() if now is None else now)
+
+    def store_float(self, sensor: int, status: int, now: Optional[float] = None) -> bool:
+        # Any change of state is stored, so a zero deadband
+        return self._should_store(self._floats, 'float', sensor, status, 0,
+                                  time.monotonic() if now is None else now)
+
+    def forget(self, sensor: int):
+        """Drop a moisture channel's last value, e.g. after it disconnects"""
+        with self._lock:
+            self._moisture.pop(sensor, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {'written': dict(self.written), 'suppressed': dict(self.suppressed)}
+
+    def maybe_report(self, now: Optional[float] = None):
+        """Log the write/suppress counters once per report interval"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_report < self.report_interval:
+            return
+        self._last_report = now
+        written = sum(self.written.values())
+        suppressed = sum(self.suppressed.values())
+        total = written + suppressed
+        self.logger.info(
+            f"Storage policy: wrote {written} of {total} sensor samples, "
+            f"suppressed {suppressed} (moisture {self.suppressed['moisture']}, float {self.suppressed['float']})"
+        )
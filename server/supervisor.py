@@ -0,0 +1,82 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Backoff:
+    """Exponential backoff with jitter: base, base*factor, ... capped at maximum"""
+
+    def __init__(self, base: float = 1, factor: float = 2, maximum: float = 300, jitter: float = 0.1):
+        self.base = base
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+        self.failures = 0
+
+    def next_delay(self) -> float:
+        # The exponent is capped so factor ** failures can't overflow during a long outage
+        delay = min(self.maximum, self.base * self.factor ** min(self.failures, 64))
+        self.failures += 1
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def reset(self):
+        self.failures = 0
+
+
+class Supervisor:
+    """Tracks the health of each data source and hands out retry delays.
+
+    Every source (a Pulse device, the serial port, the database) reports
+    success or failure; failures return how long to wait before the next
+    attempt, growing exponentially until the source recovers. State changes
+    are logged once instead of on every retry.
+    """
+
+    def __init__(self, base: float = 1, maximum: float = 300):
+        self.logger = logging.getLogger('supervisor')
+        self.base = base
+        self.maximum = maximum
+        self._sources: Dict[str, Dict] = {}
+        self._backoff: Dict[str, Backoff] = {}
+        self._lock = threading.Lock()
+
+    def _source(self, name: str) -> Dict:
+        source = self._sources.get(name)
+        if source is None:
+            source = self._sources[name] = {
+                'healthy': True, 'failures': 0, 'last_error': None, 'last_ok': None, 'retry_in': None
+            }
+            self._backoff[name] = Backoff(self.base, maximum=self.maximum)
+        return source
+
+    def success(self, name: str):
+        with self._lock:
+            source = self._source(name)
+            if not source['healthy']:
+                self.logger.info(f"{name} recovered after {source['failures']} failure(s)")
+            source.update(healthy=True, failures=0, last_ok=time.time(), retry_in=None)
+            self._backoff[name].reset()
+
+    def failure(self, name: str, error, retry_after: Optional[float] = None) -> float:
+        """Record a failure; returns seconds to wait before retrying"""
+        with self._lock:
+            source = self._source(name)
+            delay = self._backoff[name].next_delay()
+            if retry_after is not None:
+                # The server said when to come back; don't retry any sooner
+                delay = max(delay, retry_after)
+            if source['healthy']:
+                self.logger.warning(f"{name} failing: {error}")
+            source.update(healthy=False, failures=source['failures'] + 1, last_error=str(error), retry_in=delay)
+            self.logger.debug("%s failure %d, retrying in %.1fs", name, source['failures'], delay)
+            return delay
+
+    def is_healthy(self, name: str) -> bool:
+        with self._lock:
+            return self._sources.get(name, {}).get('healthy', True)
+
+    def health(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(source) for name, source in self._sources.items()}
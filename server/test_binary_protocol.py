@@ -0,0 +1,123 @@
+import pytest
+from binary_protocol import FRAME_SIZE, BinaryFrameDecoder, crc16, encode_frame, negotiate
+from frame_parser import SensorFrame
+
+# seq 0x1234; moisture 42, 17, NC, 100, 0, 55; float 1 wet, float 2 dry
+FRAME = bytes.fromhex('a55a' '13' '3412'
+                      '2a11ff640037' '05025802ffff36016c02c201' '01'
+                      'fc8a')
+EXPECTED = SensorFrame([42.0, 17.0, None, 100.0, 0.0, 55.0], [517, 600, None, 310, 620, 450], [1, 0])
+
+
+def frame(seq):
+    return encode_frame(EXPECTED, seq)
+
+
+def test_crc16_ccitt_check_value():
+    assert crc16(b'123456789') == 0x29B1
+
+
+def test_encode_matches_wire_format():
+    assert len(FRAME) == FRAME_SIZE
+    assert encode_frame(EXPECTED, 0x1234) == FRAME
+
+
+def test_decode_fixed_frame():
+    decoder = BinaryFrameDecoder()
+    [(seq, decoded)] = decoder.feed(FRAME, received_at=1.5)
+    assert seq == 0x1234
+    assert decoded == EXPECTED
+    assert decoded.received_at == 1.5
+    assert (decoder.corrupt, decoder.lost) == (0, 0)
+
+
+@pytest.mark.parametrize('split', [1, 2, 3, 5, 10, FRAME_SIZE - 1])
+def test_frame_split_across_feeds(split):
+    decoder = BinaryFrameDecoder()
+    assert decoder.feed(FRAME[:split]) == []
+    [(seq, decoded)] = decoder.feed(FRAME[split:])
+    assert (seq, decoded) == (0x1234, EXPECTED)
+
+
+def test_byte_at_a_time():
+    decoder = BinaryFrameDecoder()
+    frames = [result for byte in frame(1) + frame(2) for result in decoder.feed(bytes([byte]))]
+    assert [seq for seq, _ in frames] == [1, 2]
+
+
+def test_bad_crc_is_dropped_and_decoder_resyncs():
+    corrupted = bytearray(frame(1))
+    corrupted[8] ^= 0x01
+    decoder = BinaryFrameDecoder()
+    frames = decoder.feed(b'noise' + bytes(corrupted) + frame(2))
+    assert [seq for seq, _ in frames] == [2]
+    assert decoder.corrupt == 1
+
+
+def test_bad_length_is_dropped_and_decoder_resyncs():
+    decoder = BinaryFrameDecoder()
+    frames = decoder.feed(b'\xa5\x5a\x07\x00\x00' + frame(1))
+    assert [seq for seq, _ in frames] == [1]
+    assert decoder.corrupt == 1
+
+
+def test_sync_word_split_across_feeds():
+    decoder = BinaryFrameDecoder()
+    assert decoder.feed(b'text\xa5') == []
+    assert [seq for seq, _ in decoder.feed(frame(9)[1:])] == [9]
+
+
+def test_sequence_gaps_count_lost_frames():
+    decoder = BinaryFrameDecoder()
+    decoder.feed(frame(10) + frame(11) + frame(14))
+    assert decoder.lost == 2
+
+
+def test_sequence_wraps_without_loss():
+    decoder = BinaryFrameDecoder()
+    decoder.feed(frame(0xFFFE) + frame(0xFFFF) + frame(0) + frame(2))
+    assert decoder.lost == 1
+    assert decoder.last_seq == 2
+
+
+def test_counter_restart_is_not_counted_as_loss():
+    decoder = BinaryFrameDecoder()
+    decoder.feed(frame(500) + frame(0))
+    assert decoder.lost == 0
+
+
+class FakePort:
+    port = 'fake'
+
+    def __init__(self, lines, baudrate=9600):
+        self.lines = list(lines)
+        self.baudrate = baudrate
+        self.timeout = 1
+        self.written = b''
+
+    def reset_input_buffer(self):
+        pass
+
+    def write(self, data):
+        self.written += data
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        return self.lines.pop(0) if self.lines else b''
+
+
+def test_negotiate_switches_baud_on_reply():
+    port = FakePort([b'BEGIN>\r\n', b'OK:BIN:115200\r\n'])
+    assert negotiate(port, 115200, timeout=1)
+    assert port.written == b'MODE:BIN:115200\n'
+    assert port.baudrate == 115200
+    assert port.timeout == 1
+
+
+def test_negotiate_falls_back_to_text_without_reply():
+    port = FakePort([b'DEBUG: Starting sensor reading cycle\r\n'])
+    assert not negotiate(port, 115200, timeout=0.3)
+    assert port.baudrate == 9600
+    assert port.timeout == 1
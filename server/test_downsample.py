@@ -0,0 +1,109 @@
+import math
+import random
+import sqlite3
+import pytest
+import downsample
+from database import Database
+from downsample import lttb, lttb_rows
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def numpy_path(request, monkeypatch):
+    if request.param and not downsample.HAVE_NUMPY:
+        pytest.skip("numpy is not installed")
+    monkeypatch.setattr(downsample, 'HAVE_NUMPY', request.param)
+    return request.param
+
+
+def series(n, seed=7):
+    rng = random.Random(seed)
+    x = [float(i * 60) for i in range(n)]
+    y = [20 + 5 * math.sin(i / 50) + rng.gauss(0, 1) for i in range(n)]
+    return x, y
+
+
+@pytest.mark.skipif(not downsample.HAVE_NUMPY, reason="numpy is not installed")
+@pytest.mark.parametrize('n, threshold', [(10, 3), (1000, 50), (10007, 500), (5000, 4999)])
+def test_numpy_and_python_pick_the_same_points(monkeypatch, n, threshold):
+    x, y = series(n)
+    fast = lttb(x, y, threshold)
+    monkeypatch.setattr(downsample, 'HAVE_NUMPY', False)
+    assert lttb(x, y, threshold) == fast
+
+
+def test_keeps_endpoints(numpy_path):
+    x, y = series(2000)
+    out_x, out_y = lttb(x, y, 100)
+    assert len(out_x) == len(out_y) == 100
+    assert (out_x[0], out_y[0]) == (x[0], y[0])
+    assert (out_x[-1], out_y[-1]) == (x[-1], y[-1])
+    assert out_x == sorted(out_x)
+
+
+def test_keeps_peaks(numpy_path):
+    x, y = series(2000)
+    y[1234] = 1000.0
+    assert 1000.0 in lttb(x, y, 50)[1]
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 3, 10])
+def test_short_series_returned_as_is(numpy_path, n):
+    x, y = series(n)
+    assert lttb(x, y, 10) == (x, y)
+
+
+def test_threshold_below_three_returns_everything(numpy_path):
+    x, y = series(20)
+    assert lttb(x, y, 2) == (x, y)
+
+
+def test_nan_values_are_skipped(numpy_path):
+    x, y = series(1000)
+    y[0] = y[500] = y[-1] = float('nan')
+    out_x, out_y = lttb(x, y, 40)
+    assert len(out_x) == 40
+    assert not any(math.isnan(value) for value in out_y)
+    assert (out_x[0], out_x[-1]) == (x[1], x[-2])
+
+
+def test_nan_values_skipped_before_threshold_check(numpy_path):
+    assert lttb([0.0, 1.0, 2.0], [1.0, float('nan'), 3.0], 5) == ([0.0, 2.0], [1.0, 3.0])
+
+
+def test_lttb_rows(numpy_path):
+    rows = list(zip(*series(300)))
+    points = lttb_rows(rows, 30)
+    assert len(points) == 30
+    assert points[0] == list(rows[0]) and points[-1] == list(rows[-1])
+    assert lttb_rows([], 30) == []
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'pulse.db'))
+    yield db
+    db.close()
+
+
+def insert_moisture(db, rows):
+    with sqlite3.connect(db.db_path) as conn:
+        conn.executemany(
+            "INSERT INTO moisture_readings (sensor_number, moisture_level, raw_value, created_at, ts) "
+            "VALUES (1, ?, 300, '', ?)", [(level, ts) for ts, level in rows]
+        )
+
+
+def test_downsample_cache_keyed_on_rounded_steps(db):
+    insert_moisture(db, [(1000 + i, 40 + i % 7) for i in range(5000)])
+    # 5000s over 100 points: one step is 50s
+    first = db.downsample('moisture_readings', 'moisture_level', 1000, 6000, width=100)
+    assert len(first) == 100
+    assert db.downsample('moisture_readings', 'moisture_level', 1010, 6010, width=100) is first
+    assert db.downsample('moisture_readings', 'moisture_level', 1060, 6060, width=100) is not first
+    assert db.downsample('moisture_readings', 'moisture_level', 1000, 6000, width=50) is not first
+    assert db.downsample('moisture_readings', 'moisture_level', 1000, 6000, width=100, sensor=2) == []
+
+
+def test_downsample_rejects_unknown_columns(db):
+    with pytest.raises(ValueError):
+        db.downsample('moisture_readings', 'created_at', 0, 10)
@@ -0,0 +1,76 @@
+import random
+import pytest
+from arduino_controller import SerialFrameReader
+from frame_parser import SensorFrame, parse_capture, parse_frame, split_frames
+
+# A frame body as printed by plant_controller.ino
+BODY = (b'\r\nDEBUG: Starting sensor data transmission\r\n'
+        b'M1:42|517,M2:NC,M3:0|620,M4:100|310,M5:55|450,M6:17|600,F1:1 (Pin 2 = 0)\r\n'
+        b',F2:0 (Pin 3 = 1)\r\n')
+FRAME = SensorFrame([42.0, None, 0.0, 100.0, 55.0, 17.0], [517, None, 620, 310, 450, 600], [1, 0])
+
+
+@pytest.mark.parametrize('body, moisture, raw, floats', [
+    (BODY, FRAME.moisture, FRAME.raw, FRAME.floats),
+    (b'M1:42|517', [42.0] + [None] * 5, [517] + [None] * 5, [None, None]),
+    (b'F2:1', [None] * 6, [None] * 6, [None, 1]),
+    (b'M3: 12.5|480,F1:NC', [None, None, 12.5, None, None, None], [None, None, 480, None, None, None],
+     [None, None]),
+    # A percentage whose raw value was cut off is treated as disconnected
+    (b'M1:42|517,M2:38', [42.0] + [None] * 5, [517] + [None] * 5, [None, None]),
+    # Channels the board doesn't have are ignored
+    (b'M1:42|517,M7:10|400,F3:1,M0:5|5', [42.0] + [None] * 5, [517] + [None] * 5, [None, None]),
+])
+def test_parse_frame(body, moisture, raw, floats):
+    frame = parse_frame(body, received_at=3.0)
+    assert (frame.moisture, frame.raw, frame.floats) == (moisture, raw, floats)
+    assert frame.received_at == 3.0
+
+
+@pytest.mark.parametrize('body', [
+    b'',
+    b'DEBUG: Starting sensor data transmission',
+    b'garbage \x00\xff\xa5\x5a',
+    b'M:42|517',
+    b'Mx:42|517,F:1',
+    b'M7:10|400,F3:1',
+])
+def test_parse_frame_without_readings(body):
+    assert parse_frame(body) is None
+
+
+def test_parse_frame_never_raises():
+    rng = random.Random(2)
+    alphabet = b'MF0123456789:|,.-NC ()=\r\n\x00\xff'
+    for _ in range(5000):
+        body = bytes(rng.choice(alphabet) for _ in range(rng.randrange(60)))
+        frame = parse_frame(body, received_at=0.0)
+        assert frame is None or isinstance(frame, SensorFrame)
+    for _ in range(500):
+        body = bytearray(BODY)
+        for _ in range(rng.randrange(1, 8)):
+            body[rng.randrange(len(body))] = rng.randrange(256)
+        parse_frame(bytes(body), received_at=0.0)
+
+
+def test_split_frames():
+    capture = (b'READY\r\nBEGIN>' + BODY + b'<END\r\n'
+               b'BEGIN>M1:1' + b'BEGIN>M1:2|300<END'  # first frame cut short by a reset
+               b'noise<END BEGIN>M1:3|301<END BEGIN>M1:4|302')  # last frame incomplete
+    assert list(split_frames(capture)) == [BODY, b'M1:2|300', b'M1:3|301']
+    assert [frame.moisture[0] for frame in parse_capture(capture)] == [42.0, 2.0, 3.0]
+
+
+def test_split_frames_without_markers():
+    assert list(split_frames(b'')) == []
+    assert list(split_frames(b'M1:42|517<END')) == []
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64])
+def test_reader_across_chunk_boundaries(size):
+    stream = b'DEBUG: boot\r\n' + b''.join(b'BEGIN>' + BODY + b'<END\r\n' for _ in range(3))
+    reader = SerialFrameReader(None)
+    frames = []
+    for i in range(0, len(stream), size):
+        frames += reader.feed(stream[i:i + size])
+    assert frames == [FRAME] * 3
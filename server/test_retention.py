@@ -0,0 +1,44 @@
+import sqlite3
+import pytest
+from retention import DAY, RetentionManager
+
+NOW = 400 * DAY
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'pulse.db'))
+    conn.isolation_level = None
+    # Tables migrated from before ts existed allow NULL ts
+    conn.execute("CREATE TABLE moisture_readings (id INTEGER PRIMARY KEY, created_at TEXT, ts INTEGER)")
+    conn.execute("CREATE TABLE watering_events (id INTEGER PRIMARY KEY, created_at TEXT, ts INTEGER)")
+    conn.execute("CREATE TABLE rollup_day (series TEXT, bucket INTEGER, PRIMARY KEY (series, bucket))")
+    yield conn
+    conn.close()
+
+
+def test_rows_without_ts_are_kept(conn):
+    conn.executemany("INSERT INTO moisture_readings (created_at, ts) VALUES (?, ?)",
+                     [('garbage', None), ('', 10 * DAY), ('', 20 * DAY), ('', NOW)])
+    conn.execute("INSERT INTO rollup_day VALUES ('moisture:1', ?)", (5 * DAY,))
+    retention = RetentionManager(':memory:', {'moisture_readings': 90}, pause=0)
+    assert retention.expire(conn, 'moisture_readings', NOW) == 2
+    assert conn.execute("SELECT created_at, ts FROM moisture_readings ORDER BY id").fetchall() == [
+        ('garbage', None), ('', NOW)
+    ]
+
+
+def test_only_null_ts_rows(conn):
+    conn.execute("INSERT INTO watering_events (created_at, ts) VALUES ('garbage', NULL)")
+    retention = RetentionManager(':memory:', {'watering_events': 30}, pause=0)
+    assert retention.expire(conn, 'watering_events', NOW) == 0
+
+
+def test_raw_rows_wait_for_rollups(conn):
+    conn.execute("INSERT INTO moisture_readings (created_at, ts) VALUES ('', ?)", (10 * DAY,))
+    retention = RetentionManager(':memory:', {'moisture_readings': 90}, pause=0)
+    assert retention.expire(conn, 'moisture_readings', NOW) == 0
+    conn.execute("INSERT INTO rollup_day VALUES ('moisture:1', ?)", (20 * DAY,))
+    assert retention.expire(conn, 'moisture_readings', NOW) == 0
+    conn.execute("INSERT INTO rollup_day VALUES ('moisture:1', ?)", (10 * DAY,))
+    assert retention.expire(conn, 'moisture_readings', NOW) == 1
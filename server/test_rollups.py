@@ -0,0 +1,64 @@
+import sqlite3
+import pytest
+from database import Database
+from rollups import MERGE_QUERY, backfill
+
+HOUR = 3600
+START = 1_700_000_000 // 86400 * 86400
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'pulse.db')
+    Database(path).close()
+    return path
+
+
+def insert_moisture(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO moisture_readings (sensor_number, moisture_level, raw_value, created_at, ts) "
+            "VALUES (1, ?, 300, '', ?)", [(level, ts) for ts, level in rows]
+        )
+
+
+def bucket(path, resolution, start):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            f"SELECT min_value, max_value, sum_value, count FROM rollup_{resolution} "
+            "WHERE series = 'moisture:1' AND bucket = ?", (start,)
+        ).fetchone()
+
+
+def test_backfill_builds_complete_buckets(db_path):
+    insert_moisture(db_path, [(START + 60 * i, 40 + i % 5) for i in range(120)])
+    backfill(db_path, until=START + HOUR)
+    assert bucket(db_path, 'hour', START) == (40, 44, sum(40 + i % 5 for i in range(60)), 60)
+    # The second hour hasn't ended yet
+    assert bucket(db_path, 'hour', START + HOUR) is None
+
+
+def test_backfill_completes_partial_live_bucket(db_path):
+    insert_moisture(db_path, [(START + 60 * i, 40 + i % 5) for i in range(60)])
+    # A collector restarted mid-bucket merged only the last ten minutes
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(MERGE_QUERY.format(resolution='hour'), ('moisture:1', START, 40, 44, 420, 10))
+    backfill(db_path, until=START + HOUR)
+    assert bucket(db_path, 'hour', START)[3] == 60
+
+
+def test_backfill_keeps_live_bucket_with_more_samples(db_path):
+    # Moisture rollups count samples the storage policy didn't store
+    insert_moisture(db_path, [(START, 40), (START + 1800, 42)])
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(MERGE_QUERY.format(resolution='hour'), ('moisture:1', START, 39, 43, 41 * 900, 900))
+    backfill(db_path, until=START + HOUR)
+    assert bucket(db_path, 'hour', START) == (39, 43, 41 * 900, 900)
+
+
+def test_backfill_since_widens_to_bucket_start(db_path):
+    insert_moisture(db_path, [(START + 60 * i, 50) for i in range(60)])
+    backfill(db_path, since=START + 1800, until=START + HOUR)
+    assert bucket(db_path, 'hour', START)[3] == 60
+    assert bucket(db_path, 'minute', START) is None
+    assert bucket(db_path, 'minute', START + 1800)[3] == 1
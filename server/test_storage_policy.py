@@ -0,0 +1,25 @@
+from storage_policy import StoragePolicy, parse_channel_map
+
+
+def test_one_percent_step_is_stored():
+    policy = StoragePolicy(moisture_deadband=1.0, heartbeat=60)
+    assert [policy.store_moisture(1, level, now=t) for t, level in enumerate([40, 40, 40.5, 41, 41, 39.5])] == [
+        True, False, False, True, False, True
+    ]
+
+
+def test_per_sensor_deadband_and_heartbeat():
+    policy = StoragePolicy(moisture_deadband=1.0, deadbands=parse_channel_map('2:3'), heartbeat=60)
+    assert policy.store_moisture(2, 40, now=0)
+    assert not policy.store_moisture(2, 42, now=1)
+    assert policy.store_moisture(2, 43, now=2)
+    assert not policy.store_moisture(2, 43, now=61)
+    assert policy.store_moisture(2, 43, now=62)
+
+
+def test_floats_store_changes_only():
+    policy = StoragePolicy(heartbeat=60)
+    assert [policy.store_float(1, status, now=t) for t, status in enumerate([1, 1, 0, 0, 1])] == [
+        True, False, True, False, True
+    ]
+    assert policy.stats() == {'written': {'moisture': 0, 'float': 3}, 'suppressed': {'moisture': 0, 'float': 2}}
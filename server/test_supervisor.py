@@ -0,0 +1,24 @@
+from supervisor import Backoff, Supervisor
+
+
+def test_backoff_grows_to_maximum():
+    backoff = Backoff(base=1, factor=2, maximum=30, jitter=0)
+    assert [backoff.next_delay() for _ in range(7)] == [1, 2, 4, 8, 16, 30, 30]
+    backoff.reset()
+    assert backoff.next_delay() == 1
+
+
+def test_backoff_survives_long_outages():
+    backoff = Backoff(base=0.5, factor=1.5, maximum=300)
+    backoff.failures = 100000
+    assert 270 <= backoff.next_delay() <= 330
+
+
+def test_supervisor_delay_after_many_failures():
+    supervisor = Supervisor(base=1, maximum=60)
+    for _ in range(2000):
+        delay = supervisor.failure('pulse:1', 'timeout')
+    assert delay <= 66
+    assert not supervisor.is_healthy('pulse:1')
+    supervisor.success('pulse:1')
+    assert supervisor.is_healthy('pulse:1')
@@ -0,0 +1,151 @@
+import pytest
+import watering_rules
+from frame_parser import SensorFrame
+from watering_rules import Timer, WateringEngine, WateringRule, parse_rules
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeWheel:
+    """Runs callbacks when the test advances the clock instead of on a thread"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.timers = []
+
+    def schedule(self, delay, callback):
+        timer = Timer(self.clock.now + delay, callback)
+        self.timers.append(timer)
+        return timer
+
+    def run_due(self):
+        # Callbacks may schedule more timers that are already due
+        while any(timer.due <= self.clock.now for timer in self.timers):
+            due = [timer for timer in self.timers if timer.due <= self.clock.now]
+            self.timers = [timer for timer in self.timers if timer.due > self.clock.now]
+            for timer in due:
+                if not timer.cancelled:
+                    timer.callback()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class FakePumps:
+    def __init__(self):
+        self.commands = []
+
+    def submit(self, pump, duration_ms, controller=0, **details):
+        self.commands.append((pump, duration_ms, details['source']))
+
+
+class FakeController:
+    def __init__(self):
+        self.events = []
+
+    def save_watering_event(self, pump, duration_ms, source='manual', decision='watered', reason=None,
+                            moisture_level=None):
+        self.events.append((pump, decision, moisture_level))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watering_rules.time, 'monotonic', clock)
+    return clock
+
+
+def engine_for(clock, **options):
+    pumps, controller, wheel = FakePumps(), FakeController(), FakeWheel(clock)
+    rule = WateringRule(sensor=1, start_below=30, stop_above=40, pump=3, duration_ms=2000)
+    engine = WateringEngine([rule], pumps, controller, cooldown=600, wheel=wheel, **options)
+    return engine, pumps, controller, wheel
+
+
+def feed(engine, wheel, level, floats=(1, 1)):
+    engine.on_frame(SensorFrame([level] + [None] * 5, [500] + [None] * 5, list(floats)))
+    wheel.run_due()
+
+
+def test_hysteresis(clock):
+    engine, pumps, controller, wheel = engine_for(clock)
+    feed(engine, wheel, 35)
+    assert pumps.commands == []  # between the thresholds but never dropped below start_below
+    feed(engine, wheel, 25)
+    assert pumps.commands == [(3, 2000, 'auto')]
+
+    # Still watering between the thresholds once the cooldown is over
+    clock.now += 600
+    feed(engine, wheel, 35)
+    assert len(pumps.commands) == 2
+    clock.now += 600
+    feed(engine, wheel, 45)
+    assert controller.events == [(3, 'satisfied', 45)]
+    clock.now += 600
+    feed(engine, wheel, 35)
+    assert len(pumps.commands) == 2
+
+
+def test_no_watering_above_high_threshold(clock):
+    engine, pumps, controller, wheel = engine_for(clock)
+    for level in (40, 55, 90):
+        feed(engine, wheel, level)
+    assert pumps.commands == [] and controller.events == []
+
+
+def test_cooldown_rechecks_from_the_wheel(clock):
+    engine, pumps, controller, wheel = engine_for(clock)
+    feed(engine, wheel, 20)
+    clock.now += 100
+    feed(engine, wheel, 21)
+    assert len(pumps.commands) == 1
+    # No further frame: the wheel re-evaluates when the cooldown ends
+    clock.now += 499
+    wheel.run_due()
+    assert len(pumps.commands) == 1
+    clock.now += 1
+    wheel.run_due()
+    assert len(pumps.commands) == 2
+
+
+def test_float_interlock(clock):
+    engine, pumps, controller, wheel = engine_for(clock, interlock_float=2)
+    feed(engine, wheel, 20, floats=(1, 0))
+    feed(engine, wheel, 19, floats=(1, 0))
+    feed(engine, wheel, 18, floats=(1, None))
+    assert pumps.commands == []
+    # Recorded once per change of reason, not for every frame
+    assert controller.events == [(3, 'blocked', 20)]
+    feed(engine, wheel, 18, floats=(1, 1))
+    assert pumps.commands == [(3, 2000, 'auto')]
+
+
+def test_daily_limit(clock):
+    engine, pumps, controller, wheel = engine_for(clock, daily_limit=2)
+    for _ in range(4):
+        feed(engine, wheel, 10)
+        clock.now += 600
+    assert len(pumps.commands) == 2
+    assert controller.events == [(3, 'blocked', 10)]
+    # The oldest pulse leaves the 24h window
+    clock.now = 1000.0 + 86400
+    feed(engine, wheel, 10)
+    assert len(pumps.commands) == 3
+
+
+def test_parse_rules():
+    rules = parse_rules('1:30:40, 2:25:35:7:5000,,bad', duration_ms=1500)
+    assert [(r.sensor, r.start_below, r.stop_above, r.pump, r.duration_ms) for r in rules] == [
+        (1, 30.0, 40.0, 1, 1500), (2, 25.0, 35.0, 7, 5000)
+    ]
+    with pytest.raises(ValueError):
+        parse_rules('1:40:30')
@@ -0,0 +1,273 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from frame_parser import SensorFrame
+from metrics import counter
+
+DECISIONS = counter('watering_decisions_total', "Automatic watering decisions", labels=('decision',))
+
+
+class Timer:
+    __slots__ = ('due', 'callback', 'cancelled')
+
+    def __init__(self, due: int, callback: Callable[[], None]):
+        self.due = due
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hashed timing wheel: callbacks run on one thread within a tick of their due time.
+
+    Scheduling and cancelling are O(1); each tick only looks at one slot.
+    Timers further out than one turn of the wheel wait in their slot until
+    their tick comes round.
+    """
+
+    def __init__(self, tick: float = 0.01, slots: int = 512):
+        self.logger = logging.getLogger('watering_rules')
+        self.tick = tick
+        self._slots: List[List[Timer]] = [[] for _ in range(slots)]
+        self._ticks = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """Run callback after delay seconds (at the next tick for 0)"""
+        ticks = max(1, math.ceil(delay / self.tick))
+        with self._lock:
+            timer = Timer(self._ticks + ticks, callback)
+            self._slots[timer.due % len(self._slots)].append(timer)
+        return timer
+
+    def _advance(self) -> List[Timer]:
+        with self._lock:
+            self._ticks += 1
+            slot = self._slots[self._ticks % len(self._slots)]
+            due = [timer for timer in slot if timer.due <= self._ticks]
+            if due:
+                slot[:] = [timer for timer in slot if timer.due > self._ticks]
+        return due
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while not self._stop.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+            # Late ticks (e.g. after a slow callback) are run back to back until caught up
+            for timer in self._advance():
+                if timer.cancelled:
+                    continue
+                try:
+                    timer.callback()
+                except Exception as e:
+                    self.logger.error(f"Timer callback failed: {str(e)}")
+            next_tick += self.tick
+
+
+class WateringRule:
+    """Water `pump` when `sensor` drops below start_below, until it is back above stop_above"""
+
+    def __init__(self, sensor: int, start_below: float, stop_above: float,
+                 pump: Optional[int] = None, duration_ms: int = 3000):
+        if stop_above < start_below:
+            raise ValueError(f"Sensor {sensor}: stop_above must not be below start_below")
+        self.sensor = sensor
+        self.start_below = start_below
+        self.stop_above = stop_above
+        self.pump = sensor if pump is None else pump
+        self.duration_ms = duration_ms
+
+    def __repr__(self):
+        return (f"WateringRule(sensor={self.sensor}, start_below={self.start_below}, "
+                f"stop_above={self.stop_above}, pump={self.pump}, duration_ms={self.duration_ms})")
+
+
+def parse_rules(value: str, duration_ms: int = 3000) -> List[WateringRule]:
+    """Parse "sensor:start_below:stop_above[:pump[:duration_ms]],..." into rules"""
+    rules = []
+    for entry in value.split(','):
+        fields = [field.strip() for field in entry.split(':')]
+        if len(fields) < 3 or not fields[0]:
+            continue
+        rules.append(WateringRule(
+            int(fields[0]), float(fields[1]), float(fields[2]),
+            pump=int(fields[3]) if len(fields) > 3 and fields[3] else None,
+            duration_ms=int(fields[4]) if len(fields) > 4 and fields[4] else duration_ms,
+        ))
+    return rules
+
+
+class _PlantState:
+    __slots__ = ('watering', 'last_run', 'runs', 'blocked', 'recheck', 'level', 'floats')
+
+    def __init__(self):
+        self.watering = False      # between dropping below start_below and rising above stop_above
+        self.last_run: Optional[float] = None
+        self.runs: deque = deque()  # monotonic times of pump runs in the last day
+        self.blocked: Optional[str] = None
+        self.recheck: Optional[Timer] = None
+        self.level: Optional[float] = None
+        self.floats: List = []
+
+
+class WateringEngine:
+    """Closed-loop watering from the live sensor frames.
+
+    Every frame is evaluated against the rules as it arrives: a plant
+    that drops below its start threshold is watered in pulses, at most one
+    per cooldown (so the water can soak in before the sensor is believed),
+    until it reads above its stop threshold. The reservoir float sensor
+    must report water, and a daily limit caps the pulses per plant in case
+    a sensor fails dry. Pump commands are dispatched from a timer wheel,
+    which also re-evaluates a plant when its cooldown ends, so nothing
+    polls the database. Every decision is recorded in watering_events.
+    """
+
+    def __init__(self, rules: List[WateringRule], pumps, controller=None, controller_index: int = 0,
+                 cooldown: float = 1800, interlock_float: Optional[int] = None, daily_limit: int = 6,
+                 wheel: Optional[TimerWheel] = None):
+        self.logger = logging.getLogger('watering_rules')
+        self.rules = rules
+        self.pumps = pumps
+        self.controller = controller
+        self.controller_index = controller_index
+        self.cooldown = cooldown
+        self.interlock_float = interlock_float
+        self.daily_limit = daily_limit
+        self.wheel = wheel if wheel is not None else TimerWheel()
+        self._state: Dict[int, _PlantState] = {rule.sensor: _PlantState() for rule in rules}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, pumps, controller=None) -> Optional['WateringEngine']:
+        """An engine for WATERING_RULES, or None when no rules are configured"""
+        rules = parse_rules(os.getenv('WATERING_RULES', ''), int(os.getenv('WATERING_DURATION_MS', 3000)))
+        if not rules:
+            return None
+        interlock = os.getenv('WATERING_INTERLOCK_FLOAT')
+        return cls(
+            rules, pumps, controller,
+            cooldown=float(os.getenv('WATERING_COOLDOWN', 1800)),
+            interlock_float=int(interlock) if interlock else None,
+            daily_limit=int(os.getenv('WATERING_DAILY_LIMIT', 6)),
+            wheel=TimerWheel(tick=float(os.getenv('WATERING_TICK', 0.01))),
+        )
+
+    def start(self):
+        self.wheel.start()
+        self.logger.info(f"Automatic watering for {len(self.rules)} plant(s): {self.rules}")
+        return self
+
+    def stop(self):
+        self.wheel.stop()
+
+    def on_frame(self, frame: SensorFrame):
+        """Evaluate every rule against a new frame; called by the controller for each frame"""
+        decisions: List[tuple] = []
+        with self._lock:
+            for rule in self.rules:
+                state = self._state[rule.sensor]
+                if 0 < rule.sensor <= len(frame.moisture):
+                    state.level = frame.moisture[rule.sensor - 1]
+                state.floats = frame.floats
+                self._evaluate(rule, state, decisions)
+        # Recorded outside the lock: the database writer may block when its queue is full
+        for decision in decisions:
+            self._decide(*decision)
+
+    def _recheck(self, rule: WateringRule):
+        decisions: List[tuple] = []
+        with self._lock:
+            state = self._state[rule.sensor]
+            state.recheck = None
+            self._evaluate(rule, state, decisions)
+        for decision in decisions:
+            self._decide(*decision)
+
+    def _evaluate(self, rule: WateringRule, state: _PlantState, decisions: List[tuple]):
+        """Update the plant's state; decisions to record are appended to decisions"""
+        level = state.level
+        if level is None:
+            return
+        if state.watering and level >= rule.stop_above:
+            state.watering = False
+            state.blocked = None
+            decisions.append((rule, 'satisfied', f"moisture {level:g}% reached {rule.stop_above:g}%", level))
+            return
+        if not state.watering:
+            if level >= rule.start_below:
+                return
+            state.watering = True
+        if level >= rule.stop_above:
+            return
+
+        now = time.monotonic()
+        blocked = self._blocked(state, now)
+        if blocked:
+            if blocked != state.blocked:
+                decisions.append((rule, 'blocked', blocked, level))
+            state.blocked = blocked
+            return
+        state.blocked = None
+
+        if state.last_run is not None and now - state.last_run < self.cooldown:
+            # Let the last pulse soak in; look again when the cooldown is over
+            if state.recheck is None:
+                state.recheck = self.wheel.schedule(
+                    self.cooldown - (now - state.last_run), lambda: self._recheck(rule)
+                )
+            return
+
+        state.last_run = now
+        state.runs.append(now)
+        reason = f"moisture {level:g}% below {rule.stop_above:g}%"
+        DECISIONS.inc(decision='water')
+        self.logger.info(f"Watering plant {rule.sensor}: pump {rule.pump} for {rule.duration_ms}ms, {reason}")
+        self.wheel.schedule(0, lambda: self.pumps.submit(
+            rule.pump, rule.duration_ms, self.controller_index,
+            source='auto', reason=reason, moisture_level=level
+        ))
+
+    def _blocked(self, state: _PlantState, now: float) -> Optional[str]:
+        if self.interlock_float is not None:
+            index = self.interlock_float - 1
+            status = state.floats[index] if 0 <= index < len(state.floats) else None
+            if status != 1:
+                return f"reservoir float {self.interlock_float} reports no water"
+        while state.runs and now - state.runs[0] >= 86400:
+            state.runs.popleft()
+        if len(state.runs) >= self.daily_limit:
+            return f"daily limit of {self.daily_limit} pulse(s) reached"
+        return None
+
+    def _decide(self, rule: WateringRule, decision: str, reason: str, level: float):
+        DECISIONS.inc(decision=decision)
+        self.logger.info(f"Plant {rule.sensor} {decision}: {reason}")
+        if self.controller is not None:
+            self.controller.save_watering_event(
+                rule.pump, 0, source='auto', decision=decision, reason=reason, moisture_level=level
+            )
@@ -1,15 +1,39 @@
 const express = require('express');
+const http = require('http');
 const sqlite3 = require('sqlite3').verbose();
 const app = express();
 const port = 3000;
 
+// The collector only stores sensor rows on change or once per STORAGE_HEARTBEAT,
+// so a sensor counts as disconnected once it has been silent longer than that.
+const SENSOR_STALE_WINDOW = `-${parseInt(process.env.STORAGE_HEARTBEAT || '60') + 30} seconds`;
+
+// The collector serves the latest values from memory; SQLite is only the fallback
+const COLLECTOR_URL = process.env.COLLECTOR_URL || 'http://127.0.0.1:8765';
+
 const db = new sqlite3.Database('../pulse_data.db');
 
+// Resolves to the collector's JSON response, or null if it is down or has no data yet
+async function fromCollector(path) {
+    try {
+        const response = await fetch(COLLECTOR_URL + path, { signal: AbortSignal.timeout(500) });
+        return response.ok ? await response.json() : null;
+    } catch (err) {
+        return null;
+    }
+}
+
 app.use(express.static('public'));
+app.use(express.json());
 
-app.get('/api/latest', (req, res) => {
+app.get('/api/latest', async (req, res) => {
+    const cached = await fromCollector('/latest');
+    if (cached) {
+        res.json(cached);
+        return;
+    }
     db.get(
-        "SELECT * FROM readings ORDER BY created_at DESC LIMIT 1",
+        "SELECT * FROM readings ORDER BY ts DESC LIMIT 1",
         (err, row) => {
             if (err) {
                 res.status(500).json({ error: 'Database error' });
@@ -20,23 +44,87 @@ app.get('/api/latest', (req, res) => {
     );
 });
 
-app.get('/api/history', (req, res) => {
+// Live updates are pushed by the collector; each browser gets its own upstream stream
+app.get('/api/stream', (req, res) => {
+    const upstream = http.get(COLLECTOR_URL + '/stream', (collector) => {
+        if (collector.statusCode !== 200) {
+            collector.resume();
+            res.status(503).json({ error: 'Collector stream unavailable' });
+            return;
+        }
+        res.writeHead(200, {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive'
+        });
+        collector.pipe(res);
+        collector.on('end', () => res.end());
+    });
+    upstream.on('error', () => {
+        if (!res.headersSent) {
+            res.status(503).json({ error: 'Collector stream unavailable' });
+        } else {
+            res.end();
+        }
+    });
+    req.on('close', () => upstream.destroy());
+});
+
+const HISTORY_COLUMNS = ['temperature_c', 'humidity_rh', 'co2', 'vpd', 'air_pressure', 'dew_point_c'];
+
+// Today's readings as { column: [[ts, value], ...] }, downsampled by the collector
+// to about one point per pixel of the chart
+app.get('/api/history', async (req, res) => {
+    const width = parseInt(req.query.width) || 500;
+    const series = await fromCollector(`/history?width=${width}`);
+    if (series) {
+        res.json(series);
+        return;
+    }
     db.all(
-        "SELECT * FROM readings WHERE date(created_at) = date('now') ORDER BY created_at",
+        "SELECT * FROM readings WHERE ts >= CAST(strftime('%s', 'now', 'start of day') AS INTEGER) ORDER BY ts",
         (err, rows) => {
             if (err) {
                 res.status(500).json({ error: 'Database error' });
                 return;
             }
-            res.json(rows);
+            const result = {};
+            for (const column of HISTORY_COLUMNS) {
+                result[column] = rows.filter(row => row[column] !== null).map(row => [row.ts, row[column]]);
+            }
+            res.json(result);
         }
     );
 });
 
-app.post('/api/water/plant/:id', (req, res) => {
+app.post('/api/water/plant/:id', async (req, res) => {
     const plantId = parseInt(req.params.id);
-    const duration = req.body.duration || 1000; // default 1 second
-    
+    const duration = (req.body && req.body.duration) || 1000; // default 1 second
+
+    // The collector owns the serial port and acknowledges once the command is sent
+    try {
+        const response = await fetch(COLLECTOR_URL + '/pump', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ pump: plantId, duration_ms: duration }),
+            signal: AbortSignal.timeout(10000)
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            // Validation errors (4xx) and timeouts keep the collector's status and body
+            res.status(response.status).json({ ...result, error: result.error || 'Failed to control pump' });
+            return;
+        }
+        res.json({ success: true, ...result });
+        return;
+    } catch (err) {
+        // Only fall back when the collector isn't running; a timeout may still water
+        if (!err.cause || err.cause.code !== 'ECONNREFUSED') {
+            res.status(504).json({ error: 'Pump command timed out' });
+            return;
+        }
+    }
+
     // Spawn Python script to control Arduino
     const spawn = require('child_process').spawn;
     const pythonProcess = spawn('python3', [
@@ -54,14 +142,20 @@ app.post('/api/water/plant/:id', (req, res) => {
     });
 });
 
-app.get('/api/moisture', (req, res) => {
+app.get('/api/moisture', async (req, res) => {
+    const cached = await fromCollector('/moisture');
+    if (cached) {
+        res.json(cached);
+        return;
+    }
+
     console.log('Fetching moisture readings...');
     
     // First query for moisture readings
     db.all(
         `SELECT sensor_number, moisture_level, raw_value, created_at 
          FROM moisture_readings 
-         WHERE created_at >= datetime('now', '-6 seconds')
+         WHERE created_at >= datetime('now', ?)
          GROUP BY sensor_number
          HAVING created_at = (
              SELECT MAX(created_at) 
@@ -69,6 +163,7 @@ app.get('/api/moisture', (req, res) => {
              WHERE m2.sensor_number = moisture_readings.sensor_number
          )
          ORDER BY sensor_number ASC`,
+        [SENSOR_STALE_WINDOW],
         (err, moistureRows) => {
             if (err) {
                 console.error('Database error:', err);
@@ -80,7 +175,7 @@ app.get('/api/moisture', (req, res) => {
             db.all(
                 `SELECT sensor_number, status, created_at 
                  FROM float_sensor_readings 
-                 WHERE created_at >= datetime('now', '-6 seconds')
+                 WHERE created_at >= datetime('now', ?)
                  GROUP BY sensor_number
                  HAVING created_at = (
                      SELECT MAX(created_at) 
@@ -88,6 +183,7 @@ app.get('/api/moisture', (req, res) => {
                      WHERE f2.sensor_number = float_sensor_readings.sensor_number
                  )
                  ORDER BY sensor_number ASC`,
+                [SENSOR_STALE_WINDOW],
                 (err, floatRows) => {
                     if (err) {
                         console.error('Database error:', err);
@@ -123,8 +219,8 @@ app.get('/api/moisture/history/:sensorNumber', (req, res) => {
         `SELECT moisture_level, created_at 
          FROM moisture_readings 
          WHERE sensor_number = ? 
-         AND created_at >= datetime('now', '-24 hours')
-         ORDER BY created_at ASC`,
+         AND ts >= CAST(strftime('%s', 'now', '-24 hours') AS INTEGER)
+         ORDER BY ts ASC`,
         [sensorNumber],
         (err, rows) => {
             if (err) {